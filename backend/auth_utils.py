@@ -1,12 +1,32 @@
+import asyncio
+import hashlib
+import os
+import secrets
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
+from fastapi import HTTPException
 from jose import jwt
 
 SECRET_KEY = "your_secret_key_here"  # (In production, use an environment variable)
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Bcrypt cost factor; hashes with a different cost are re-hashed on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# Dedicated pool for bcrypt so a burst of logins cannot occupy the request threadpool.
+# bcrypt releases the GIL, so threads give real parallelism here.
+HASHING_WORKERS = int(os.getenv("HASHING_WORKERS", str(os.cpu_count() or 2)))
+HASHING_QUEUE_LIMIT = int(os.getenv("HASHING_QUEUE_LIMIT", "64"))
+HASHING_RETRY_AFTER_SECONDS = int(os.getenv("HASHING_RETRY_AFTER_SECONDS", "2"))
+
+_hashing_executor = ThreadPoolExecutor(max_workers=HASHING_WORKERS, thread_name_prefix="bcrypt")
+_hashing_slots = threading.BoundedSemaphore(HASHING_WORKERS + HASHING_QUEUE_LIMIT)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -14,6 +34,33 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+def _submit_hashing(fn, *args) -> Future:
+    if not _hashing_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=503,
+            detail="Server ausgelastet, bitte später erneut versuchen.",
+            headers={"Retry-After": str(HASHING_RETRY_AFTER_SECONDS)}
+        )
+    future = _hashing_executor.submit(fn, *args)
+    future.add_done_callback(lambda _: _hashing_slots.release())
+    return future
+
+async def get_password_hash_async(password):
+    return await asyncio.wrap_future(_submit_hashing(get_password_hash, password))
+
+async def verify_and_update_password_async(plain_password, hashed_password):
+    """
+    Returns (valid, new_hash). new_hash is set when the stored hash uses an
+    outdated scheme or cost and should be replaced.
+    """
+    return await asyncio.wrap_future(
+        _submit_hashing(pwd_context.verify_and_update, plain_password, hashed_password)
+    )
+
+def get_password_hash_bounded(password):
+    # For sync handlers: waits on the bounded pool instead of hashing inline
+    return _submit_hashing(get_password_hash, password).result()
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     if expires_delta:
@@ -22,4 +69,15 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
\ No newline at end of file
+    return encoded_jwt
+
+def create_refresh_token():
+    """
+    Returns (token, token_hash). Refresh tokens are 256-bit random values, so a
+    plain SHA-256 is sufficient for storage; no bcrypt is involved on refresh.
+    """
+    token = secrets.token_urlsafe(32)
+    return token, hash_refresh_token(token)
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
@@ -0,0 +1,47 @@
+"""
+Basisklasse für Puffer, die periodisch in einem Hintergrund-Thread in die
+Datenbank schreiben (event_buffer.py, heartbeat_buffer.py).
+"""
+import threading
+from abc import ABC, abstractmethod
+
+class BackgroundFlusher(ABC):
+    """
+    Runs flush() on a daemon thread every flush_interval seconds or as soon as
+    wake() is called; stop() ends the thread and flushes a last time.
+    """
+    thread_name = "flusher"
+
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    @abstractmethod
+    def flush(self) -> int:
+        """Write everything buffered; returns the number of rows written."""
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flusher thread and write everything still queued."""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
@@ -0,0 +1,94 @@
+"""
+Lookup-Bedingung für die Blind-Index-Spalte ``users.email_bidx`` (Login per E-Mail)
+sowie ein Befehl zum Nachfüllen von ``email_bidx``/``phone_bidx`` für bestehende Zeilen.
+
+    python blind_index.py backfill --batch-size 500
+"""
+import argparse
+from typing import Dict, List, Tuple
+
+from sqlalchemy import String, bindparam, or_, select, type_coerce, update
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal
+from encryption_utils import email_blind_index, phone_blind_index
+from models import User
+
+users = User.__table__
+
+def email_bidx_condition(email: str):
+    # For column-only queries, e.g. select(User.id, ...).where(email_bidx_condition(...))
+    return User.email_bidx == email_blind_index(email)
+
+def backfill(batch_size: int = 500) -> Tuple[int, List[Dict]]:
+    """
+    Recompute the blind indexes of all users with an email or phone, in
+    keyset-paginated batches with one short transaction per batch.
+
+    Each write is a compare-and-set on the raw email/phone ciphertext, so rows
+    changed since the read keep the index written by the application. Rows whose
+    index collides with another user's (duplicate email or phone) stay empty and
+    are returned as conflicts. Returns (rows updated, conflicts).
+    """
+    updated = 0
+    conflicts: List[Dict] = []
+    last_id = 0
+    raw_email = type_coerce(users.c.email, String)
+    raw_phone = type_coerce(users.c.phone, String)
+    stmt = (
+        update(users)
+        .where(
+            users.c.id == bindparam("row_id"),
+            raw_email.is_not_distinct_from(bindparam("old_email", type_=String)),
+            raw_phone.is_not_distinct_from(bindparam("old_phone", type_=String))
+        )
+        .values(email_bidx=bindparam("new_email_bidx"), phone_bidx=bindparam("new_phone_bidx"))
+    )
+    while True:
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(User.id, User.email, User.phone,
+                       raw_email.label("raw_email"), raw_phone.label("raw_phone"))
+                .where(User.id > last_id, or_(User.email.isnot(None), User.phone.isnot(None)))
+                .order_by(User.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            params = [
+                {
+                    "row_id": row.id,
+                    "old_email": row.raw_email,
+                    "old_phone": row.raw_phone,
+                    "new_email_bidx": email_blind_index(row.email),
+                    "new_phone_bidx": phone_blind_index(row.phone)
+                } for row in rows
+            ]
+            try:
+                updated += db.execute(stmt, params).rowcount
+                db.commit()
+            except IntegrityError:
+                # a duplicate somewhere in the batch: retry row by row to find it
+                db.rollback()
+                for entry in params:
+                    try:
+                        with db.begin_nested():
+                            updated += db.execute(stmt, entry).rowcount
+                    except IntegrityError as e:
+                        conflicts.append({"user_id": entry["row_id"], "error": str(e.orig)})
+                db.commit()
+        finally:
+            db.close()
+        last_id = rows[-1].id
+    return updated, conflicts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Blind-Index-Spalten der Nutzer nachfüllen")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    updated, conflicts = backfill(args.batch_size)
+    print(f"{updated} Nutzer aktualisiert.")
+    for conflict in conflicts:
+        print(f"Nutzer {conflict['user_id']}: doppelte E-Mail oder Telefonnummer, Index nicht gesetzt ({conflict['error']})")
@@ -0,0 +1,162 @@
+"""
+Erzeugung und Zwischenspeicherung von Kurszertifikaten (PDF).
+
+Das Rendern läuft in einem Prozesspool (``CERTIFICATE_WORKERS``), damit
+gleichzeitige Downloads die Request-Threads nicht blockieren; reportlab wird beim
+Import dieses Moduls und damit einmal pro Worker-Prozess geladen. Fertige PDFs
+liegen inhaltsadressiert in ``CERTIFICATE_CACHE_DIR``: der Dateiname ist der
+SHA-256 über Nutzer, Kurs, Name, Abschlussdatum und Kurstitel und dient zugleich
+als ETag. Die Cachegröße wird laufend mitgezählt; überschreitet sie
+``CERTIFICATE_CACHE_MAX_BYTES``, werden die am längsten nicht mehr ausgelieferten
+Dateien gelöscht, bis wieder 10 % Platz frei sind. Alle Dateizugriffe laufen
+außerhalb der Event-Loop.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import List, Optional, Tuple
+
+try:
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+except ImportError:  # optional dependency, checked per request
+    canvas = None
+
+CERTIFICATE_WORKERS = int(os.getenv("CERTIFICATE_WORKERS", "2"))
+CERTIFICATE_CACHE_DIR = os.getenv("CERTIFICATE_CACHE_DIR", "certificate_cache")
+CERTIFICATE_CACHE_MAX_BYTES = int(os.getenv("CERTIFICATE_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+EVICT_TO = 0.9
+
+REPORTLAB_AVAILABLE = canvas is not None
+
+def render_certificate(participant_name: str, course_title: str, completion_date: str) -> bytes:
+    """Draw the certificate PDF; runs in a pool worker process."""
+    buffer = BytesIO()
+    # invariant: no creation timestamp or random id, so equal input gives equal bytes
+    c = canvas.Canvas(buffer, pagesize=letter, invariant=1)
+    width, height = letter
+
+    c.setFont("Helvetica-Bold", 24)
+    c.drawCentredString(width/2, height - 100, "Zertifikat")
+
+    c.setFont("Helvetica", 16)
+    text = f"Hiermit wird bestätigt, dass {participant_name}"
+    c.drawCentredString(width/2, height - 150, text)
+
+    text = f"den Kurs '{course_title}' erfolgreich abgeschlossen hat."
+    c.drawCentredString(width/2, height - 180, text)
+
+    text = f"Abschlussdatum: {completion_date}"
+    c.drawCentredString(width/2, height - 210, text)
+
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+def certificate_key(user_id: int, course_id: int, participant_name: str,
+                    completion_date: str, course_title: str) -> str:
+    payload = json.dumps([user_id, course_id, participant_name, completion_date, course_title])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class CertificateStore:
+    def __init__(self, directory: str = CERTIFICATE_CACHE_DIR,
+                 max_bytes: int = CERTIFICATE_CACHE_MAX_BYTES,
+                 workers: int = CERTIFICATE_WORKERS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        # bytes of PDFs in directory; read from disk on the first store
+        self._size: Optional[int] = None
+
+    def _pool_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def _lookup(self, key: str) -> Optional[str]:
+        path = self.path_for(key)
+        try:
+            # mark as recently served for eviction
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    async def lookup(self, key: str) -> Optional[str]:
+        """Path of the cached PDF for key, or None; the file access runs in a thread."""
+        return await asyncio.get_running_loop().run_in_executor(None, self._lookup, key)
+
+    async def render(self, key: str, participant_name: str, course_title: str, completion_date: str) -> str:
+        """Render in the process pool, store atomically under key and return the path."""
+        loop = asyncio.get_running_loop()
+        pdf = await loop.run_in_executor(
+            self._pool_executor(), render_certificate, participant_name, course_title, completion_date
+        )
+        return await loop.run_in_executor(None, self._store, key, pdf)
+
+    def _store(self, key: str, pdf: bytes) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf)
+        path = self.path_for(key)
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan()[1]
+            try:
+                # a concurrent render of the same key already stored identical bytes
+                replaced = os.path.getsize(path)
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, path)
+            self._size += len(pdf) - replaced
+            if self._size > self.max_bytes:
+                self._evict()
+        return path
+
+    def _scan(self) -> Tuple[List[Tuple[float, int, str]], int]:
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".pdf"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        return entries, total
+
+    def _evict(self) -> None:
+        """
+        Delete least recently served PDFs until the cache is below EVICT_TO of
+        max_bytes, so the following renders do not rescan the directory.
+        """
+        entries, total = self._scan()
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes * EVICT_TO:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        # the scan also corrects the running total for files removed by hand
+        self._size = total
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+certificate_store = CertificateStore()
@@ -0,0 +1,109 @@
+"""
+Live-Kommentare per Server-Sent Events.
+
+``post_comment`` veröffentlicht neue Kommentare im prozesslokalen ``CommentHub``,
+der sie an alle Abonnenten des Kurses verteilt. Jeder Abonnent hat eine begrenzte
+Warteschlange; läuft sie voll, weil der Client nicht schnell genug liest, wird er
+mit einem ``evicted``-Event getrennt und muss neu laden. Abonnenten sehen nur
+Kommentare, die über denselben Worker-Prozess gepostet wurden.
+"""
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Dict, Optional, Set
+
+COMMENT_STREAM_QUEUE_SIZE = int(os.getenv("COMMENT_STREAM_QUEUE_SIZE", "64"))
+COMMENT_STREAM_MAX_SUBSCRIBERS = int(os.getenv("COMMENT_STREAM_MAX_SUBSCRIBERS", "10000"))
+COMMENT_STREAM_KEEPALIVE_SECONDS = float(os.getenv("COMMENT_STREAM_KEEPALIVE_SECONDS", "15"))
+
+class Subscriber:
+    def __init__(self, course_id: int, maxsize: int):
+        self.course_id = course_id
+        self.queue: "asyncio.Queue[Optional[Dict]]" = asyncio.Queue(maxsize=maxsize)
+
+class CommentHub:
+    """Per-course fan-out; all methods must run on the server's event loop."""
+
+    def __init__(self, queue_size: int = COMMENT_STREAM_QUEUE_SIZE,
+                 max_subscribers: int = COMMENT_STREAM_MAX_SUBSCRIBERS):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._courses: Dict[int, Set[Subscriber]] = {}
+        self._count = 0
+        self.metrics = {"published": 0, "delivered": 0, "evicted": 0, "rejected": 0}
+
+    def full(self) -> bool:
+        return self._count >= self.max_subscribers
+
+    def subscribe(self, course_id: int) -> Optional[Subscriber]:
+        """Register a subscriber; returns None when the subscriber limit is reached."""
+        if self.full():
+            self.metrics["rejected"] += 1
+            return None
+        subscriber = Subscriber(course_id, self.queue_size)
+        self._courses.setdefault(course_id, set()).add(subscriber)
+        self._count += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        subscribers = self._courses.get(subscriber.course_id)
+        if subscribers and subscriber in subscribers:
+            subscribers.discard(subscriber)
+            self._count -= 1
+            if not subscribers:
+                del self._courses[subscriber.course_id]
+
+    def _evict(self, subscriber: Subscriber) -> None:
+        self.unsubscribe(subscriber)
+        self.metrics["evicted"] += 1
+        # drop the backlog so the end-of-stream marker fits
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+
+    def publish(self, course_id: int, comment: Dict) -> None:
+        self.metrics["published"] += 1
+        for subscriber in list(self._courses.get(course_id, ())):
+            try:
+                subscriber.queue.put_nowait(comment)
+                self.metrics["delivered"] += 1
+            except asyncio.QueueFull:
+                self._evict(subscriber)
+
+    def stats(self) -> Dict:
+        return dict(self.metrics, subscribers=self._count, courses=len(self._courses))
+
+comment_hub = CommentHub()
+
+def _event(name: str, data: Dict, event_id: Optional[int] = None) -> str:
+    lines = [f"event: {name}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+async def event_stream(course_id: int) -> AsyncIterator[str]:
+    """
+    SSE body for one client. The subscription lives only while the body is
+    iterated, so a client that disconnects before the first chunk leaves nothing behind.
+    """
+    subscriber = None
+    try:
+        subscriber = comment_hub.subscribe(course_id)
+        yield "retry: 3000\n\n"
+        if subscriber is None:
+            # limit reached since the route checked it; the client reconnects after the retry delay
+            return
+        while True:
+            try:
+                comment = await asyncio.wait_for(subscriber.queue.get(), COMMENT_STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if comment is None:
+                yield _event("evicted", {"reason": "slow consumer"})
+                return
+            yield _event("comment", comment, comment["id"])
+    finally:
+        if subscriber is not None:
+            comment_hub.unsubscribe(subscriber)
@@ -0,0 +1,163 @@
+"""
+Kommentar-Threads pro Kurs mit Keyset-Paginierung und prozesslokalem Cache.
+
+Top-Level-Kommentare werden seitenweise nach (timestamp, id) geladen, Antworten
+erst auf Anfrage pro Kommentar. Jede Seite ist genau eine Abfrage, die vom Autor
+nur ``users.username`` mitliest (keine verschlüsselten Spalten) und die Anzahl der
+direkten Antworten mitzählt.
+
+Zwischengespeichert wird pro Kurs nur die erste Seite mit der Standardgröße, je
+Thread-Ebene (Top-Level bzw. Antworten auf einen Kommentar) und höchstens
+``COMMENT_CACHE_PAGES_PER_COURSE`` davon; Folgeseiten mit Cursor kommen immer aus
+der Datenbank. ``post_comment`` verwirft den Eintrag des Kurses. Bei mehreren Worker-Prozessen begrenzt die TTL, wie lange
+ein anderer Worker eine veraltete Seite ausliefert.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from models import Comment, User
+
+COMMENT_PAGE_SIZE = int(os.getenv("COMMENT_PAGE_SIZE", "20"))
+COMMENT_CACHE_COURSES = int(os.getenv("COMMENT_CACHE_COURSES", "1000"))
+COMMENT_CACHE_TTL_SECONDS = float(os.getenv("COMMENT_CACHE_TTL_SECONDS", "30"))
+COMMENT_CACHE_PAGES_PER_COURSE = int(os.getenv("COMMENT_CACHE_PAGES_PER_COURSE", "50"))
+
+def encode_cursor(timestamp: datetime, comment_id: int) -> str:
+    return f"{timestamp.isoformat()}_{comment_id}"
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        timestamp, comment_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(timestamp), int(comment_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Ungültiger Cursor")
+
+def render(row) -> Dict:
+    return {
+        "id": row.id,
+        "course_id": row.course_id,
+        "content": row.content,
+        "timestamp": row.timestamp.isoformat(),
+        "username": row.username or "",
+        "user_id": row.user_id,
+        "parent_id": row.parent_id,
+        "reply_count": row.reply_count
+    }
+
+class CommentThreadCache:
+    """
+    First pages keyed by course and parent_id, LRU-bounded by course count and
+    by pages per course, with a TTL. A per-course generation counter keeps a
+    page computed before an invalidation from being stored after it.
+    """
+
+    def __init__(self, max_courses: int = COMMENT_CACHE_COURSES, ttl: float = COMMENT_CACHE_TTL_SECONDS,
+                 max_pages: int = COMMENT_CACHE_PAGES_PER_COURSE):
+        self.max_courses = max_courses
+        self.max_pages = max_pages
+        self.ttl = ttl
+        self._courses: "OrderedDict[int, tuple]" = OrderedDict()
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def generation(self, course_id: int) -> int:
+        with self._lock:
+            return self._generations.get(course_id, 0)
+
+    def get(self, course_id: int, parent_id: Optional[int]) -> Optional[Dict]:
+        with self._lock:
+            entry = self._courses.get(course_id)
+            if entry is None:
+                return None
+            pages, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._courses[course_id]
+                return None
+            self._courses.move_to_end(course_id)
+            page = pages.get(parent_id)
+            if page is not None:
+                pages.move_to_end(parent_id)
+            return page
+
+    def put(self, course_id: int, parent_id: Optional[int], page: Dict, generation: int) -> None:
+        with self._lock:
+            if self._generations.get(course_id, 0) != generation:
+                return
+            entry = self._courses.get(course_id)
+            if entry is None or entry[1] < time.monotonic():
+                entry = (OrderedDict(), time.monotonic() + self.ttl)
+                self._courses[course_id] = entry
+            pages = entry[0]
+            pages[parent_id] = page
+            pages.move_to_end(parent_id)
+            while len(pages) > self.max_pages:
+                pages.popitem(last=False)
+            self._courses.move_to_end(course_id)
+            while len(self._courses) > self.max_courses:
+                self._courses.popitem(last=False)
+
+    def invalidate(self, course_id: int) -> None:
+        with self._lock:
+            self._courses.pop(course_id, None)
+            self._generations[course_id] = self._generations.get(course_id, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._courses.clear()
+            self._generations.clear()
+
+comment_cache = CommentThreadCache()
+
+def page_query(course_id: int, parent_id: Optional[int], cursor: Optional[str], limit: int):
+    reply = aliased(Comment)
+    reply_count = select(func.count(reply.id)).where(reply.parent_id == Comment.id).scalar_subquery()
+    stmt = (
+        select(
+            Comment.id, Comment.course_id, Comment.content, Comment.timestamp,
+            Comment.user_id, Comment.parent_id, User.username,
+            reply_count.label("reply_count")
+        )
+        .outerjoin(User, User.id == Comment.user_id)
+        .where(Comment.course_id == course_id)
+        .order_by(Comment.timestamp, Comment.id)
+        .limit(limit + 1)
+    )
+    if parent_id is None:
+        stmt = stmt.where(Comment.parent_id.is_(None))
+    else:
+        stmt = stmt.where(Comment.parent_id == parent_id)
+    if cursor:
+        stmt = stmt.where(tuple_(Comment.timestamp, Comment.id) > tuple_(*decode_cursor(cursor)))
+    return stmt
+
+async def _fetch_page(db: AsyncSession, course_id: int, parent_id: Optional[int],
+                      cursor: Optional[str], limit: int) -> Dict:
+    rows = (await db.execute(page_query(course_id, parent_id, cursor, limit))).all()
+    items = [render(row) for row in rows[:limit]]
+    next_cursor = encode_cursor(rows[limit - 1].timestamp, rows[limit - 1].id) if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+async def get_page(db: AsyncSession, course_id: int, parent_id: Optional[int] = None,
+                   cursor: Optional[str] = None, limit: int = COMMENT_PAGE_SIZE) -> Dict:
+    """
+    One page of top-level threads (parent_id None) or of replies to parent_id,
+    oldest first. First pages of the default size are served from the
+    per-course cache; client-chosen cursors and limits never create entries.
+    """
+    if cursor is not None or limit != COMMENT_PAGE_SIZE:
+        return await _fetch_page(db, course_id, parent_id, cursor, limit)
+    page = comment_cache.get(course_id, parent_id)
+    if page is None:
+        generation = comment_cache.generation(course_id)
+        page = await _fetch_page(db, course_id, parent_id, cursor, limit)
+        comment_cache.put(course_id, parent_id, page, generation)
+    return page
@@ -0,0 +1,103 @@
+"""
+Rollup-Tabelle ``course_user_progress`` für die Kurs-Analytics.
+
+Pro (Kurs, Nutzer) wird gespeichert, ob der Kurs geöffnet wurde, wie viele
+Quizantworten abgegeben wurden und wie viele davon richtig waren. Die Zeilen werden
+inkrementell gepflegt: beim Abgeben einer Antwort (``routes/quiz.py``) und beim
+Schreiben gepufferter Öffnungs-Events (``event_buffer.py``).
+
+    python course_progress.py rebuild   # komplett aus den Rohtabellen neu aufbauen
+    python course_progress.py check     # Rollup gegen die Rohtabellen prüfen
+
+Noch nicht geschriebene Events im Puffer eines laufenden Servers erscheinen bei
+``check`` als Abweichung, bis sie geschrieben wurden.
+"""
+import argparse
+import sys
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+RECORD_OPEN = text("""
+    INSERT INTO course_user_progress(course_id, user_id, opened, answered, correct)
+    VALUES(:course_id, :user_id, 1, 0, 0)
+    ON CONFLICT(course_id, user_id) DO UPDATE SET opened = 1
+""")
+
+RECORD_ANSWER = text("""
+    INSERT INTO course_user_progress(course_id, user_id, opened, answered, correct)
+    VALUES(:course_id, :user_id, 0, :answered, :correct)
+    ON CONFLICT(course_id, user_id) DO UPDATE
+      SET answered = course_user_progress.answered + excluded.answered,
+          correct = course_user_progress.correct + excluded.correct
+""")
+
+# Sollzustand, aus den Rohtabellen berechnet
+_DERIVED_SQL = """
+    SELECT course_id, user_id, MAX(opened) AS opened, SUM(answered) AS answered, SUM(correct) AS correct
+    FROM (
+        SELECT course_id, user_id, 1 AS opened, 0 AS answered, 0 AS correct
+        FROM course_open_events GROUP BY course_id, user_id
+        UNION ALL
+        SELECT qq.course_id, qr.user_id, 0, COUNT(*), SUM(CASE WHEN qr.is_correct THEN 1 ELSE 0 END)
+        FROM quiz_responses qr JOIN quiz_questions qq ON qq.id = qr.question_id
+        GROUP BY qq.course_id, qr.user_id
+    )
+    GROUP BY course_id, user_id
+"""
+
+_STORED_SQL = "SELECT course_id, user_id, opened, answered, correct FROM course_user_progress"
+
+def record_opens(conn: Connection, pairs: Iterable[Tuple[int, int]]) -> None:
+    """Mark (course_id, user_id) pairs as opened."""
+    params = [{"course_id": course_id, "user_id": user_id} for course_id, user_id in set(pairs)]
+    if params:
+        conn.execute(RECORD_OPEN, params)
+
+def answer_params(course_id: int, user_id: int, answered: int, correct: int) -> dict:
+    return {"course_id": course_id, "user_id": user_id, "answered": answered, "correct": correct}
+
+def remove_course(conn: Connection, course_id: int) -> None:
+    conn.execute(text("DELETE FROM course_user_progress WHERE course_id = :id"), {"id": course_id})
+
+def rebuild(conn: Connection) -> int:
+    conn.execute(text("DELETE FROM course_user_progress"))
+    result = conn.execute(text(
+        "INSERT INTO course_user_progress(course_id, user_id, opened, answered, correct) " + _DERIVED_SQL
+    ))
+    return result.rowcount
+
+def check(conn: Connection) -> List[str]:
+    """Return one message per (course, user) whose rollup differs from the raw tables."""
+    missing = conn.execute(text(f"{_DERIVED_SQL} EXCEPT {_STORED_SQL}")).fetchall()
+    stale = conn.execute(text(f"{_STORED_SQL} EXCEPT {_DERIVED_SQL}")).fetchall()
+    problems = [
+        f"course {row.course_id}, user {row.user_id}: expected opened={row.opened} "
+        f"answered={row.answered} correct={row.correct}"
+        for row in missing
+    ]
+    problems += [
+        f"course {row.course_id}, user {row.user_id}: stored opened={row.opened} "
+        f"answered={row.answered} correct={row.correct}"
+        for row in stale
+    ]
+    return problems
+
+if __name__ == "__main__":
+    from database import engine
+
+    parser = argparse.ArgumentParser(description="Rollup course_user_progress verwalten")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    args = parser.parse_args()
+    if args.command == "rebuild":
+        with engine.begin() as conn:
+            print(f"{rebuild(conn)} Fortschrittszeilen aufgebaut.")
+    else:
+        with engine.connect() as conn:
+            problems = check(conn)
+        for problem in problems:
+            print(problem)
+        if problems:
+            sys.exit(1)
+        print("Rollup stimmt mit den Rohtabellen überein.")
@@ -0,0 +1,110 @@
+"""
+Volltextsuche über Kurse mit einer SQLite-FTS5-Tabelle ``course_search``.
+
+Die Tabelle enthält pro Kurs (rowid = courses.id) Titel, Kurzbeschreibung und den
+von HTML befreiten Kursinhalt als Klartext; HTML-escaped wird erst der Ausschnitt
+in der Antwort (``render_snippet``). Sie wird in ``routes/courses.py`` beim Anlegen,
+Ändern und Löschen eines Kurses aktualisiert; ``python course_search.py rebuild``
+baut sie vollständig neu auf.
+"""
+import argparse
+import html
+import re
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+_TAG = re.compile(r"<[^>]+>")
+_WHITESPACE = re.compile(r"\s+")
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+CREATE_SEARCH_TABLE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS course_search USING fts5("
+    "title, short_description, content, "
+    "tokenize = 'unicode61 remove_diacritics 2')"
+)
+
+# snippet() delimiters; control characters that cannot occur in indexed text
+_MARK_START = "\x02"
+_MARK_END = "\x03"
+_MARKERS = re.compile(f"[{_MARK_START}{_MARK_END}]")
+
+def _plain(value: Optional[str]) -> str:
+    return _MARKERS.sub("", value or "")
+
+def strip_html(markup: Optional[str]) -> str:
+    plain = html.unescape(_TAG.sub(" ", _plain(markup)))
+    return _WHITESPACE.sub(" ", plain).strip()
+
+def render_snippet(snippet: Optional[str]) -> str:
+    """HTML-escape a raw snippet and turn its delimiters into <mark> highlights."""
+    return (html.escape(snippet or "")
+            .replace(_MARK_START, "<mark>")
+            .replace(_MARK_END, "</mark>"))
+
+def index_course(conn: Connection, course_id: int, title: str,
+                 short_description: Optional[str], course_content: Optional[str]) -> None:
+    conn.execute(text("DELETE FROM course_search WHERE rowid = :id"), {"id": course_id})
+    conn.execute(
+        text("INSERT INTO course_search(rowid, title, short_description, content) "
+             "VALUES (:id, :title, :short_description, :content)"),
+        {
+            "id": course_id,
+            "title": _plain(title),
+            "short_description": _plain(short_description),
+            "content": strip_html(course_content)
+        }
+    )
+
+def remove_course(conn: Connection, course_id: int) -> None:
+    conn.execute(text("DELETE FROM course_search WHERE rowid = :id"), {"id": course_id})
+
+def rebuild(conn: Connection) -> int:
+    conn.execute(text("DELETE FROM course_search"))
+    count = 0
+    rows = conn.execute(text("SELECT id, title, short_description, course_content FROM courses"))
+    for row in rows.fetchall():
+        index_course(conn, row.id, row.title, row.short_description, row.course_content)
+        count += 1
+    return count
+
+def to_match_query(q: str) -> Optional[str]:
+    """
+    Turn free user input into an FTS5 query: every word becomes a quoted
+    prefix term, all terms must match. Returns None if nothing is searchable.
+    """
+    terms = _TERM.findall(q or "")
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+# bm25 weights: title, short_description, content
+SEARCH_SQL = """
+    SELECT c.id, c.title, c.short_description,
+           snippet(course_search, -1, char(2), char(3), '…', 12) AS snippet,
+           {enrolled} AS enrolled
+    FROM course_search
+    JOIN courses c ON c.id = course_search.rowid
+    WHERE course_search MATCH :q
+    ORDER BY bm25(course_search, 10.0, 5.0, 1.0)
+    LIMIT :limit OFFSET :offset
+"""
+
+def search_statement(user_id: Optional[int]):
+    if user_id is None:
+        enrolled = "0"
+    else:
+        enrolled = ("EXISTS (SELECT 1 FROM user_course uc "
+                    "WHERE uc.user_id = :user_id AND uc.course_id = c.id)")
+    return text(SEARCH_SQL.format(enrolled=enrolled))
+
+if __name__ == "__main__":
+    from database import engine
+
+    parser = argparse.ArgumentParser(description="FTS5-Kurssuche verwalten")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+    with engine.begin() as conn:
+        conn.execute(text(CREATE_SEARCH_TABLE))
+        print(f"{rebuild(conn)} Kurse indiziert.")
@@ -1,16 +1,80 @@
 """
 Datenbankkonfiguration für die Lernplattform.
 Verwendet SQLite als Datenbank.
+
+Über die Umgebungsvariable ``DB_ENGINE_MODE`` lässt sich der Engine-Modus wählen:
+- ``default``: klassisches Rollback-Journal (bisheriges Verhalten)
+- ``concurrent``: WAL-Modus mit abgestimmten Pragmas, damit Leser nicht
+  von Schreibzugriffen (Heartbeat, Quiz-Antworten, Öffnungs-Events) blockiert werden
 """
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./learning_platform.db"
-
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./learning_platform.db")
+# Async-Pfad (aiosqlite) für die stark frequentierten Routen
+ASYNC_SQLALCHEMY_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    SQLALCHEMY_DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
 )
 
+DB_ENGINE_MODE = os.getenv("DB_ENGINE_MODE", "concurrent")
+
+# Pragmas für den "concurrent"-Modus, werden auf jeder neuen Verbindung gesetzt
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KIB = int(os.getenv("SQLITE_CACHE_SIZE_KIB", "65536"))
+
+def _apply_pragmas(dbapi_connection, read_only: bool) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        if DB_ENGINE_MODE == "concurrent":
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+            cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+            cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KIB}")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+    finally:
+        cursor.close()
+
+def _create_engine(read_only: bool = False):
+    new_engine = create_engine(
+        SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    )
+    if new_engine.dialect.name == "sqlite":
+        @event.listens_for(new_engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            _apply_pragmas(dbapi_connection, read_only)
+    return new_engine
+
+def _create_async_engine(read_only: bool = False):
+    new_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL)
+    if new_engine.dialect.name == "sqlite":
+        @event.listens_for(new_engine.sync_engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            _apply_pragmas(dbapi_connection, read_only)
+    return new_engine
+
+engine = _create_engine()
+read_engine = _create_engine(read_only=True)
+
+# Schreib-Sessions (Standard) und reine Lese-Sessions für GET-Routen.
+# Die synchronen Factories bleiben für Skripte und die übrigen Routen erhalten.
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+async_engine = _create_async_engine()
+async_read_engine = _create_async_engine(read_only=True)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+AsyncReadSessionLocal = async_sessionmaker(
+    async_read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 
 Base = declarative_base()
@@ -1,9 +1,11 @@
-from database import SessionLocal
+from database import SessionLocal, ReadSessionLocal, AsyncSessionLocal, AsyncReadSessionLocal
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from models import User
+from identity_cache import UserIdentity, identity_cache, identity_query, identity_from_row
 from auth_utils import SECRET_KEY, ALGORITHM
 from typing import Optional
 
@@ -14,28 +16,96 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Async variants for the hot endpoints; the sync generators above stay in use
+# for the remaining routes and for scripts.
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def _decode_user_id(token: str) -> Optional[int]:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("user_id")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Could not validate credentials")
     except JWTError:
+        return None
+    return payload.get("user_id")
+
+def _load_identity(user_id: int, db: Session) -> Optional[UserIdentity]:
+    identity = identity_cache.get(user_id)
+    if identity is None:
+        generation = identity_cache.generation(user_id)
+        row = db.execute(identity_query.where(User.id == user_id)).first()
+        if row is None:
+            return None
+        identity = identity_from_row(row)
+        identity_cache.put(identity, generation)
+    return identity
+
+async def _load_identity_async(user_id: int, db: AsyncSession) -> Optional[UserIdentity]:
+    identity = identity_cache.get(user_id)
+    if identity is None:
+        generation = identity_cache.generation(user_id)
+        row = (await db.execute(identity_query.where(User.id == user_id))).first()
+        if row is None:
+            return None
+        identity = identity_from_row(row)
+        identity_cache.put(identity, generation)
+    return identity
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_read_db)) -> UserIdentity:
+    """
+    Resolve the token to a cached UserIdentity (id, username, role, child flags).
+    Routes that need other columns or mutate the user use get_current_db_user.
+    """
+    user_id = _decode_user_id(token)
+    if user_id is None:
         raise HTTPException(status_code=401, detail="Could not validate credentials")
-    user = db.query(User).filter(User.id == user_id).first()
+    identity = _load_identity(user_id, db)
+    if not identity:
+         raise HTTPException(status_code=404, detail="User not found")
+    return identity
+
+def get_optional_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_read_db)) -> Optional[UserIdentity]:
+    user_id = _decode_user_id(token)
+    if user_id is None:
+        return None
+    return _load_identity(user_id, db)
+
+def get_current_db_user(identity: UserIdentity = Depends(get_current_user), db: Session = Depends(get_db)) -> User:
+    user = db.get(User, identity.id)
     if not user:
          raise HTTPException(status_code=404, detail="User not found")
     return user
 
-def get_optional_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Optional[User]:
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("user_id")
-        if user_id is None:
-            return None
-    except JWTError:
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_read_db)) -> UserIdentity:
+    user_id = _decode_user_id(token)
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Could not validate credentials")
+    identity = await _load_identity_async(user_id, db)
+    if not identity:
+         raise HTTPException(status_code=404, detail="User not found")
+    return identity
+
+async def get_optional_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_read_db)) -> Optional[UserIdentity]:
+    user_id = _decode_user_id(token)
+    if user_id is None:
         return None
-    user = db.query(User).filter(User.id == user_id).first()
-    return user
\ No newline at end of file
+    return await _load_identity_async(user_id, db)
+
+async def get_current_db_user_async(identity: UserIdentity = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)) -> User:
+    user = await db.get(User, identity.id)
+    if not user:
+         raise HTTPException(status_code=404, detail="User not found")
+    return user
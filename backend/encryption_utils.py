@@ -1,24 +1,66 @@
 import os
+import re
 import base64
+import hashlib
+import hmac
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from typing import Dict
 from sqlalchemy.types import TypeDecorator, String
 
 ENCRYPTION_KEY = "0123456789abcdef0123456789abcdef"
 key = ENCRYPTION_KEY.encode("utf-8")
 
+# Separate key for blind indexes (HMAC of the normalized plaintext), so equality
+# lookups on encrypted columns can use a regular unique index.
+BLIND_INDEX_KEY = os.getenv("BLIND_INDEX_KEY", "blind-index-key-change-me").encode("utf-8")
+
+def normalize_email(value: str) -> str:
+    return value.strip().lower()
+
+def normalize_phone(value: str) -> str:
+    return re.sub(r"[^0-9+]", "", value)
+
+def blind_index(value, normalize, purpose: str):
+    if value is None:
+        return None
+    message = purpose.encode("utf-8") + b":" + normalize(value).encode("utf-8")
+    return hmac.new(BLIND_INDEX_KEY, message, hashlib.sha256).hexdigest()
+
+def email_blind_index(value):
+    return blind_index(value, normalize_email, "email")
+
+def phone_blind_index(value):
+    return blind_index(value, normalize_phone, "phone")
+
+# Versioned envelope: "v2:<key id>:<base64(nonce || ciphertext || tag)>" using
+# AES-256-GCM. Values without the prefix are legacy AES-CBC ciphertexts and are
+# still readable; key_rotation.py rewrites them in the current format.
+ENVELOPE_VERSION = "v2"
+
+def _load_keyring() -> Dict[str, AESGCM]:
+    """
+    ENCRYPTION_KEYS="k2:<base64 32-byte key>,k3:..." adds keys; the legacy key
+    is always available as "k1" so existing data stays readable.
+    """
+    keyring = {"k1": AESGCM(key)}
+    for entry in filter(None, os.getenv("ENCRYPTION_KEYS", "").split(",")):
+        key_id, _, encoded = entry.partition(":")
+        keyring[key_id.strip()] = AESGCM(base64.b64decode(encoded.strip()))
+    return keyring
+
+# AESGCM objects are created once per key and reused for every value
+KEYRING = _load_keyring()
+ACTIVE_KEY_ID = os.getenv("ENCRYPTION_ACTIVE_KEY_ID", "k1")
+
 def encrypt(plaintext: str) -> str:
-    plaintext_bytes = plaintext.encode("utf-8")
-    iv = os.urandom(16)
-    padder = padding.PKCS7(128).padder()
-    padded_data = padder.update(plaintext_bytes) + padder.finalize()
-    cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
-    encryptor = cipher.encryptor()
-    ciphertext = encryptor.update(padded_data) + encryptor.finalize()
-    return base64.b64encode(iv + ciphertext).decode("utf-8")
+    nonce = os.urandom(12)
+    sealed = KEYRING[ACTIVE_KEY_ID].encrypt(nonce, plaintext.encode("utf-8"), None)
+    return f"{ENVELOPE_VERSION}:{ACTIVE_KEY_ID}:" + base64.b64encode(nonce + sealed).decode("ascii")
 
-def decrypt(ciphertext_b64: str) -> str:
+def _decrypt_legacy_cbc(ciphertext_b64: str) -> str:
     data = base64.b64decode(ciphertext_b64)
     iv = data[:16]
     ciphertext = data[16:]
@@ -29,6 +71,19 @@ def decrypt(ciphertext_b64: str) -> str:
     plaintext_bytes = unpadder.update(padded_data) + unpadder.finalize()
     return plaintext_bytes.decode("utf-8")
 
+def decrypt(ciphertext: str) -> str:
+    # base64 never contains ":", so a missing prefix means the legacy format
+    if ":" not in ciphertext:
+        return _decrypt_legacy_cbc(ciphertext)
+    version, key_id, payload = ciphertext.split(":", 2)
+    if version != ENVELOPE_VERSION:
+        raise ValueError(f"Unbekanntes Chiffrat-Format: {version}")
+    data = base64.b64decode(payload)
+    return KEYRING[key_id].decrypt(data[:12], data[12:], None).decode("utf-8")
+
+def needs_reencryption(ciphertext: str) -> bool:
+    return not ciphertext.startswith(f"{ENVELOPE_VERSION}:{ACTIVE_KEY_ID}:")
+
 class EncryptedType(TypeDecorator):
     impl = String
     cache_ok = True
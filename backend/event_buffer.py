@@ -0,0 +1,94 @@
+"""
+Write-behind-Puffer für ``CourseOpenEvent``.
+
+``GET /api/courses/{id}`` schreibt nicht mehr selbst in die Datenbank, sondern legt
+das Öffnungs-Event in eine begrenzte Warteschlange. Ein Hintergrund-Thread schreibt
+die Events gesammelt (executemany) weg, sobald ``OPEN_EVENT_FLUSH_SIZE`` Events
+anstehen oder ``OPEN_EVENT_FLUSH_INTERVAL_SECONDS`` vergangen sind. Ist die
+Warteschlange voll, wird das Event verworfen und gezählt. Im selben Schreibvorgang
+wird das Rollup ``course_user_progress`` aktualisiert.
+"""
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import insert
+
+import course_progress
+from background_flusher import BackgroundFlusher
+from database import engine
+from models import CourseOpenEvent
+
+logger = logging.getLogger(__name__)
+
+OPEN_EVENT_QUEUE_SIZE = int(os.getenv("OPEN_EVENT_QUEUE_SIZE", "10000"))
+OPEN_EVENT_FLUSH_SIZE = int(os.getenv("OPEN_EVENT_FLUSH_SIZE", "500"))
+OPEN_EVENT_FLUSH_INTERVAL_SECONDS = float(os.getenv("OPEN_EVENT_FLUSH_INTERVAL_SECONDS", "2"))
+
+class OpenEventBuffer(BackgroundFlusher):
+    thread_name = "open-event-flusher"
+
+    def __init__(self, maxsize: int = OPEN_EVENT_QUEUE_SIZE,
+                 flush_size: int = OPEN_EVENT_FLUSH_SIZE,
+                 flush_interval: float = OPEN_EVENT_FLUSH_INTERVAL_SECONDS):
+        super().__init__(flush_interval)
+        self.maxsize = maxsize
+        self.flush_size = flush_size
+        self._queue: deque = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.metrics = {"enqueued": 0, "dropped": 0, "flushed": 0, "flush_errors": 0}
+
+    def record(self, user_id: int, course_id: int) -> bool:
+        """Queue an open event; returns False if it was dropped because the queue is full."""
+        with self._lock:
+            if len(self._queue) >= self.maxsize:
+                self.metrics["dropped"] += 1
+                return False
+            self._queue.append({"user_id": user_id, "course_id": course_id, "timestamp": datetime.utcnow()})
+            self.metrics["enqueued"] += 1
+            pending = len(self._queue)
+        if pending >= self.flush_size:
+            self.wake()
+        return True
+
+    def _drain(self) -> List[Dict]:
+        with self._lock:
+            batch = list(self._queue)
+            self._queue.clear()
+        return batch
+
+    def flush(self) -> int:
+        """Write all queued events in one transaction; returns the number written."""
+        with self._flush_lock:
+            batch = self._drain()
+            if not batch:
+                return 0
+            try:
+                with engine.begin() as conn:
+                    self._write(conn, batch)
+            except Exception:
+                logger.exception("Flushing %d course open events failed", len(batch))
+                with self._lock:
+                    self.metrics["flush_errors"] += 1
+                    # put them back (oldest first) as far as the queue bound allows
+                    room = self.maxsize - len(self._queue)
+                    self.metrics["dropped"] += max(0, len(batch) - room)
+                    self._queue.extendleft(reversed(batch[:max(0, room)]))
+                return 0
+            with self._lock:
+                self.metrics["flushed"] += len(batch)
+            return len(batch)
+
+    def _write(self, conn, batch: List[Dict]) -> None:
+        conn.execute(insert(CourseOpenEvent.__table__), batch)
+        course_progress.record_opens(conn, ((evt["course_id"], evt["user_id"]) for evt in batch))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self.metrics, pending=len(self._queue), capacity=self.maxsize)
+
+open_event_buffer = OpenEventBuffer()
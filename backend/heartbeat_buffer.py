@@ -0,0 +1,115 @@
+"""
+Sammelt Lernminuten aus ``POST /api/user/heartbeat`` im Speicher.
+
+Pro (Datum, Nutzer) werden die Minuten seit dem letzten Schreiben gezählt und
+alle ``HEARTBEAT_FLUSH_INTERVAL_SECONDS`` oder ab ``HEARTBEAT_FLUSH_MAX_ENTRIES``
+offenen Einträgen mit einem einzigen mehrzeiligen UPSERT addiert. Das UPSERT
+liefert per RETURNING die neuen Gesamtwerte zurück; damit beantwortet der
+Heartbeat den laufenden Stand ohne eigene Lese-Abfrage.
+
+Mehrere Worker-Prozesse addieren jeweils nur ihre eigenen Deltas, es geht also
+keine Minute verloren oder wird doppelt gezählt. Der zurückgegebene Stand enthält
+die noch nicht geschriebenen Minuten anderer Worker erst nach deren nächstem
+Schreiben.
+"""
+import logging
+import os
+import threading
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+
+from background_flusher import BackgroundFlusher
+from database import engine
+from models import UserStatistic
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_FLUSH_INTERVAL_SECONDS = float(os.getenv("HEARTBEAT_FLUSH_INTERVAL_SECONDS", "10"))
+HEARTBEAT_FLUSH_MAX_ENTRIES = int(os.getenv("HEARTBEAT_FLUSH_MAX_ENTRIES", "5000"))
+
+_stats = UserStatistic.__table__
+_upsert = insert(_stats)
+UPSERT_MINUTES = _upsert.on_conflict_do_update(
+    index_elements=[_stats.c.date, _stats.c.user_id],
+    set_={"minutes": _stats.c.minutes + _upsert.excluded.minutes}
+).returning(_stats.c.date, _stats.c.user_id, _stats.c.minutes)
+
+Key = Tuple[date, int]
+
+def stored_minutes_query(user_id: int, day: date):
+    return select(UserStatistic.minutes).filter_by(date=day, user_id=user_id)
+
+def statistics_query(user_id: int):
+    return select(UserStatistic).where(UserStatistic.user_id == user_id).order_by(UserStatistic.date)
+
+class HeartbeatAggregator(BackgroundFlusher):
+    thread_name = "heartbeat-flusher"
+
+    def __init__(self, flush_interval: float = HEARTBEAT_FLUSH_INTERVAL_SECONDS,
+                 max_entries: int = HEARTBEAT_FLUSH_MAX_ENTRIES):
+        super().__init__(flush_interval)
+        self.max_entries = max_entries
+        self._pending: Dict[Key, int] = {}
+        # minutes already stored in the database, as last seen by this process
+        self._stored: Dict[Key, int] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def record(self, user_id: int, day: date, minutes: int = 1) -> Optional[int]:
+        """
+        Add minutes and return the running total, or None if the stored value
+        for the key is not known yet (see set_stored).
+        """
+        key = (day, user_id)
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + minutes
+            pending_entries = len(self._pending)
+            stored = self._stored.get(key)
+            total = None if stored is None else stored + self._pending[key]
+        if pending_entries >= self.max_entries:
+            self.wake()
+        return total
+
+    def set_stored(self, user_id: int, day: date, minutes: int) -> int:
+        """Seed the stored value read once from the database; returns the running total."""
+        key = (day, user_id)
+        with self._lock:
+            stored = self._stored.setdefault(key, minutes)
+            return stored + self._pending.get(key, 0)
+
+    def pending(self, user_id: int, day: date) -> int:
+        """Minutes recorded by this process that are not written yet."""
+        with self._lock:
+            return self._pending.get((day, user_id), 0)
+
+    def flush(self) -> int:
+        """Write all pending minutes with one UPSERT; returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            params = [{"date": day, "user_id": user_id, "minutes": minutes}
+                      for (day, user_id), minutes in batch.items()]
+            try:
+                with engine.begin() as conn:
+                    rows = conn.execute(UPSERT_MINUTES, params).all()
+            except Exception:
+                logger.exception("Flushing %d heartbeat entries failed", len(batch))
+                with self._lock:
+                    for key, minutes in batch.items():
+                        self._pending[key] = self._pending.get(key, 0) + minutes
+                return 0
+            today = date.today()
+            with self._lock:
+                for row in rows:
+                    self._stored[(row.date, row.user_id)] = row.minutes
+                # totals of earlier days are no longer served
+                for key in [key for key in self._stored if key[0] < today and key not in self._pending]:
+                    del self._stored[key]
+            return len(rows)
+
+heartbeat_aggregator = HeartbeatAggregator()
@@ -0,0 +1,99 @@
+"""
+Prozesslokaler Cache für die Identität des angemeldeten Nutzers.
+
+``get_current_user`` benötigt in den meisten Routen nur id und Rolle. Statt bei
+jedem Request die komplette ``User``-Zeile (inkl. Entschlüsselung der
+verschlüsselten Spalten) zu laden, wird ein schlankes ``UserIdentity``-Objekt
+pro Token-Subject (user_id) zwischengespeichert.
+
+Invalidierung erfolgt explizit bei Rollen-, Konto- und Profiländerungen. Bei
+mehreren Worker-Prozessen begrenzt die TTL, wie lange ein anderer Worker eine
+veraltete Identität sehen kann.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional
+
+from sqlalchemy import select
+
+from models import User
+
+IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", "10000"))
+IDENTITY_CACHE_TTL_SECONDS = float(os.getenv("IDENTITY_CACHE_TTL_SECONDS", "60"))
+GENERATION_STRIPES = 4096
+
+@dataclass(frozen=True)
+class UserIdentity:
+    id: int
+    username: str
+    role: str
+    is_child_account: bool
+    parent_user_id: Optional[int]
+
+# Nur diese Spalten werden für die Identität gelesen (keine verschlüsselten Felder)
+identity_query = select(
+    User.id, User.username, User.role, User.is_child_account, User.parent_user_id
+)
+
+def identity_from_row(row) -> UserIdentity:
+    return UserIdentity(
+        id=row.id,
+        username=row.username,
+        role=row.role,
+        is_child_account=bool(row.is_child_account),
+        parent_user_id=row.parent_user_id
+    )
+
+class IdentityCache:
+    """
+    Bounded LRU cache with a per-entry TTL, safe to use from the threadpool.
+    Generation counters (striped by user id, as in quiz_progress.py) keep an
+    identity read before an invalidation, e.g. the old role, from being stored after it.
+    """
+
+    def __init__(self, maxsize: int = IDENTITY_CACHE_SIZE, ttl: float = IDENTITY_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._generations: List[int] = [0] * GENERATION_STRIPES
+        self._lock = threading.Lock()
+
+    def generation(self, user_id: int) -> int:
+        with self._lock:
+            return self._generations[user_id % GENERATION_STRIPES]
+
+    def get(self, user_id: int) -> Optional[UserIdentity]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            identity, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return identity
+
+    def put(self, identity: UserIdentity, generation: int) -> None:
+        with self._lock:
+            if self._generations[identity.id % GENERATION_STRIPES] != generation:
+                return
+            self._entries[identity.id] = (identity, time.monotonic() + self.ttl)
+            self._entries.move_to_end(identity.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._generations[user_id % GENERATION_STRIPES] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            # generations are kept: a read started before clear() must still lose
+            self._entries.clear()
+
+identity_cache = IdentityCache()
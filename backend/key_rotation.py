@@ -0,0 +1,93 @@
+"""
+Verschlüsselt die verschlüsselten Spalten der Tabelle ``users`` mit dem aktiven
+Schlüssel und im aktuellen Chiffrat-Format neu (ENCRYPTION_ACTIVE_KEY_ID).
+
+Die Tabelle wird per Keyset-Paginierung in Batches abgearbeitet; jeder Batch ist
+eine eigene kurze Transaktion, damit der SQLite-Schreiblock nie lange gehalten wird.
+
+    python key_rotation.py --batch-size 200
+"""
+import argparse
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from sqlalchemy import String, bindparam, select, type_coerce, update
+
+from database import SessionLocal
+from encryption_utils import EncryptedType, decrypt, encrypt, needs_reencryption
+from models import User
+
+users = User.__table__
+ENCRYPTED_COLUMNS = [c.name for c in users.columns if isinstance(c.type, EncryptedType)]
+
+def _rewrite_statement(columns: Tuple[str, ...]):
+    # compare-and-set: a value changed since it was read is left alone
+    return (
+        update(users)
+        .where(users.c.id == bindparam("row_id"))
+        .where(*[type_coerce(users.c[name], String) == bindparam(f"old_{name}", type_=String)
+                 for name in columns])
+        .values({name: bindparam(f"new_{name}", type_=String) for name in columns})
+    )
+
+def rotate_users(batch_size: int = 200, pause_seconds: float = 0.0) -> Tuple[int, int]:
+    """
+    Re-encrypt outdated values. Returns (rows rewritten, rows skipped because
+    they changed concurrently); skipped rows are picked up by the next run.
+    """
+    rewritten = 0
+    skipped = 0
+    last_id = 0
+    # Rohwerte lesen/schreiben, ohne dass EncryptedType erneut ver- oder entschlüsselt
+    raw_columns = [type_coerce(users.c[name], String).label(name) for name in ENCRYPTED_COLUMNS]
+    statements: Dict[Tuple[str, ...], object] = {}
+    while True:
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(users.c.id, *raw_columns)
+                .where(users.c.id > last_id)
+                .order_by(users.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            # rows grouped by the set of columns that need re-encryption
+            groups: Dict[Tuple[str, ...], List[Dict]] = defaultdict(list)
+            for row in rows:
+                values = row._mapping
+                stale = tuple(name for name in ENCRYPTED_COLUMNS
+                              if values[name] and needs_reencryption(values[name]))
+                if not stale:
+                    continue
+                entry = {"row_id": row.id}
+                for name in stale:
+                    entry[f"old_{name}"] = values[name]
+                    entry[f"new_{name}"] = encrypt(decrypt(values[name]))
+                groups[stale].append(entry)
+            for columns, params in groups.items():
+                if columns not in statements:
+                    statements[columns] = _rewrite_statement(columns)
+                matched = db.execute(statements[columns], params).rowcount
+                rewritten += matched
+                skipped += len(params) - matched
+            if groups:
+                db.commit()
+        finally:
+            db.close()
+        last_id = rows[-1].id
+        if pause_seconds:
+            time.sleep(pause_seconds)
+    return rewritten, skipped
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verschlüsselte Nutzerspalten neu verschlüsseln")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--pause", type=float, default=0.0,
+                        help="Pause zwischen Batches in Sekunden, um Schreiber nicht zu verdrängen")
+    args = parser.parse_args()
+    rewritten, skipped = rotate_users(args.batch_size, args.pause)
+    print(f"{rewritten} Nutzer neu verschlüsselt.")
+    if skipped:
+        print(f"{skipped} Nutzer zwischenzeitlich geändert und übersprungen; erneut ausführen.")
@@ -0,0 +1,184 @@
+"""
+Ranglisten: global nach ``User.points`` und pro Kurs nach richtig gelösten Fragen.
+
+Global werden nur die Top-K-Einträge und die Zahl der gelisteten Nutzer
+zwischengespeichert; beide kommen aus dem Index ``ix_users_leaderboard``, ohne
+Sortierung der Tabelle. Der eigene Rang ist ein ``COUNT(*)`` der Nutzer mit mehr
+Punkten, ein Bereichsscan auf demselben Index. Kursranglisten werden aus
+``quiz_responses`` berechnet und pro Kurs zwischengespeichert. Alle Snapshots
+laufen nach ``LEADERBOARD_TTL_SECONDS`` ab.
+
+Kinderkonten werden nie gelistet und zählen nicht in den Rang anderer Nutzer; ihr
+eigener Rang wird ihnen trotzdem angezeigt. Der volle Name erscheint nur, wenn
+``is_full_name_public`` gesetzt ist, Benutzername und Punkte sind wie im
+öffentlichen Profil immer sichtbar.
+"""
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from models import QuizQuestion, QuizResponse, User
+
+LEADERBOARD_TOP_K = int(os.getenv("LEADERBOARD_TOP_K", "100"))
+LEADERBOARD_TTL_SECONDS = float(os.getenv("LEADERBOARD_TTL_SECONDS", "30"))
+LEADERBOARD_COURSE_CACHE_SIZE = int(os.getenv("LEADERBOARD_COURSE_CACHE_SIZE", "500"))
+
+def _listed():
+    return User.is_child_account == False
+
+class _Ranking:
+    """Immutable course snapshot: ascending scores for bisect plus the leading entries."""
+
+    def __init__(self, scores: array, top: List[Dict]):
+        self.scores = scores
+        self.top = top
+        self.expires_at = time.monotonic() + LEADERBOARD_TTL_SECONDS
+
+    @property
+    def total(self) -> int:
+        return len(self.scores)
+
+    def rank_of(self, score: int) -> int:
+        """Competition rank (1224) of score among the listed users."""
+        return 1 + len(self.scores) - bisect_right(self.scores, score)
+
+class _TopK:
+    """Immutable snapshot of the global leaderboard's leading entries."""
+
+    def __init__(self, top: List[Dict], total: int):
+        self.top = top
+        self.total = total
+        self.expires_at = time.monotonic() + LEADERBOARD_TTL_SECONDS
+
+def above_query(points: int):
+    return select(func.count()).select_from(User).where(_listed(), User.points > points)
+
+def listed_count_query():
+    return select(func.count()).select_from(User).where(_listed())
+
+def top_k_query():
+    return (
+        select(User.id, User.username, User.points, User.full_name, User.is_full_name_public)
+        .where(_listed())
+        .order_by(User.points.desc(), User.id)
+        .limit(LEADERBOARD_TOP_K)
+    )
+
+def course_ranking_query(course_id: int):
+    solved = func.count(func.distinct(QuizResponse.question_id)).label("solved")
+    return (
+        select(User.id, User.username, solved, func.max(QuizResponse.timestamp).label("finished_at"))
+        .select_from(QuizResponse)
+        .join(QuizQuestion, QuizQuestion.id == QuizResponse.question_id)
+        .join(User, User.id == QuizResponse.user_id)
+        .where(QuizQuestion.course_id == course_id, QuizResponse.is_correct == True, _listed())
+        .group_by(User.id, User.username)
+        # ties: whoever reached the score first
+        .order_by(solved.desc(), func.max(QuizResponse.timestamp), User.id)
+    )
+
+def global_rank(db: Session, points: int) -> int:
+    """Competition rank (1224) of points among the listed users, from the live table."""
+    return 1 + db.execute(above_query(points)).scalar()
+
+def _build_global(db: Session) -> _TopK:
+    total = db.execute(listed_count_query()).scalar()
+    rows = db.execute(top_k_query()).all()
+    top = []
+    for position, row in enumerate(rows, start=1):
+        points = row.points or 0
+        # everyone with more points is listed above, so ties share the first position
+        rank = top[-1]["rank"] if top and top[-1]["points"] == points else position
+        top.append({
+            "rank": rank,
+            "user_id": row.id,
+            "username": row.username,
+            "full_name": row.full_name if row.is_full_name_public else None,
+            "points": points
+        })
+    return _TopK(top, total)
+
+def _build_course(db: Session, course_id: int) -> _Ranking:
+    rows = db.execute(course_ranking_query(course_id)).all()
+    ranking = _Ranking(array("q", sorted(row.solved for row in rows)), [])
+    ranking.top = [
+        {
+            "rank": ranking.rank_of(row.solved),
+            "user_id": row.id,
+            "username": row.username,
+            "solved": row.solved
+        } for row in rows[:LEADERBOARD_TOP_K]
+    ]
+    return ranking
+
+class LeaderboardCache:
+    def __init__(self, course_cache_size: int = LEADERBOARD_COURSE_CACHE_SIZE):
+        self.course_cache_size = course_cache_size
+        self._global: Optional[_TopK] = None
+        self._courses: "OrderedDict[int, _Ranking]" = OrderedDict()
+        self._lock = threading.Lock()
+        # one rebuild per snapshot; concurrent readers wait instead of rebuilding too
+        self._build_lock = threading.Lock()
+        # course_id -> lock held by the request building that course
+        self._course_builds: Dict[int, threading.Lock] = {}
+
+    def global_ranking(self, db: Session) -> _TopK:
+        ranking = self._global
+        if ranking is not None and ranking.expires_at >= time.monotonic():
+            return ranking
+        with self._build_lock:
+            ranking = self._global
+            if ranking is None or ranking.expires_at < time.monotonic():
+                ranking = self._global = _build_global(db)
+            return ranking
+
+    def _cached_course(self, course_id: int) -> Optional[_Ranking]:
+        # caller holds self._lock
+        ranking = self._courses.get(course_id)
+        if ranking is not None and ranking.expires_at >= time.monotonic():
+            self._courses.move_to_end(course_id)
+            return ranking
+        return None
+
+    def course_ranking(self, db: Session, course_id: int) -> _Ranking:
+        while True:
+            with self._lock:
+                ranking = self._cached_course(course_id)
+                if ranking is not None:
+                    return ranking
+                build_lock = self._course_builds.get(course_id)
+                building = build_lock is None
+                if building:
+                    build_lock = self._course_builds[course_id] = threading.Lock()
+                    build_lock.acquire()
+            if building:
+                break
+            # another request is building this course: wait, then re-check
+            with build_lock:
+                pass
+        try:
+            ranking = _build_course(db, course_id)
+            with self._lock:
+                self._courses[course_id] = ranking
+                self._courses.move_to_end(course_id)
+                while len(self._courses) > self.course_cache_size:
+                    self._courses.popitem(last=False)
+            return ranking
+        finally:
+            with self._lock:
+                del self._course_builds[course_id]
+            build_lock.release()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._global = None
+            self._courses.clear()
+
+leaderboard_cache = LeaderboardCache()
@@ -0,0 +1,167 @@
+"""
+Asynchrone Linkprüfung für Kursinhalte.
+
+Beim Speichern eines Kurses wird nur ein Prüfauftrag angelegt (``enqueue_course_check``);
+die eigentlichen HEAD-Anfragen laufen danach als Hintergrundtask mit begrenzter
+Parallelität (global und pro Host). Ergebnisse pro URL werden mit TTL
+kursübergreifend zwischengespeichert, das Ergebnis pro Kurs liegt in der Tabelle
+``course_link_checks`` und wird von ``/link-report`` gelesen.
+"""
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from database import AsyncSessionLocal
+from models import CourseLinkCheck
+
+LINK_CHECK_CONCURRENCY = int(os.getenv("LINK_CHECK_CONCURRENCY", "16"))
+LINK_CHECK_PER_HOST = int(os.getenv("LINK_CHECK_PER_HOST", "4"))
+LINK_CHECK_TIMEOUT_SECONDS = float(os.getenv("LINK_CHECK_TIMEOUT_SECONDS", "5"))
+LINK_CHECK_CACHE_TTL_SECONDS = float(os.getenv("LINK_CHECK_CACHE_TTL_SECONDS", "3600"))
+LINK_CHECK_CACHE_SIZE = int(os.getenv("LINK_CHECK_CACHE_SIZE", "10000"))
+# a job still pending after this long was lost (restart, crash) and is enqueued again
+LINK_CHECK_STALE_AFTER_SECONDS = float(os.getenv("LINK_CHECK_STALE_AFTER_SECONDS", "600"))
+
+_LINK_PATTERN = re.compile(r'href="(https?://[^"]+)"')
+
+def extract_links(html: Optional[str]) -> List[str]:
+    return sorted(set(_LINK_PATTERN.findall(html or "")))
+
+class LinkStatusCache:
+    """Bounded LRU of URL -> broken flag with a TTL, shared by all courses."""
+
+    def __init__(self, maxsize: int = LINK_CHECK_CACHE_SIZE, ttl: float = LINK_CHECK_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> Optional[bool]:
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return None
+            broken, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[url]
+                return None
+            self._entries.move_to_end(url)
+            return broken
+
+    def put(self, url: str, broken: bool) -> None:
+        with self._lock:
+            self._entries[url] = (broken, time.monotonic() + self.ttl)
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def known_broken(self, urls: List[str]) -> List[str]:
+        return [url for url in urls if self.get(url)]
+
+link_cache = LinkStatusCache()
+
+class _Limits:
+    # asyncio primitives are bound to one event loop; rebuild them if the loop changes
+    def __init__(self):
+        self.loop = None
+        self.total = None
+        # host -> [semaphore, checks holding or waiting for it]; only hosts in use are kept
+        self.per_host: Dict[str, list] = {}
+
+    @asynccontextmanager
+    async def slot(self, host: str):
+        """Hold a per-host slot, then a global one, so waiting on a busy host keeps no global slot."""
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.total = asyncio.Semaphore(LINK_CHECK_CONCURRENCY)
+            self.per_host = {}
+        entry = self.per_host.get(host)
+        if entry is None:
+            entry = self.per_host[host] = [asyncio.Semaphore(LINK_CHECK_PER_HOST), 0]
+        entry[1] += 1
+        try:
+            async with entry[0], self.total:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and self.per_host.get(host) is entry:
+                del self.per_host[host]
+
+_limits = _Limits()
+
+async def _is_broken(client: httpx.AsyncClient, url: str) -> bool:
+    async with _limits.slot(urlsplit(url).netloc):
+        try:
+            resp = await client.head(url)
+            if resp.status_code in (405, 501):
+                # some servers do not implement HEAD
+                resp = await client.get(url)
+            return resp.status_code >= 400
+        except Exception:
+            return True
+
+async def check_links(urls: List[str]) -> List[str]:
+    """Return the broken subset of urls, using cached results where possible."""
+    pending = [url for url in urls if link_cache.get(url) is None]
+    if pending:
+        async with httpx.AsyncClient(timeout=LINK_CHECK_TIMEOUT_SECONDS, follow_redirects=True) as client:
+            results = await asyncio.gather(*(_is_broken(client, url) for url in pending))
+        for url, broken in zip(pending, results):
+            link_cache.put(url, broken)
+    return link_cache.known_broken(urls)
+
+def enqueue_course_check(db: Session, course_id: int, html: Optional[str], background_tasks) -> str:
+    """
+    Record a pending check for the course and schedule it after the response.
+    Returns the job id; a newer job for the same course supersedes older ones.
+    """
+    job_id = uuid.uuid4().hex
+    urls = extract_links(html)
+    record = db.get(CourseLinkCheck, course_id)
+    if record is None:
+        record = CourseLinkCheck(course_id=course_id)
+        db.add(record)
+    record.job_id = job_id
+    record.status = "pending"
+    record.queued_at = datetime.utcnow()
+    record.total_checked = len(urls)
+    db.commit()
+    background_tasks.add_task(run_course_check, job_id, course_id, urls)
+    return job_id
+
+def is_stale(record: CourseLinkCheck) -> bool:
+    """True for a pending job whose background task can no longer be running."""
+    if record.status != "pending":
+        return False
+    # rows from before queued_at existed count as stale
+    return (record.queued_at is None
+            or record.queued_at < datetime.utcnow() - timedelta(seconds=LINK_CHECK_STALE_AFTER_SECONDS))
+
+async def run_course_check(job_id: str, course_id: int, urls: List[str]) -> None:
+    broken = await check_links(urls)
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(CourseLinkCheck)
+            .where(CourseLinkCheck.course_id == course_id, CourseLinkCheck.job_id == job_id)
+            .values(
+                status="done",
+                total_checked=len(urls),
+                broken_links=json.dumps(broken),
+                checked_at=datetime.utcnow()
+            )
+        )
+        await db.commit()
@@ -1,20 +1,28 @@
-from fastapi import FastAPI, Depends, HTTPException
+from datetime import date
+from typing import Optional
+from fastapi import FastAPI, Depends, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import inspect, text
-from datetime import date, timedelta
-from database import engine, SessionLocal, Base
-from models import Course, LearningPath, UserStatistic, Comment, User
-from dependencies import get_db, get_current_user
-from auth_utils import get_password_hash
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from models import Course, LearningPath, Comment
+from dependencies import get_read_db, get_async_db, get_async_read_db, get_current_user_async
+from identity_cache import UserIdentity
+from migrations import ensure_schema
+import comment_threads
+from comment_threads import COMMENT_PAGE_SIZE
+from comment_stream import comment_hub, event_stream
+from event_buffer import open_event_buffer
+from heartbeat_buffer import heartbeat_aggregator, statistics_query
+from certificates import certificate_store
+from profile_pictures import picture_store
+from upload_files import UploadFiles
 
 # Routers
 from routes import courses, auth, admin, user, quiz
 from routes.guardian import router as guardian_router
-
-# Create all tables, if they don't exist
-Base.metadata.create_all(bind=engine)
+from routes.leaderboard import router as leaderboard_router
 
 app = FastAPI(
     title="Lernplattform API",
@@ -22,8 +30,8 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Mount static upload directory
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Mount static upload directory (Cache-Header und ETags siehe upload_files.py)
+app.mount("/uploads", UploadFiles(directory="uploads"), name="uploads")
 
 origins = ["http://localhost", "http://localhost:8080"]
 app.add_middleware(
@@ -36,101 +44,25 @@ app.add_middleware(
 
 @app.on_event("startup")
 def startup_event() -> None:
-    # Ensure all tables exist
-    Base.metadata.create_all(bind=engine)
-    inspector = inspect(engine)
-
-    # Migrate courses table
-    if inspector.has_table("courses"):
-        course_columns = [col["name"] for col in inspector.get_columns("courses")]
-        with engine.begin() as connection:
-            if "short_description" not in course_columns:
-                connection.execute(text("ALTER TABLE courses ADD COLUMN short_description VARCHAR"))
-            if "course_content" not in course_columns:
-                connection.execute(text("ALTER TABLE courses ADD COLUMN course_content VARCHAR"))
-
-    with engine.begin() as connection:
-        # Prüfe, ob Index existiert, sonst anlegen
-        result = connection.execute(text("PRAGMA index_list('user_statistics')"))
-        indexes = [row[1] for row in result]
-        if "idx_user_statistics_date_user_id" not in indexes:
-            connection.execute(text("CREATE UNIQUE INDEX idx_user_statistics_date_user_id ON user_statistics(date, user_id)"))
-
-    # Migrate comments table
-    if inspector.has_table("comments"):
-        comment_columns = [col["name"] for col in inspector.get_columns("comments")]
-        with engine.begin() as connection:
-            if "parent_id" not in comment_columns:
-                connection.execute(text("ALTER TABLE comments ADD COLUMN parent_id INTEGER"))
-
-    # Migrate users table to add child flags and parent linkage
-    if inspector.has_table("users"):
-        user_columns = [col["name"] for col in inspector.get_columns("users")]
-        with engine.begin() as connection:
-            if "is_child_account" not in user_columns:
-                connection.execute(text("ALTER TABLE users ADD COLUMN is_child_account BOOLEAN DEFAULT 0"))
-            if "parent_user_id" not in user_columns:
-                connection.execute(text("ALTER TABLE users ADD COLUMN parent_user_id INTEGER"))
-
-    # Migrate user_statistics to add user_id
-    if inspector.has_table("user_statistics"):
-        stat_columns = [col["name"] for col in inspector.get_columns("user_statistics")]
-        with engine.begin() as connection:
-            if "user_id" not in stat_columns:
-                connection.execute(text("ALTER TABLE user_statistics ADD COLUMN user_id INTEGER"))
-
-    # Seed initial data if needed
-    db: Session = SessionLocal()
-    if db.query(Course).first() is None:
-        course1 = Course(
-            title="Digitale Diversität",
-            short_description="Platzhalterinhalte zur digitalen Diversität.",
-            course_content=""
-        )
-        course2 = Course(
-            title="Fortgeschrittene Python-Techniken",
-            short_description="Vertiefung in fortgeschrittene Python-Konzepte.",
-            course_content=""
-        )
-        course3 = Course(
-            title="Datenbanken und SQL",
-            short_description="Einführung in relationale Datenbanken und SQL.",
-            course_content=""
-        )
-        db.add_all([course1, course2, course3])
-        db.commit()
-
-    if db.query(LearningPath).first() is None:
-        courses_all = db.query(Course).all()
-        learning_path = LearningPath(name="Demo Lernpfad", courses=courses_all)
-        db.add(learning_path)
-        db.commit()
-
-    today = date.today()
-    for i in range(7):
-        stat_date = today - timedelta(days=i)
-        if not db.query(UserStatistic).filter(UserStatistic.date == stat_date).first():
-            minutes = 30 + i * 10
-            user_stat = UserStatistic(date=stat_date, minutes=minutes)
-            db.add(user_stat)
-
-    if not db.query(User).filter(User.username == "admin").first():
-        admin_user = User(
-            username="admin",
-            password_hash=get_password_hash("admin"),
-            role="Admin"
-        )
-        db.add(admin_user)
-
-    db.commit()
-    db.close()
+    # Tabellen, Spalten-Migrationen und Demo-Daten werden über migrations.py verwaltet
+    ensure_schema()
+    open_event_buffer.start()
+    heartbeat_aggregator.start()
+
+@app.on_event("shutdown")
+def shutdown_event() -> None:
+    # noch gepufferte Kurs-Öffnungen und Lernminuten vor dem Beenden schreiben
+    open_event_buffer.stop()
+    heartbeat_aggregator.stop()
+    certificate_store.shutdown()
+    picture_store.shutdown()
 
 @app.get("/api")
 def read_api() -> dict:
     return {"message": "Hello from FastAPI with Database, Usage Stats and User Settings!"}
 
 @app.get("/api/learning-paths")
-def get_learning_paths(db: Session = Depends(get_db)) -> list:
+def get_learning_paths(db: Session = Depends(get_read_db)) -> list:
     learning_paths = db.query(LearningPath).all()
     result = []
     for lp in learning_paths:
@@ -148,47 +80,60 @@ def get_learning_paths(db: Session = Depends(get_db)) -> list:
     return result
 
 @app.get("/api/stats")
-def get_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+async def get_stats(
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: UserIdentity = Depends(get_current_user_async)
 ) -> list:
-    stats = db.query(UserStatistic)\
-              .filter(UserStatistic.user_id == current_user.id)\
-              .order_by(UserStatistic.date).all()
-    return [{"date": stat.date.isoformat(), "minutes": stat.minutes} for stat in stats]
+    stats = (await db.execute(statistics_query(current_user.id))).scalars().all()
+    result = [{"date": stat.date.isoformat(), "minutes": stat.minutes} for stat in stats]
+    # heartbeats of this process that the aggregator has not flushed yet
+    today = date.today()
+    pending = heartbeat_aggregator.pending(current_user.id, today)
+    if pending:
+        if result and result[-1]["date"] == today.isoformat():
+            result[-1]["minutes"] += pending
+        else:
+            result.append({"date": today.isoformat(), "minutes": pending})
+    return result
 
 @app.get("/api/comments/{course_id}")
-def get_comments(course_id: int, db: Session = Depends(get_db)) -> list:
-    comments = db.query(Comment).filter(Comment.course_id == course_id).order_by(Comment.timestamp).all()
-    comment_dict = {}
-    for c in comments:
-        comment_dict[c.id] = {
-            "id": c.id,
-            "course_id": c.course_id,
-            "content": c.content,
-            "timestamp": c.timestamp.isoformat(),
-            "username": c.user.username if c.user else "",
-            "user_id": c.user.id if c.user else None,
-            "parent_id": c.parent_id,
-            "replies": []
-        }
-    roots = []
-    for c in comment_dict.values():
-        if c["parent_id"]:
-            parent = comment_dict.get(c["parent_id"])
-            if parent:
-                parent["replies"].append(c)
-            else:
-                roots.append(c)
-        else:
-            roots.append(c)
-    return roots
+async def get_comments(course_id: int,
+                       cursor: Optional[str] = None,
+                       limit: int = Query(COMMENT_PAGE_SIZE, ge=1, le=100),
+                       db: AsyncSession = Depends(get_async_read_db)) -> dict:
+    """
+    One page of top-level comments, oldest first. Pass next_cursor as ?cursor=
+    to get the following page; replies are loaded via .../replies.
+    """
+    page = await comment_threads.get_page(db, course_id, None, cursor, limit)
+    return {"threads": page["items"], "next_cursor": page["next_cursor"]}
+
+@app.get("/api/comments/{course_id}/{comment_id}/replies")
+async def get_comment_replies(course_id: int, comment_id: int,
+                              cursor: Optional[str] = None,
+                              limit: int = Query(COMMENT_PAGE_SIZE, ge=1, le=100),
+                              db: AsyncSession = Depends(get_async_read_db)) -> dict:
+    page = await comment_threads.get_page(db, course_id, comment_id, cursor, limit)
+    return {"replies": page["items"], "next_cursor": page["next_cursor"]}
+
+@app.get("/api/comments/{course_id}/stream")
+async def stream_comments(course_id: int) -> StreamingResponse:
+    """Server-Sent Events with every new comment of the course ('comment' events)."""
+    if comment_hub.full():
+        comment_hub.metrics["rejected"] += 1
+        raise HTTPException(status_code=503, detail="Zu viele Live-Verbindungen",
+                            headers={"Retry-After": "30"})
+    return StreamingResponse(
+        event_stream(course_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.post("/api/comments/{course_id}")
-def post_comment(course_id: int, new_comment: dict,
-                 db: Session = Depends(get_db),
-                 current_user = Depends(get_current_user)) -> dict:
-    course = db.query(Course).filter(Course.id == course_id).first()
+async def post_comment(course_id: int, new_comment: dict,
+                       db: AsyncSession = Depends(get_async_db),
+                       current_user: UserIdentity = Depends(get_current_user_async)) -> dict:
+    course = (await db.execute(select(Course.id).where(Course.id == course_id))).first()
     if not course:
         raise HTTPException(status_code=404, detail="Kurs nicht gefunden")
     content = new_comment.get("content")
@@ -196,9 +141,9 @@ def post_comment(course_id: int, new_comment: dict,
         raise HTTPException(status_code=400, detail="Kommentarinhalt darf nicht leer sein")
     parent_id = new_comment.get("parent_id")
     if parent_id:
-        parent_comment = db.query(Comment).filter(
-            Comment.id == parent_id, Comment.course_id == course_id
-        ).first()
+        parent_comment = (await db.execute(
+            select(Comment.id).where(Comment.id == parent_id, Comment.course_id == course_id)
+        )).first()
         if not parent_comment:
             raise HTTPException(status_code=400, detail="Ungültiger parent_id")
     comment = Comment(course_id=course_id,
@@ -206,9 +151,10 @@ def post_comment(course_id: int, new_comment: dict,
                       user_id=current_user.id,
                       parent_id=parent_id)
     db.add(comment)
-    db.commit()
-    db.refresh(comment)
-    return {
+    await db.commit()
+    await db.refresh(comment)
+    comment_threads.comment_cache.invalidate(course_id)
+    result = {
         "id": comment.id,
         "course_id": comment.course_id,
         "content": comment.content,
@@ -216,8 +162,10 @@ def post_comment(course_id: int, new_comment: dict,
         "username": current_user.username,
         "user_id": current_user.id,
         "parent_id": comment.parent_id,
-        "replies": []
+        "reply_count": 0
     }
+    comment_hub.publish(course_id, result)
+    return result
 
 # Include routers
 app.include_router(courses.router)
@@ -226,6 +174,7 @@ app.include_router(admin.router)
 app.include_router(user.router)
 app.include_router(quiz.router)
 app.include_router(guardian_router)
+app.include_router(leaderboard_router)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,262 @@
+"""
+Versionierte Schema-Migrationen für die Lernplattform.
+
+Die Tabelle ``schema_version`` speichert, welche Migrationsschritte bereits
+angewendet wurden. Beim Start genügt damit eine einzige Versionsabfrage, solange
+das Schema aktuell ist. Neue Schritte werden ans Ende von ``MIGRATIONS`` angehängt
+und niemals umnummeriert.
+
+Aufruf vor einem Deployment:
+    python migrations.py upgrade
+    python migrations.py current
+"""
+import argparse
+import threading
+from datetime import date, datetime, timedelta
+from typing import Callable, List, Tuple
+
+from sqlalchemy import insert, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+
+from database import engine, Base
+
+_migration_lock = threading.Lock()
+
+def _add_missing_columns(conn: Connection, table: str, columns: List[Tuple[str, str]]) -> None:
+    inspector = inspect(conn)
+    if not inspector.has_table(table):
+        return
+    existing = {col["name"] for col in inspector.get_columns(table)}
+    for name, ddl in columns:
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+
+def _m001_baseline(conn: Connection) -> None:
+    # Bringt auch Datenbanken aus der Zeit vor der Versionierung auf Stand
+    import models  # noqa: F401  (registriert alle Tabellen in Base.metadata)
+    Base.metadata.create_all(bind=conn)
+    _add_missing_columns(conn, "courses", [
+        ("short_description", "VARCHAR"),
+        ("course_content", "VARCHAR"),
+    ])
+    _add_missing_columns(conn, "comments", [("parent_id", "INTEGER")])
+    _add_missing_columns(conn, "users", [
+        ("is_child_account", "BOOLEAN DEFAULT 0"),
+        ("parent_user_id", "INTEGER"),
+    ])
+    _add_missing_columns(conn, "user_statistics", [("user_id", "INTEGER")])
+
+def _m002_user_statistics_unique_index(conn: Connection) -> None:
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_user_statistics_date_user_id "
+        "ON user_statistics(date, user_id)"
+    ))
+
+def _m003_seed_demo_data(conn: Connection) -> None:
+    # Nur Spalten aus Schritt 1: die Modelle enthalten Spalten späterer Schritte
+    # (z.B. users.email_bidx), die beim Upgrade hier noch nicht existieren.
+    from models import Course, LearningPath, UserStatistic, User, learningpath_course_association
+    from auth_utils import get_password_hash
+
+    courses = Course.__table__
+    if conn.execute(select(courses.c.id).limit(1)).first() is None:
+        conn.execute(insert(courses), [
+            {
+                "title": "Digitale Diversität",
+                "short_description": "Platzhalterinhalte zur digitalen Diversität.",
+                "course_content": ""
+            },
+            {
+                "title": "Fortgeschrittene Python-Techniken",
+                "short_description": "Vertiefung in fortgeschrittene Python-Konzepte.",
+                "course_content": ""
+            },
+            {
+                "title": "Datenbanken und SQL",
+                "short_description": "Einführung in relationale Datenbanken und SQL.",
+                "course_content": ""
+            },
+        ])
+
+    paths = LearningPath.__table__
+    if conn.execute(select(paths.c.id).limit(1)).first() is None:
+        path_id = conn.execute(insert(paths).values(name="Demo Lernpfad")).inserted_primary_key[0]
+        course_ids = conn.execute(select(courses.c.id)).scalars().all()
+        if course_ids:
+            conn.execute(insert(learningpath_course_association),
+                         [{"learningpath_id": path_id, "course_id": course_id} for course_id in course_ids])
+
+    stats = UserStatistic.__table__
+    today = date.today()
+    seeded_dates = set(conn.execute(
+        select(stats.c.date).where(stats.c.date >= today - timedelta(days=6))
+    ).scalars())
+    missing = [
+        {"date": today - timedelta(days=i), "minutes": 30 + i * 10}
+        for i in range(7) if today - timedelta(days=i) not in seeded_dates
+    ]
+    if missing:
+        conn.execute(insert(stats), missing)
+
+    users = User.__table__
+    if conn.execute(select(users.c.id).where(users.c.username == "admin")).first() is None:
+        conn.execute(insert(users).values(
+            username="admin",
+            password_hash=get_password_hash("admin"),
+            role="Admin"
+        ))
+
+# Indizes für die häufigsten Filter; die Definitionen selbst stehen in models.py
+_HOT_PATH_INDEXES = [
+    ("quiz_responses", "ix_quiz_responses_user_question_correct"),
+    ("quiz_responses", "ix_quiz_responses_question_user"),
+    ("quiz_questions", "ix_quiz_questions_course_id"),
+    ("course_open_events", "ix_course_open_events_course_user"),
+    ("comments", "ix_comments_course_timestamp"),
+    ("user_course", "ix_user_course_user_course"),
+    ("users", "ix_users_parent_user_id"),
+    ("user_statistics", "ix_user_statistics_user_date"),
+]
+
+def _create_model_indexes(conn: Connection, indexes: List[Tuple[str, str]]) -> None:
+    import models  # noqa: F401
+    for table_name, index_name in indexes:
+        table = Base.metadata.tables[table_name]
+        index = next(i for i in table.indexes if i.name == index_name)
+        index.create(bind=conn, checkfirst=True)
+
+def _m004_hot_path_indexes(conn: Connection) -> None:
+    _create_model_indexes(conn, _HOT_PATH_INDEXES)
+
+def _m005_auth_sessions(conn: Connection) -> None:
+    from models import AuthSession
+    AuthSession.__table__.create(bind=conn, checkfirst=True)
+
+def _m006_blind_indexes(conn: Connection) -> None:
+    # Bestehende Zeilen füllt "python blind_index.py backfill" nach
+    _add_missing_columns(conn, "users", [
+        ("email_bidx", "VARCHAR(64)"),
+        ("phone_bidx", "VARCHAR(64)"),
+    ])
+    conn.execute(text("DROP INDEX IF EXISTS ix_users_email"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_users_phone"))
+    _create_model_indexes(conn, [
+        ("users", "ix_users_email_bidx"),
+        ("users", "ix_users_phone_bidx"),
+    ])
+
+def _m007_learning_path_index(conn: Connection) -> None:
+    _create_model_indexes(conn, [("learningpath_course", "ix_learningpath_course_path_course")])
+
+def _m008_course_link_checks(conn: Connection) -> None:
+    from models import CourseLinkCheck
+    CourseLinkCheck.__table__.create(bind=conn, checkfirst=True)
+
+def _m009_course_search(conn: Connection) -> None:
+    import course_search
+    conn.execute(text(course_search.CREATE_SEARCH_TABLE))
+    course_search.rebuild(conn)
+
+def _m010_course_user_progress(conn: Connection) -> None:
+    import course_progress
+    from models import CourseUserProgress
+    CourseUserProgress.__table__.create(bind=conn, checkfirst=True)
+    course_progress.rebuild(conn)
+
+def _m011_comment_thread_indexes(conn: Connection) -> None:
+    _create_model_indexes(conn, [
+        ("comments", "ix_comments_course_parent_timestamp"),
+        ("comments", "ix_comments_parent_timestamp"),
+    ])
+
+def _m012_leaderboard_index(conn: Connection) -> None:
+    # NULLs would fall out of "is_child_account = 0" and the points ordering
+    conn.execute(text("UPDATE users SET is_child_account = 0 WHERE is_child_account IS NULL"))
+    conn.execute(text("UPDATE users SET points = 0 WHERE points IS NULL"))
+    _create_model_indexes(conn, [("users", "ix_users_leaderboard")])
+
+def _m013_course_search_plain_text(conn: Connection) -> None:
+    # Schritt 9 hat HTML-escaped Text indiziert (Tokens wie "amp", "lt")
+    import course_search
+    course_search.rebuild(conn)
+
+def _m014_link_check_queued_at(conn: Connection) -> None:
+    _add_missing_columns(conn, "course_link_checks", [("queued_at", "DATETIME")])
+
+# Geordnete Liste aller Schritte: (Version, Beschreibung, Funktion)
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "baseline schema", _m001_baseline),
+    (2, "unique index on user_statistics(date, user_id)", _m002_user_statistics_unique_index),
+    (3, "seed demo data", _m003_seed_demo_data),
+    (4, "hot-path lookup indexes", _m004_hot_path_indexes),
+    (5, "refresh-token sessions", _m005_auth_sessions),
+    (6, "blind-index columns for users.email/phone", _m006_blind_indexes),
+    (7, "learning path filter index", _m007_learning_path_index),
+    (8, "stored link-check results", _m008_course_link_checks),
+    (9, "FTS5 course search index", _m009_course_search),
+    (10, "course/user progress rollup", _m010_course_user_progress),
+    (11, "comment thread paging indexes", _m011_comment_thread_indexes),
+    (12, "leaderboard index on users.points", _m012_leaderboard_index),
+    (13, "reindex course search as plain text", _m013_course_search_plain_text),
+    (14, "enqueue time of link checks", _m014_link_check_queued_at),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def _ensure_version_table(conn: Connection) -> None:
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, "
+        "description VARCHAR NOT NULL, "
+        "applied_at DATETIME NOT NULL)"
+    ))
+
+def current_version(bind: Engine = engine) -> int:
+    with bind.connect() as conn:
+        try:
+            return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+        except OperationalError:
+            return 0
+
+def upgrade(bind: Engine = engine) -> List[int]:
+    """
+    Apply all pending migrations and return the versions that were applied.
+    The SQLite write lock (BEGIN IMMEDIATE) serializes concurrent workers;
+    the version is re-read once the lock is held.
+    """
+    applied = []
+    with _migration_lock, bind.connect() as raw_conn:
+        conn = raw_conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            _ensure_version_table(conn)
+            version = conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+            for step_version, description, step in MIGRATIONS:
+                if step_version <= version:
+                    continue
+                step(conn)
+                conn.execute(
+                    text("INSERT INTO schema_version(version, description, applied_at) VALUES (:v, :d, :t)"),
+                    {"v": step_version, "d": description, "t": datetime.utcnow()}
+                )
+                applied.append(step_version)
+            conn.exec_driver_sql("COMMIT")
+        except Exception:
+            conn.exec_driver_sql("ROLLBACK")
+            raise
+    return applied
+
+def ensure_schema(bind: Engine = engine) -> None:
+    """Startup hook: a single version check when the schema is current."""
+    if current_version(bind) < LATEST_VERSION:
+        upgrade(bind)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Schema-Migrationen der Lernplattform")
+    parser.add_argument("command", choices=["upgrade", "current"])
+    args = parser.parse_args()
+    if args.command == "upgrade":
+        applied = upgrade()
+        print(f"Angewendet: {applied}" if applied else "Schema ist aktuell.")
+    print(f"Schema-Version: {current_version()} (neueste: {LATEST_VERSION})")
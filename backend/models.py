@@ -1,15 +1,17 @@
-from sqlalchemy import Column, Integer, String, Table, ForeignKey, Date, DateTime, Boolean
-from sqlalchemy.orm import relationship, backref
+from sqlalchemy import Column, Integer, String, Table, ForeignKey, Date, DateTime, Boolean, Index
+from sqlalchemy import event
+from sqlalchemy.orm import relationship, backref, deferred
 from datetime import datetime
 from database import Base
-from encryption_utils import EncryptedType
+from encryption_utils import EncryptedType, email_blind_index, phone_blind_index
 
 # Association table for many-to-many relationship between learning paths and courses
 learningpath_course_association = Table(
     "learningpath_course",
     Base.metadata,
     Column("learningpath_id", Integer, ForeignKey("learning_paths.id")),
-    Column("course_id", Integer, ForeignKey("courses.id"))
+    Column("course_id", Integer, ForeignKey("courses.id")),
+    Index("ix_learningpath_course_path_course", "learningpath_id", "course_id")
 )
 
 # Association table for many-to-many relationship between users and courses (enrollment)
@@ -17,7 +19,8 @@ user_course_association = Table(
     "user_course",
     Base.metadata,
     Column("user_id", Integer, ForeignKey("users.id")),
-    Column("course_id", Integer, ForeignKey("courses.id"))
+    Column("course_id", Integer, ForeignKey("courses.id")),
+    Index("ix_user_course_user_course", "user_id", "course_id")
 )
 
 class Course(Base):
@@ -30,6 +33,7 @@ class Course(Base):
     quiz_questions = relationship("QuizQuestion", back_populates="course", cascade="all, delete")
     open_events = relationship("CourseOpenEvent", back_populates="course", cascade="all, delete")
     users = relationship("User", secondary=user_course_association, back_populates="courses")
+    link_check = relationship("CourseLinkCheck", uselist=False, cascade="all, delete")
 
 class LearningPath(Base):
     __tablename__ = "learning_paths"
@@ -49,6 +53,10 @@ class UserStatistic(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     user = relationship("User", back_populates="statistics")
 
+    __table_args__ = (
+        Index("ix_user_statistics_user_date", "user_id", "date"),
+    )
+
 class Comment(Base):
     __tablename__ = "comments"
     id = Column(Integer, primary_key=True, index=True)
@@ -64,21 +72,37 @@ class Comment(Base):
     course = relationship("Course", back_populates="comments")
     user = relationship("User")
 
+    __table_args__ = (
+        Index("ix_comments_course_timestamp", "course_id", "timestamp"),
+        # keyset pages of top-level threads and of replies, ordered by (timestamp, id)
+        Index("ix_comments_course_parent_timestamp", "course_id", "parent_id", "timestamp", "id"),
+        Index("ix_comments_parent_timestamp", "parent_id", "timestamp", "id"),
+    )
+
+# Name of the deferred column group holding the encrypted User fields
+ENCRYPTED_PROFILE_GROUP = "encrypted_profile"
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, index=True)
-    email = Column(EncryptedType(256), unique=True, index=True, nullable=True)
-    phone = Column(EncryptedType(64), unique=True, index=True, nullable=True)
+    # Random-IV ciphertexts cannot be indexed; uniqueness and lookups go
+    # through the HMAC blind-index columns below (kept in sync by set events).
+    # Encrypted profile columns are deferred as one group, so list and auth
+    # queries never decrypt them; the first access loads the whole group.
+    email = deferred(Column(EncryptedType(256), nullable=True), group=ENCRYPTED_PROFILE_GROUP)
+    phone = deferred(Column(EncryptedType(64), nullable=True), group=ENCRYPTED_PROFILE_GROUP)
+    email_bidx = Column(String(64), unique=True, index=True, nullable=True)
+    phone_bidx = Column(String(64), unique=True, index=True, nullable=True)
     password_hash = Column(String)
     role = Column(String, default="User")
     daily_target = Column(Integer, default=60)
     points = Column(Integer, default=0)
-    full_name = Column(EncryptedType(128), nullable=True)
+    full_name = deferred(Column(EncryptedType(128), nullable=True), group=ENCRYPTED_PROFILE_GROUP)
     age = Column(Integer, default=0)
     birth_date = Column(Date, nullable=True)
-    short_description = Column(EncryptedType(1024), nullable=True)
-    profile_picture = Column(EncryptedType(256), nullable=True)
+    short_description = deferred(Column(EncryptedType(1024), nullable=True), group=ENCRYPTED_PROFILE_GROUP)
+    profile_picture = deferred(Column(EncryptedType(256), nullable=True), group=ENCRYPTED_PROFILE_GROUP)
     is_full_name_public = Column(Boolean, default=True)
     is_age_public = Column(Boolean, default=True)
     is_description_public = Column(Boolean, default=True)
@@ -90,7 +114,7 @@ class User(Base):
 
     # child-account flag and parent linkage
     is_child_account = Column(Boolean, default=False)
-    parent_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    parent_user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
 
     children = relationship(
         "User",
@@ -107,6 +131,17 @@ class User(Base):
         cascade="all, delete"
     )
 
+# Leaderboard: listed users by points, readable in rank order without sorting
+Index("ix_users_leaderboard", User.is_child_account, User.points.desc(), User.id)
+
+@event.listens_for(User.email, "set")
+def _sync_email_bidx(target, value, oldvalue, initiator):
+    target.email_bidx = email_blind_index(value)
+
+@event.listens_for(User.phone, "set")
+def _sync_phone_bidx(target, value, oldvalue, initiator):
+    target.phone_bidx = phone_blind_index(value)
+
 class TutorialStatus(Base):
     __tablename__ = "tutorial_statuses"
     id = Column(Integer, primary_key=True, index=True)
@@ -118,7 +153,7 @@ class TutorialStatus(Base):
 class QuizQuestion(Base):
     __tablename__ = "quiz_questions"
     id = Column(Integer, primary_key=True, index=True)
-    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False, index=True)
     question_text = Column(String, nullable=False)
     option1 = Column(String, nullable=False)
     option2 = Column(String, nullable=False)
@@ -137,6 +172,13 @@ class QuizResponse(Base):
     user = relationship("User", backref="quiz_responses")
     question = relationship("QuizQuestion", backref="responses")
 
+    __table_args__ = (
+        # "correctly answered?" probes per user and question
+        Index("ix_quiz_responses_user_question_correct", "user_id", "question_id", "is_correct"),
+        # per-course analytics join from quiz_questions
+        Index("ix_quiz_responses_question_user", "question_id", "user_id"),
+    )
+
 class CourseOpenEvent(Base):
     __tablename__ = "course_open_events"
     id = Column(Integer, primary_key=True, index=True)
@@ -144,4 +186,41 @@ class CourseOpenEvent(Base):
     course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow)
     user = relationship("User", back_populates="course_open_events")
-    course = relationship("Course", back_populates="open_events")
\ No newline at end of file
+    course = relationship("Course", back_populates="open_events")
+
+    __table_args__ = (
+        Index("ix_course_open_events_course_user", "course_id", "user_id"),
+    )
+
+class AuthSession(Base):
+    """Server-side refresh-token session; only the SHA-256 of the token is stored."""
+    __tablename__ = "auth_sessions"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    token_hash = Column(String(64), nullable=False, unique=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+    revoked = Column(Boolean, default=False)
+
+class CourseLinkCheck(Base):
+    """Latest link check per course, written by the background link checker."""
+    __tablename__ = "course_link_checks"
+    course_id = Column(Integer, ForeignKey("courses.id"), primary_key=True)
+    job_id = Column(String(32), nullable=False)
+    status = Column(String, default="pending")
+    total_checked = Column(Integer, default=0)
+    broken_links = Column(String, default="[]")  # JSON list
+    checked_at = Column(DateTime, nullable=True)
+    queued_at = Column(DateTime, nullable=True)
+
+class CourseUserProgress(Base):
+    """
+    Rollup per (course, user), maintained incrementally by quiz submissions and
+    flushed open events; see course_progress.py.
+    """
+    __tablename__ = "course_user_progress"
+    course_id = Column(Integer, ForeignKey("courses.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    opened = Column(Boolean, nullable=False, default=False)
+    answered = Column(Integer, nullable=False, default=0)  # number of quiz responses
+    correct = Column(Integer, nullable=False, default=0)   # number of correct responses
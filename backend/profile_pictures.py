@@ -0,0 +1,216 @@
+"""
+Ablage von Profilbildern nach Inhalts-Hash mit vorberechneten Vorschaubildern.
+
+Uploads werden in Blöcken gelesen, dabei gehasht und in eine temporäre Datei unter
+``uploads/tmp`` geschrieben; überschreitet ein Upload ``PROFILE_PICTURE_MAX_BYTES``,
+wird abgebrochen (413). Gespeichert wird unter
+
+    uploads/images/<sha[:2]>/<sha>/original.<format>
+    uploads/images/<sha[:2]>/<sha>/<größe>.webp
+
+sodass identische Bilder nur einmal abgelegt werden und Dateinamen der Clients
+keine Rolle mehr spielen. Prüfung des Bildes und Erzeugung der Vorschaubilder
+(``PROFILE_PICTURE_SIZES``) laufen in einem Prozesspool. Pillow ist optional:
+ohne Pillow werden Bilder nicht angenommen.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from typing import BinaryIO, Dict, Iterable, Optional, Tuple
+
+from fastapi import HTTPException
+
+try:
+    from PIL import Image
+except ImportError:  # optional dependency, checked per upload
+    Image = None
+
+UPLOAD_DIR = "uploads"
+IMAGE_DIR = os.path.join(UPLOAD_DIR, "images")
+TMP_DIR = os.path.join(UPLOAD_DIR, "tmp")
+
+PROFILE_PICTURE_MAX_BYTES = int(os.getenv("PROFILE_PICTURE_MAX_BYTES", str(10 * 1024 * 1024)))
+PROFILE_PICTURE_SIZES = tuple(sorted(int(s) for s in os.getenv("PROFILE_PICTURE_SIZES", "64,128,256").split(",")))
+PROFILE_PICTURE_WORKERS = int(os.getenv("PROFILE_PICTURE_WORKERS", "2"))
+PROFILE_PICTURE_TIMEOUT_SECONDS = float(os.getenv("PROFILE_PICTURE_TIMEOUT_SECONDS", "30"))
+CHUNK_SIZE = 64 * 1024
+
+PILLOW_AVAILABLE = Image is not None
+_FORMAT_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "GIF": "gif", "WEBP": "webp"}
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def _save_atomic(image, path: str, **options) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+    try:
+        image.save(tmp_path, **options)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+def process_image(tmp_path: str, directory: str, sizes: Tuple[int, ...]) -> str:
+    """
+    Validate the upload, write the thumbnails and move the original into
+    directory; runs in a pool worker process. Returns the original's file name.
+    """
+    with Image.open(tmp_path) as image:
+        image.verify()
+    with Image.open(tmp_path) as image:
+        extension = _FORMAT_EXTENSIONS.get(image.format)
+        if extension is None:
+            raise ValueError(f"Bildformat {image.format} wird nicht unterstützt")
+        image.load()
+        image = image.convert("RGBA" if "A" in image.getbands() or image.mode == "P" else "RGB")
+    os.makedirs(directory, exist_ok=True)
+    for size in sizes:
+        thumbnail = image.copy()
+        thumbnail.thumbnail((size, size))
+        _save_atomic(thumbnail, os.path.join(directory, f"{size}.webp"), format="WEBP", quality=85)
+    name = f"original.{extension}"
+    os.replace(tmp_path, os.path.join(directory, name))
+    return name
+
+def variant_urls(stored_path: Optional[str]) -> Dict[str, str]:
+    """
+    Map "original" and each generated size to its path below uploads/.
+    Pictures stored before the hash layout only have an original.
+    """
+    if not stored_path:
+        return {}
+    urls = {"original": stored_path}
+    directory = os.path.dirname(stored_path)
+    if directory.startswith(IMAGE_DIR.replace(os.sep, "/")):
+        for size in PROFILE_PICTURE_SIZES:
+            path = f"{directory}/{size}.webp"
+            if os.path.exists(path):
+                urls[str(size)] = path
+    return urls
+
+def best_variant(stored_path: Optional[str], size: Optional[int]) -> Optional[str]:
+    """Smallest variant at least size pixels wide, else the largest; original if size is None."""
+    urls = variant_urls(stored_path)
+    if not urls:
+        return None
+    sizes = sorted(int(key) for key in urls if key != "original")
+    if size is None or not sizes:
+        return urls["original"]
+    fitting = [s for s in sizes if s >= size]
+    return urls[str(fitting[0] if fitting else sizes[-1])]
+
+class PictureStore:
+    def __init__(self, workers: int = PROFILE_PICTURE_WORKERS):
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _pool_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def open_temp(self) -> Tuple[BinaryIO, str]:
+        os.makedirs(TMP_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=TMP_DIR, suffix=".upload")
+        return os.fdopen(fd, "wb"), tmp_path
+
+    def spool(self, chunks: Iterable[bytes]) -> Tuple[str, str]:
+        """Write chunks to a temp file while hashing; returns (tmp_path, sha256)."""
+        f, tmp_path = self.open_temp()
+        writer = UploadWriter(f, tmp_path)
+        try:
+            for chunk in chunks:
+                writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.finish()
+
+    def store(self, tmp_path: str, digest: str) -> str:
+        """Move a spooled upload into the hash layout; returns the original's path."""
+        if not PILLOW_AVAILABLE:
+            os.remove(tmp_path)
+            raise HTTPException(status_code=500, detail="Pillow nicht installiert.")
+        directory = os.path.join(IMAGE_DIR, digest[:2], digest).replace("\\", "/")
+        existing = self._existing_original(directory)
+        if existing:
+            # dedupe: same content already stored with all variants
+            os.remove(tmp_path)
+            return existing
+        future = self._pool_executor().submit(process_image, tmp_path, directory, PROFILE_PICTURE_SIZES)
+        try:
+            name = future.result(timeout=PROFILE_PICTURE_TIMEOUT_SECONDS)
+        except TimeoutError:
+            if future.cancel():
+                _remove_quietly(tmp_path)
+            else:
+                # the worker still owns the file; clean up once it is done with it
+                future.add_done_callback(lambda _: _remove_quietly(tmp_path))
+            raise HTTPException(status_code=503, detail="Bildverarbeitung ausgelastet, bitte später erneut versuchen")
+        except Exception:
+            _remove_quietly(tmp_path)
+            raise HTTPException(status_code=400, detail="Ungültige oder nicht unterstützte Bilddatei")
+        return f"{directory}/{name}"
+
+    def _existing_original(self, directory: str) -> Optional[str]:
+        if not os.path.isdir(directory):
+            return None
+        names = os.listdir(directory)
+        original = next((n for n in names if n.startswith("original.")), None)
+        if original and all(f"{size}.webp" in names for size in PROFILE_PICTURE_SIZES):
+            return f"{directory}/{original}"
+        return None
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+class UploadWriter:
+    """Incremental writer that hashes and enforces PROFILE_PICTURE_MAX_BYTES."""
+
+    def __init__(self, f: BinaryIO, tmp_path: str):
+        self.f = f
+        self.tmp_path = tmp_path
+        self.size = 0
+        self.sha = hashlib.sha256()
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > PROFILE_PICTURE_MAX_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Profilbild ist größer als {PROFILE_PICTURE_MAX_BYTES // (1024 * 1024)} MB"
+            )
+        self.sha.update(chunk)
+        self.f.write(chunk)
+
+    def abort(self) -> None:
+        self.f.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def finish(self) -> Tuple[str, str]:
+        self.f.close()
+        if self.size == 0:
+            os.remove(self.tmp_path)
+            raise HTTPException(status_code=400, detail="Leere Bilddatei")
+        return self.tmp_path, self.sha.hexdigest()
+
+def read_chunks(f: BinaryIO) -> Iterable[bytes]:
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+picture_store = PictureStore()
@@ -0,0 +1,124 @@
+"""
+Query-Plan-Audit für die häufigsten Abfragen der Routen.
+
+Jede Abfrage aus ``AUDITED_QUERIES`` wird mit ``EXPLAIN QUERY PLAN`` gegen die
+konfigurierte Datenbank ausgeführt. Fällt eine Abfrage auf einen vollständigen
+Tabellenscan zurück und hat die Tabelle mehr als ``--min-rows`` Zeilen, endet
+der Befehl mit Exit-Code 1.
+
+    python query_audit.py --min-rows 1000
+
+Die Abfragen kommen aus denselben Query-Buildern, die auch die Routen ausführen,
+und werden für den SQLite-Dialekt kompiliert; eine geänderte Route wird also
+ohne Nachpflege hier mitgeprüft.
+"""
+import argparse
+import re
+import sys
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import Executable
+
+import comment_threads
+import heartbeat_buffer
+import leaderboard
+from blind_index import email_bidx_condition
+from database import engine
+from identity_cache import identity_query
+from models import User
+from quiz_progress import correct_question_ids_query
+from routes import auth, courses, guardian, quiz
+
+class AuditedQuery(NamedTuple):
+    route: str
+    statement: Executable
+    # Tabellen, deren vollständiges Lesen zur Route gehört (z. B. Katalogliste)
+    allow_scan: Tuple[str, ...] = ()
+
+AUDITED_QUERIES: List[AuditedQuery] = [
+    AuditedQuery("auth.login", auth.credentials_query.where(User.username == "admin")),
+    AuditedQuery("auth.login (email)", auth.credentials_query.where(email_bidx_condition("admin@example.org"))),
+    AuditedQuery("dependencies.get_current_user", identity_query.where(User.id == 1)),
+    AuditedQuery("courses.read_courses", courses.catalog_query(1, after_id=0, limit=50)),
+    AuditedQuery("courses.read_courses (learning path)", courses.catalog_query(1, learning_path_id=1)),
+    AuditedQuery("courses.read_course", courses.course_query(1)),
+    AuditedQuery("courses.course_analytics", courses.analytics_query(1)),
+    AuditedQuery("quiz.get_quiz_questions", quiz.questions_query(1)),
+    AuditedQuery("quiz_progress.correct_question_ids", correct_question_ids_query(1, 1)),
+    AuditedQuery(
+        "main.get_comments",
+        comment_threads.page_query(
+            1, None, comment_threads.encode_cursor(datetime(2024, 1, 1), 0), comment_threads.COMMENT_PAGE_SIZE
+        ),
+    ),
+    AuditedQuery(
+        "main.get_comment_replies",
+        comment_threads.page_query(1, 1, None, comment_threads.COMMENT_PAGE_SIZE),
+    ),
+    AuditedQuery("main.get_stats", heartbeat_buffer.statistics_query(1)),
+    AuditedQuery("user.heartbeat", heartbeat_buffer.stored_minutes_query(1, datetime(2024, 1, 1).date())),
+    AuditedQuery("leaderboard.global (listed)", leaderboard.listed_count_query()),
+    AuditedQuery("leaderboard.global (top k)", leaderboard.top_k_query()),
+    AuditedQuery("leaderboard.me", leaderboard.above_query(100)),
+    AuditedQuery("leaderboard.course", leaderboard.course_ranking_query(1)),
+    AuditedQuery("guardian.list_children", guardian.children_query(1)),
+    AuditedQuery("guardian.list_child_courses (opened)", guardian.opened_query(1, 1)),
+    AuditedQuery("guardian.list_child_courses (answered)", guardian.answered_query(1, 1)),
+]
+
+# "SCAN quiz_responses" oder "SCAN qr" (Alias) ohne Index
+_FULL_SCAN = re.compile(r"^SCAN (\w+)(?: AS (\w+))?$")
+_ALIAS = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)\s+(?:AS\s+)?(\w+)", re.IGNORECASE)
+
+def _resolve_tables(sql: str) -> Dict[str, str]:
+    aliases = {}
+    for table, alias in _ALIAS.findall(sql):
+        if alias.upper() not in ("WHERE", "JOIN", "ON", "GROUP", "ORDER", "LIMIT", "LEFT", "INNER"):
+            aliases[alias] = table
+        aliases[table] = table
+    return aliases
+
+def _row_count(conn: Connection, table: str, cache: Dict[str, int]) -> int:
+    if table not in cache:
+        cache[table] = conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+    return cache[table]
+
+def audit(conn: Connection, min_rows: int) -> List[str]:
+    """Return one message per query that full-scans a table above min_rows."""
+    failures = []
+    counts: Dict[str, int] = {}
+    for query in AUDITED_QUERIES:
+        compiled = query.statement.compile(dialect=conn.dialect)
+        params = compiled.construct_params()
+        tables = _resolve_tables(compiled.string)
+        plan = conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN " + compiled.string,
+            tuple(params[name] for name in compiled.positiontup)
+        ).fetchall()
+        for row in plan:
+            match = _FULL_SCAN.match(row[-1])
+            if not match:
+                continue
+            table = tables.get(match.group(2) or match.group(1), match.group(1))
+            if table in query.allow_scan:
+                continue
+            rows = _row_count(conn, table, counts)
+            if rows > min_rows:
+                failures.append(f"{query.route}: full scan of {table} ({rows} rows): {row[-1]}")
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EXPLAIN-QUERY-PLAN-Audit der Routen-Abfragen")
+    parser.add_argument("--min-rows", type=int, default=1000,
+                        help="Tabellenscans unterhalb dieser Zeilenzahl werden toleriert")
+    args = parser.parse_args()
+    with engine.connect() as conn:
+        problems = audit(conn, args.min_rows)
+    for problem in problems:
+        print(problem)
+    if problems:
+        sys.exit(1)
+    print(f"{len(AUDITED_QUERIES)} Abfragen geprüft, keine Tabellenscans über {args.min_rows} Zeilen.")
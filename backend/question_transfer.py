@@ -0,0 +1,181 @@
+"""
+Massenimport und -export von Quizfragen (CSV und NDJSON) sowie Kursexport.
+
+Der Import liest die hochgeladene Datei zeilenweise, prüft jede Zeile gegen die
+Spalten von ``QuizQuestion`` und schreibt gültige Zeilen in Transaktionen zu je
+``QUESTION_IMPORT_CHUNK_SIZE`` Zeilen (executemany). Ungültige Zeilen werden mit
+Zeilennummer gemeldet und übersprungen.
+
+Die Exporte lesen mit einer eigenen Lese-Session in Batches (``yield_per``) und
+geben die Ausgabe stückweise an ``StreamingResponse`` weiter, ohne das Ergebnis
+vollständig im Speicher zu halten.
+"""
+import csv
+import io
+import json
+import os
+from typing import BinaryIO, Dict, Iterator, List, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from database import ReadSessionLocal
+from models import Course, QuizQuestion
+
+QUESTION_IMPORT_CHUNK_SIZE = int(os.getenv("QUESTION_IMPORT_CHUNK_SIZE", "500"))
+QUESTION_IMPORT_MAX_ERRORS = int(os.getenv("QUESTION_IMPORT_MAX_ERRORS", "1000"))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+
+QUESTION_FIELDS = ["question_text", "option1", "option2", "option3", "option4", "correct_option"]
+FORMATS = ("csv", "ndjson")
+
+def validate_question(raw) -> Dict:
+    """Map one parsed row onto QuizQuestion columns; raises ValueError with a message."""
+    if not isinstance(raw, dict):
+        raise ValueError("Zeile ist kein Objekt")
+    row = {}
+    for field in QUESTION_FIELDS[:-1]:
+        value = raw.get(field)
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f"Feld '{field}' fehlt oder ist leer")
+        row[field] = value.strip()
+    try:
+        correct_option = int(raw.get("correct_option"))
+    except (TypeError, ValueError):
+        raise ValueError("Feld 'correct_option' muss eine Zahl sein")
+    if correct_option not in (1, 2, 3, 4):
+        raise ValueError("Feld 'correct_option' muss zwischen 1 und 4 liegen")
+    row["correct_option"] = correct_option
+    return row
+
+def _parse_csv(stream: io.TextIOBase) -> Iterator[Tuple[int, object]]:
+    reader = csv.DictReader(stream)
+    missing = [field for field in QUESTION_FIELDS if field not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"CSV-Kopfzeile ohne Spalten: {', '.join(missing)}")
+    for row in reader:
+        # line_num counts physical lines, so multi-line quoted fields keep their position
+        yield reader.line_num, row
+
+def _parse_ndjson(stream: io.TextIOBase) -> Iterator[Tuple[int, object]]:
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, ValueError(f"Ungültiges JSON: {e.msg}")
+
+def import_questions(db: Session, course_id: int, upload: BinaryIO, fmt: str) -> Dict:
+    """
+    Import questions from a binary file object; returns counts and per-row errors.
+
+    Chunks are committed as they fill up. If the file becomes unreadable after
+    a chunk was committed (e.g. broken encoding further down), the import stops
+    and returns what was stored, with "aborted" set and the reason as the last
+    error, so the client does not retry rows that already exist. ValueError is
+    raised only while nothing has been stored yet.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unbekanntes Format '{fmt}'")
+    stream = io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
+    imported = 0
+    failed = 0
+    errors: List[Dict] = []
+    chunk: List[Dict] = []
+    stmt = insert(QuizQuestion.__table__)
+    line_no = 0
+    # last line whose row is committed; everything after it is not stored
+    committed_line = 0
+    aborted = False
+
+    def flush():
+        nonlocal imported, committed_line
+        if chunk:
+            db.execute(stmt, chunk)
+            db.commit()
+            imported += len(chunk)
+            chunk.clear()
+        committed_line = line_no
+
+    try:
+        rows = _parse_csv(stream) if fmt == "csv" else _parse_ndjson(stream)
+        for line_no, raw in rows:
+            try:
+                if isinstance(raw, ValueError):
+                    raise raw
+                row = validate_question(raw)
+            except ValueError as e:
+                failed += 1
+                if len(errors) < QUESTION_IMPORT_MAX_ERRORS:
+                    errors.append({"line": line_no, "error": str(e)})
+                continue
+            row["course_id"] = course_id
+            chunk.append(row)
+            if len(chunk) >= QUESTION_IMPORT_CHUNK_SIZE:
+                flush()
+        flush()
+    except (ValueError, csv.Error) as e:
+        # rows of the unfinished chunk are dropped together with the rest of the file
+        db.rollback()
+        if imported == 0:
+            raise
+        aborted = True
+        errors.append({"line": committed_line + 1,
+                       "error": f"Import ab dieser Zeile abgebrochen, Datei nicht lesbar: {e}"})
+    finally:
+        stream.detach()
+    return {"imported": imported, "failed": failed, "errors": errors,
+            "errors_truncated": failed > len(errors) - aborted, "aborted": aborted}
+
+def _question_batches(course_id: int) -> Iterator[List]:
+    db = ReadSessionLocal()
+    try:
+        result = db.execute(
+            select(QuizQuestion.id, *[getattr(QuizQuestion, f) for f in QUESTION_FIELDS])
+            .where(QuizQuestion.course_id == course_id)
+            .order_by(QuizQuestion.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        for batch in result.partitions():
+            yield batch
+    finally:
+        db.close()
+
+def export_questions_csv(course_id: int) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["id"] + QUESTION_FIELDS)
+    for batch in _question_batches(course_id):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def _question_dict(row) -> Dict:
+    return {"id": row.id, **{f: getattr(row, f) for f in QUESTION_FIELDS}}
+
+def export_questions_ndjson(course_id: int) -> Iterator[str]:
+    for batch in _question_batches(course_id):
+        yield "".join(json.dumps(_question_dict(row), ensure_ascii=False) + "\n" for row in batch)
+
+def export_course_ndjson(course_id: int) -> Iterator[str]:
+    """First line is the course itself, then one line per quiz question."""
+    db = ReadSessionLocal()
+    try:
+        course = db.execute(
+            select(Course.id, Course.title, Course.short_description, Course.course_content)
+            .where(Course.id == course_id)
+        ).first()
+    finally:
+        db.close()
+    if course is None:
+        return
+    yield json.dumps({"type": "course", **course._asdict()}, ensure_ascii=False) + "\n"
+    for batch in _question_batches(course_id):
+        yield "".join(
+            json.dumps({"type": "question", **_question_dict(row)}, ensure_ascii=False) + "\n"
+            for row in batch
+        )
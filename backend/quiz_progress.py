@@ -0,0 +1,115 @@
+"""
+Quiz-Fortschritt pro (Nutzer, Kurs): die Menge der richtig beantworteten Fragen.
+
+Die Menge wird mit einer einzigen Abfrage über ``quiz_questions`` (Index auf
+course_id) und ``quiz_responses`` (Index user_id, question_id, is_correct)
+ermittelt und kurz prozesslokal zwischengespeichert. ``submit_quiz_response``
+ergänzt einen vorhandenen Eintrag direkt, statt ihn zu verwerfen. Bei mehreren
+Worker-Prozessen begrenzt die TTL, wie lange ein anderer Worker eine neue richtige
+Antwort noch nicht sieht.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import FrozenSet, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models import QuizQuestion, QuizResponse
+
+QUIZ_PROGRESS_CACHE_SIZE = int(os.getenv("QUIZ_PROGRESS_CACHE_SIZE", "10000"))
+QUIZ_PROGRESS_CACHE_TTL_SECONDS = float(os.getenv("QUIZ_PROGRESS_CACHE_TTL_SECONDS", "30"))
+GENERATION_STRIPES = 4096
+
+def correct_question_ids_query(user_id: int, course_id: int):
+    return (
+        select(QuizResponse.question_id)
+        .join(QuizQuestion, QuizQuestion.id == QuizResponse.question_id)
+        .where(
+            QuizQuestion.course_id == course_id,
+            QuizResponse.user_id == user_id,
+            QuizResponse.is_correct == True
+        )
+        .distinct()
+    )
+
+class QuizProgressCache:
+    """
+    Bounded LRU of (user_id, course_id) -> correct question ids with a TTL.
+    Generation counters keep a set read before a submission from overwriting
+    the in-place update made by that submission. They live in a fixed number of
+    stripes (hash of the key), so they take constant memory; two keys sharing a
+    stripe only cost an occasional skipped put.
+    """
+
+    def __init__(self, maxsize: int = QUIZ_PROGRESS_CACHE_SIZE, ttl: float = QUIZ_PROGRESS_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[int, int], tuple]" = OrderedDict()
+        self._generations: List[int] = [0] * GENERATION_STRIPES
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _stripe(key: Tuple[int, int]) -> int:
+        return hash(key) % GENERATION_STRIPES
+
+    def generation(self, key: Tuple[int, int]) -> int:
+        with self._lock:
+            return self._generations[self._stripe(key)]
+
+    def get(self, key: Tuple[int, int]) -> Optional[FrozenSet[int]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            ids, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return ids
+
+    def put(self, key: Tuple[int, int], ids: Iterable[int], generation: int) -> None:
+        with self._lock:
+            if self._generations[self._stripe(key)] != generation:
+                return
+            self._entries[key] = (frozenset(ids), time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def add_correct(self, key: Tuple[int, int], question_ids: Iterable[int]) -> None:
+        """Extend a cached set after a committed submission (no-op if not cached)."""
+        with self._lock:
+            self._generations[self._stripe(key)] += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0] | frozenset(question_ids), entry[1])
+
+    def clear(self) -> None:
+        with self._lock:
+            # generations are kept: a read started before clear() must still lose
+            self._entries.clear()
+
+quiz_progress_cache = QuizProgressCache()
+
+def correct_question_ids(db: Session, user_id: int, course_id: int) -> FrozenSet[int]:
+    key = (user_id, course_id)
+    ids = quiz_progress_cache.get(key)
+    if ids is None:
+        generation = quiz_progress_cache.generation(key)
+        ids = frozenset(db.execute(correct_question_ids_query(user_id, course_id)).scalars())
+        quiz_progress_cache.put(key, ids, generation)
+    return ids
+
+async def correct_question_ids_async(db: AsyncSession, user_id: int, course_id: int) -> FrozenSet[int]:
+    key = (user_id, course_id)
+    ids = quiz_progress_cache.get(key)
+    if ids is None:
+        generation = quiz_progress_cache.generation(key)
+        ids = frozenset((await db.execute(correct_question_ids_query(user_id, course_id))).scalars())
+        quiz_progress_cache.put(key, ids, generation)
+    return ids
@@ -1,39 +1,110 @@
 from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
-from schemas_auth import UserRegister, UserLogin, Token
-from models import User
-from dependencies import get_db
-from auth_utils import get_password_hash, verify_password, create_access_token
-from datetime import timedelta
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from schemas_auth import UserRegister, UserLogin, Token, RefreshRequest
+from models import User, AuthSession
+from dependencies import get_async_db
+from auth_utils import (
+    get_password_hash_async, verify_and_update_password_async, create_access_token,
+    create_refresh_token, hash_refresh_token, REFRESH_TOKEN_EXPIRE_DAYS
+)
+from blind_index import email_bidx_condition
+from datetime import datetime, timedelta
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
+async def _start_session(db: AsyncSession, user_id: int) -> str:
+    refresh_token, token_hash = create_refresh_token()
+    # drop the user's finished sessions so the table only holds usable tokens
+    await db.execute(
+        delete(AuthSession)
+        .where(AuthSession.user_id == user_id)
+        .where(or_(AuthSession.expires_at < datetime.utcnow(), AuthSession.revoked == True))
+    )
+    db.add(AuthSession(
+        user_id=user_id,
+        token_hash=token_hash,
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    ))
+    await db.commit()
+    return refresh_token
+
 @router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
-def register(user: UserRegister, db: Session = Depends(get_db)):
-    existing = db.query(User).filter(User.username == user.username).first()
+async def register(user: UserRegister, db: AsyncSession = Depends(get_async_db)):
+    existing = (await db.execute(select(User.id).where(User.username == user.username))).first()
     if existing:
         raise HTTPException(status_code=409, detail="Ein Nutzer mit diesem Namen existiert bereits.")
-    hashed_pw = get_password_hash(user.password)
+    hashed_pw = await get_password_hash_async(user.password)
     new_user = User(
         username=user.username,
         password_hash=hashed_pw,
         role=user.role
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
     access_token = create_access_token(
         data={"user_id": new_user.id, "role": new_user.role},
         expires_delta=timedelta(minutes=30)
     )
-    return {"access_token": access_token, "token_type": "bearer"}
+    refresh_token = await _start_session(db, new_user.id)
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+# narrowed by username or by the email blind index (see query_audit.py)
+credentials_query = select(User.id, User.role, User.password_hash)
 
 @router.post("/login", response_model=Token)
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    existing = db.query(User).filter(User.username == user.identifier).first()
+async def login(user: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    existing = (await db.execute(credentials_query.where(User.username == user.identifier))).first()
+    if not existing and "@" in user.identifier:
+        # login by email: one indexed lookup on the blind index
+        existing = (await db.execute(credentials_query.where(email_bidx_condition(user.identifier)))).first()
     if not existing:
         raise HTTPException(status_code=401, detail="Ungültige Anmeldedaten.")
-    if not verify_password(user.password, existing.password_hash):
+    valid, new_hash = await verify_and_update_password_async(user.password, existing.password_hash)
+    if not valid:
         raise HTTPException(status_code=401, detail="Ungültige Anmeldedaten.")
+    if new_hash:
+        # bcrypt cost changed since the hash was stored: upgrade transparently
+        await db.execute(update(User).where(User.id == existing.id).values(password_hash=new_hash))
+        await db.commit()
     access_token = create_access_token(data={"user_id": existing.id, "role": existing.role})
-    return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
+    refresh_token = await _start_session(db, existing.id)
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+@router.post("/refresh", response_model=Token)
+async def refresh(data: RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Exchange a refresh token for a new access token. The refresh token is
+    rotated on every use; a token that was already rotated is rejected.
+    """
+    old_hash = hash_refresh_token(data.refresh_token)
+    session = (await db.execute(
+        select(AuthSession.id, AuthSession.user_id, AuthSession.expires_at, AuthSession.revoked, User.role)
+        .join(User, User.id == AuthSession.user_id)
+        .where(AuthSession.token_hash == old_hash)
+    )).first()
+    now = datetime.utcnow()
+    if not session or session.revoked or session.expires_at < now:
+        raise HTTPException(status_code=401, detail="Ungültiges Refresh-Token.")
+    refresh_token, new_hash = create_refresh_token()
+    rotated = await db.execute(
+        update(AuthSession)
+        .where(AuthSession.id == session.id, AuthSession.token_hash == old_hash)
+        .values(token_hash=new_hash, expires_at=now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
+    )
+    if rotated.rowcount != 1:
+        # another request rotated this token concurrently
+        await db.rollback()
+        raise HTTPException(status_code=401, detail="Ungültiges Refresh-Token.")
+    await db.commit()
+    access_token = create_access_token(data={"user_id": session.user_id, "role": session.role})
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(data: RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    """Revoke the session belonging to the given refresh token."""
+    await db.execute(
+        delete(AuthSession).where(AuthSession.token_hash == hash_refresh_token(data.refresh_token))
+    )
+    await db.commit()
+    return
@@ -1,65 +1,126 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from dependencies import get_db, get_optional_user, get_current_user
-from models import Course, CourseOpenEvent, QuizQuestion, QuizResponse, User, user_course_association
+from sqlalchemy.ext.asyncio import AsyncSession
+from dependencies import get_db, get_read_db, get_async_read_db, get_optional_user, get_optional_user_async, get_current_user
+from identity_cache import UserIdentity
+from link_checker import enqueue_course_check, extract_links, is_stale, link_cache
+from event_buffer import open_event_buffer
+from models import Course, CourseLinkCheck, CourseUserProgress, QuizQuestion, User, user_course_association, learningpath_course_association
 from typing import Dict, List, Optional
-import requests
-import re
-from sqlalchemy import func
+import json
+import course_progress
+import course_search
+import question_transfer
+from sqlalchemy import case, func, select, exists, false
 
 router = APIRouter(prefix="/api/courses", tags=["courses"])
 
-def check_links(html: str) -> List[str]:
-    urls = re.findall(r'href="(https?://[^"]+)"', html or "")
-    broken = []
-    for url in set(urls):
-        try:
-            resp = requests.head(url, timeout=5)
-            if resp.status_code >= 400:
-                broken.append(url)
-        except Exception:
-            broken.append(url)
-    return broken
+def catalog_query(user_id: Optional[int], learning_path_id: Optional[int] = None,
+                  after_id: Optional[int] = None, limit: Optional[int] = None):
+    if user_id is not None:
+        enrolled = exists().where(
+            user_course_association.c.user_id == user_id,
+            user_course_association.c.course_id == Course.id
+        )
+    else:
+        enrolled = false()
+    stmt = select(
+        Course.id, Course.title, Course.short_description, enrolled.label("enrolled")
+    ).order_by(Course.id)
+    if learning_path_id is not None:
+        stmt = stmt.join(
+            learningpath_course_association,
+            learningpath_course_association.c.course_id == Course.id
+        ).where(learningpath_course_association.c.learningpath_id == learning_path_id)
+    if after_id is not None:
+        stmt = stmt.where(Course.id > after_id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+def course_query(course_id: int):
+    return select(Course).where(Course.id == course_id)
+
+def analytics_query(course_id: int):
+    # single aggregate over the per-user rollup (see course_progress.py)
+    total_q = select(func.count(QuizQuestion.id)).where(
+        QuizQuestion.course_id == course_id
+    ).scalar_subquery()
+    participated = CourseUserProgress.answered > 0
+    return select(
+        func.count(case((CourseUserProgress.opened, 1))).label("openers"),
+        func.count(case((participated, 1))).label("participants"),
+        func.avg(case((participated, CourseUserProgress.answered))).label("avg_answered"),
+        func.count(case((participated & (CourseUserProgress.answered >= total_q), 1))).label("completed")
+    ).where(CourseUserProgress.course_id == course_id)
 
 @router.get("", response_model=list)
-def read_courses(
-    db: Session = Depends(get_db),
-    current_user: Optional[User] = Depends(get_optional_user)
+async def read_courses(
+    after_id: Optional[int] = Query(None, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    learning_path_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Optional[UserIdentity] = Depends(get_optional_user_async)
+):
+    """
+    Return courses with an 'enrolled' flag for the logged-in user in a single query.
+    Supports keyset pagination (?after_id=&limit=) and filtering by learning path.
+    """
+    stmt = catalog_query(current_user.id if current_user else None, learning_path_id, after_id, limit)
+    rows = (await db.execute(stmt)).all()
+    return [
+        {
+            "id": row.id,
+            "title": row.title,
+            "short_description": row.short_description,
+            "enrolled": bool(row.enrolled)
+        } for row in rows
+    ]
+
+@router.get("/search", response_model=list)
+async def search_courses(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Optional[UserIdentity] = Depends(get_optional_user_async)
 ):
     """
-    Return all courses with an 'enrolled' flag for the logged-in user.
+    Ranked full-text search over title, short description and course content.
+    The snippet contains <mark> highlights; all other text in it is HTML-escaped.
     """
-    courses = db.query(Course).all()
-    result = []
-    for c in courses:
-        enrolled = False
-        if current_user:
-            enrolled = db.query(user_course_association).filter_by(
-                user_id=current_user.id,
-                course_id=c.id
-            ).first() is not None
-        result.append({
-            "id": c.id,
-            "title": c.title,
-            "short_description": c.short_description,
-            "enrolled": enrolled
-        })
-    return result
+    match = course_search.to_match_query(q)
+    if match is None:
+        return []
+    params = {"q": match, "limit": limit, "offset": offset}
+    if current_user:
+        params["user_id"] = current_user.id
+    rows = (await db.execute(
+        course_search.search_statement(current_user.id if current_user else None), params
+    )).all()
+    return [
+        {
+            "id": row.id,
+            "title": row.title,
+            "short_description": row.short_description,
+            "snippet": course_search.render_snippet(row.snippet),
+            "enrolled": bool(row.enrolled)
+        } for row in rows
+    ]
 
 @router.get("/{course_id}")
 def read_course(
     course_id: int,
-    db: Session = Depends(get_db),
-    current_user: Optional[User] = Depends(get_optional_user)
+    db: Session = Depends(get_read_db),
+    current_user: Optional[UserIdentity] = Depends(get_optional_user)
 ):
-    course = db.query(Course).filter(Course.id == course_id).first()
+    course = db.scalars(course_query(course_id)).first()
     if not course:
         raise HTTPException(status_code=404, detail="Kurs nicht gefunden")
-    # Log open event
+    # Log open event; written in batches by the event buffer, not by this request
     if current_user:
-        evt = CourseOpenEvent(user_id=current_user.id, course_id=course_id)
-        db.add(evt)
-        db.commit()
+        open_event_buffer.record(current_user.id, course_id)
     return {
         "id": course.id,
         "title": course.title,
@@ -70,8 +131,9 @@ def read_course(
 @router.post("", response_model=Dict, status_code=status.HTTP_201_CREATED)
 def create_or_update_course(
     course: Dict,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserIdentity = Depends(get_current_user)
 ):
     if current_user.role not in ["Teacher", "Admin"]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
@@ -80,8 +142,6 @@ def create_or_update_course(
     if existing:
         existing.short_description = course.get("short_description")
         existing.course_content = course.get("course_content")
-        db.commit()
-        db.refresh(existing)
         status_text = "aktualisiert"
     else:
         existing = Course(
@@ -90,30 +150,36 @@ def create_or_update_course(
             course_content=course.get("course_content")
         )
         db.add(existing)
-        db.commit()
-        db.refresh(existing)
+        db.flush()
         status_text = "erstellt"
+    course_search.index_course(db.connection(), existing.id, existing.title,
+                               existing.short_description, existing.course_content)
+    db.commit()
+    db.refresh(existing)
     if course.get("didactic_simulation"):
         feedback = {
             "UDL": "Die Inhalte sollten in alternativen Formaten vorliegen.",
             "LearningFirstPrinciples": "Die Grundlagen sollten stärker strukturiert sein.",
             "ARCS": "Mehr interaktive Elemente zur Steigerung der Aufmerksamkeit einfügen."
         }
-    broken = check_links(course.get("course_content"))
+    job_id = enqueue_course_check(db, existing.id, existing.course_content, background_tasks)
     return {
         "course_id": existing.id,
         "title": existing.title,
         "status": status_text,
         "didactic_feedback": feedback,
-        "broken_links": broken
+        # only links already known to be broken; the full result comes from /link-report
+        "broken_links": link_cache.known_broken(extract_links(existing.course_content)),
+        "link_check_job_id": job_id
     }
 
 @router.put("/{course_id}", response_model=Dict)
 def update_course(
     course_id: int,
     course: Dict,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserIdentity = Depends(get_current_user)
 ):
     if current_user.role not in ["Teacher", "Admin"]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
@@ -127,6 +193,8 @@ def update_course(
     existing.title = course.get("title")
     existing.short_description = course.get("short_description")
     existing.course_content = course.get("course_content")
+    course_search.index_course(db.connection(), existing.id, existing.title,
+                               existing.short_description, existing.course_content)
     db.commit()
     db.refresh(existing)
     feedback = {}
@@ -136,20 +204,21 @@ def update_course(
             "LearningFirstPrinciples": "Die Grundlagen sollten stärker strukturiert sein.",
             "ARCS": "Mehr interaktive Elemente zur Steigerung der Aufmerksamkeit einfügen."
         }
-    broken = check_links(course.get("course_content"))
+    job_id = enqueue_course_check(db, existing.id, existing.course_content, background_tasks)
     return {
         "course_id": existing.id,
         "title": existing.title,
         "status": "aktualisiert",
         "didactic_feedback": feedback,
-        "broken_links": broken
+        "broken_links": link_cache.known_broken(extract_links(existing.course_content)),
+        "link_check_job_id": job_id
     }
 
 @router.delete("/{course_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_course(
     course_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserIdentity = Depends(get_current_user)
 ):
     if current_user.role not in ["Teacher", "Admin"]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
@@ -157,35 +226,26 @@ def delete_course(
     if not c:
         raise HTTPException(status_code=404, detail="Kurs nicht gefunden")
     db.delete(c)
+    course_search.remove_course(db.connection(), course_id)
+    course_progress.remove_course(db.connection(), course_id)
     db.commit()
     return
 
 @router.get("/{course_id}/analytics")
 def course_analytics(
     course_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: Session = Depends(get_read_db),
+    current_user: UserIdentity = Depends(get_current_user)
 ):
     if current_user.role not in ["Teacher", "Admin"]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
-    course = db.query(Course).filter(Course.id == course_id).first()
-    if not course:
+    if db.query(Course.id).filter(Course.id == course_id).first() is None:
         raise HTTPException(status_code=404, detail="Kurs nicht gefunden")
-    unique_openers = db.query(CourseOpenEvent.user_id).filter(
-        CourseOpenEvent.course_id == course_id
-    ).distinct().count()
-    total_q = len(course.quiz_questions)
-    unique_quiz = db.query(QuizResponse.user_id).join(QuizQuestion).filter(
-        QuizQuestion.course_id == course_id
-    ).distinct().count()
-    sub = db.query(
-        QuizResponse.user_id,
-        func.count(QuizResponse.id).label("cnt")
-    ).join(QuizQuestion).filter(
-        QuizQuestion.course_id == course_id
-    ).group_by(QuizResponse.user_id).subquery()
-    avg_ans = db.query(func.avg(sub.c.cnt)).scalar() or 0
-    completed_users = db.query(sub.c.user_id).filter(sub.c.cnt >= total_q).count()
+    row = db.execute(analytics_query(course_id)).one()
+    unique_openers = row.openers
+    unique_quiz = row.participants
+    avg_ans = row.avg_answered or 0
+    completed_users = row.completed
     percent_completed = (completed_users / unique_openers * 100) if unique_openers else 0
     return {
         "unique_openers": unique_openers,
@@ -194,21 +254,50 @@ def course_analytics(
         "percent_completed": percent_completed
     }
 
+@router.get("/{course_id}/export")
+def export_course(
+    course_id: int,
+    db: Session = Depends(get_read_db),
+    current_user: UserIdentity = Depends(get_current_user)
+):
+    """Stream the course and its quiz questions as NDJSON."""
+    if current_user.role not in ["Teacher", "Admin"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    if db.query(Course.id).filter(Course.id == course_id).first() is None:
+        raise HTTPException(status_code=404, detail="Kurs nicht gefunden")
+    return StreamingResponse(
+        question_transfer.export_course_ndjson(course_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f"attachment; filename=Kurs_{course_id}.ndjson"}
+    )
+
 @router.get("/{course_id}/link-report")
 def link_report(
     course_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserIdentity = Depends(get_current_user)
 ):
+    """
+    Return the stored result of the latest link check. If the course has never
+    been checked, or its pending job was lost, a check is enqueued and reported
+    as pending.
+    """
     if current_user.role not in ["Teacher", "Admin"]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
-    course = db.query(Course).filter(Course.id == course_id).first()
-    if not course:
-        raise HTTPException(status_code=404, detail="Kurs nicht gefunden")
-    broken = check_links(course.course_content)
-    distinct = len(set(re.findall(r'href="(https?://[^"]+)"', course.course_content or "")))
+    record = db.get(CourseLinkCheck, course_id)
+    if record is None or is_stale(record):
+        course = db.query(Course).filter(Course.id == course_id).first()
+        if not course:
+            raise HTTPException(status_code=404, detail="Kurs nicht gefunden")
+        enqueue_course_check(db, course_id, course.course_content, background_tasks)
+        record = db.get(CourseLinkCheck, course_id)
+    broken = json.loads(record.broken_links or "[]")
     return {
-        "total_checked": distinct,
+        "job_id": record.job_id,
+        "status": record.status,
+        "checked_at": record.checked_at.isoformat() if record.checked_at else None,
+        "total_checked": record.total_checked,
         "broken_count": len(broken),
         "broken_links": broken
-    }
\ No newline at end of file
+    }
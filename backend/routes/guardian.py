@@ -1,23 +1,39 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
-from dependencies import get_db, get_current_user
+from dependencies import get_db, get_read_db, get_current_user
+from identity_cache import UserIdentity, identity_cache
 from models import User, Course, UserStatistic, CourseOpenEvent, QuizQuestion, QuizResponse
-from auth_utils import get_password_hash
+from auth_utils import get_password_hash_bounded
 from datetime import date, timedelta
 
 router = APIRouter(prefix="/api/guardian", tags=["guardian"])
 
-def ensure_parent(current_user: User):
+def children_query(parent_id: int):
+    return select(User.id, User.username).where(User.parent_user_id == parent_id)
+
+def opened_query(child_id: int, course_id: int):
+    return select(CourseOpenEvent.id).where(
+        CourseOpenEvent.user_id == child_id, CourseOpenEvent.course_id == course_id
+    ).limit(1)
+
+def answered_query(child_id: int, course_id: int):
+    return select(func.count()).select_from(QuizResponse).join(QuizQuestion).where(
+        QuizQuestion.course_id == course_id,
+        QuizResponse.user_id == child_id
+    )
+
+def ensure_parent(current_user: UserIdentity):
     if current_user.is_child_account:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
 
 @router.get("/children", response_model=list)
-def list_children(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def list_children(db: Session = Depends(get_read_db), current_user: UserIdentity = Depends(get_current_user)):
     """
     List child-accounts created by the current user, plus today's and 7-day average stats.
     """
     ensure_parent(current_user)
-    children = db.query(User).filter(User.parent_user_id == current_user.id).all()
+    children = db.execute(children_query(current_user.id)).all()
     result = []
     today = date.today()
     week_ago = today - timedelta(days=6)
@@ -38,7 +54,7 @@ def list_children(db: Session = Depends(get_db), current_user: User = Depends(ge
     return result
 
 @router.post("/children", status_code=status.HTTP_201_CREATED)
-def create_child(data: dict, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def create_child(data: dict, db: Session = Depends(get_db), current_user: UserIdentity = Depends(get_current_user)):
     """
     Create a new child-account under this parent.
     """
@@ -49,7 +65,7 @@ def create_child(data: dict, db: Session = Depends(get_db), current_user: User =
         raise HTTPException(status_code=400, detail="username and password required")
     if db.query(User).filter(User.username == uname).first():
         raise HTTPException(status_code=409, detail="Username already exists")
-    hashed = get_password_hash(pwd)
+    hashed = get_password_hash_bounded(pwd)
     child = User(
         username=uname,
         password_hash=hashed,
@@ -63,7 +79,7 @@ def create_child(data: dict, db: Session = Depends(get_db), current_user: User =
     return {"id": child.id, "username": child.username}
 
 @router.post("/children/{child_id}/convert")
-def convert_child(child_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def convert_child(child_id: int, db: Session = Depends(get_db), current_user: UserIdentity = Depends(get_current_user)):
     """
     Convert a child-account into a regular account (irreversible).
     """
@@ -78,10 +94,11 @@ def convert_child(child_id: int, db: Session = Depends(get_db), current_user: Us
     child.is_child_account = False
     child.parent_user_id = None
     db.commit()
+    identity_cache.invalidate(child.id)
     return {"message": "converted"}
 
 @router.get("/children/{child_id}/courses", response_model=list)
-def list_child_courses(child_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def list_child_courses(child_id: int, db: Session = Depends(get_read_db), current_user: UserIdentity = Depends(get_current_user)):
     """
     Get a child's enrolled courses plus progress metrics.
     """
@@ -91,12 +108,9 @@ def list_child_courses(child_id: int, db: Session = Depends(get_db), current_use
         raise HTTPException(status_code=404, detail="Child not found or not yours")
     courses = []
     for c in child.courses:
-        opened = db.query(CourseOpenEvent).filter_by(user_id=child.id, course_id=c.id).first() is not None
+        opened = db.execute(opened_query(child.id, c.id)).first() is not None
         total_q = len(c.quiz_questions)
-        answered = db.query(QuizResponse.user_id).join(QuizQuestion).filter(
-            QuizQuestion.course_id == c.id,
-            QuizResponse.user_id == child.id
-        ).count()
+        answered = db.execute(answered_query(child.id, c.id)).scalar()
         completed = (answered >= total_q) and total_q > 0
         courses.append({
             "course_id": c.id,
@@ -111,7 +125,7 @@ def list_child_courses(child_id: int, db: Session = Depends(get_db), current_use
 @router.post("/children/{child_id}/courses/{course_id}", status_code=status.HTTP_201_CREATED)
 def enroll_child_course(child_id: int, course_id: int,
                         db: Session = Depends(get_db),
-                        current_user: User = Depends(get_current_user)):
+                        current_user: UserIdentity = Depends(get_current_user)):
     """
     Enroll a child into a course.
     """
@@ -131,7 +145,7 @@ def enroll_child_course(child_id: int, course_id: int,
 @router.delete("/children/{child_id}/courses/{course_id}", status_code=status.HTTP_204_NO_CONTENT)
 def unenroll_child_course(child_id: int, course_id: int,
                           db: Session = Depends(get_db),
-                          current_user: User = Depends(get_current_user)):
+                          current_user: UserIdentity = Depends(get_current_user)):
     """
     Unenroll a child from a course.
     """
@@ -145,7 +159,7 @@ def unenroll_child_course(child_id: int, course_id: int,
     return
 
 @router.get("/children/{child_id}/settings")
-def get_child_settings(child_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_child_settings(child_id: int, db: Session = Depends(get_db), current_user: UserIdentity = Depends(get_current_user)):
     """
     Retrieve a child's display settings.
     """
@@ -162,7 +176,7 @@ def get_child_settings(child_id: int, db: Session = Depends(get_db), current_use
 @router.put("/children/{child_id}/settings")
 def update_child_settings(child_id: int, settings: dict,
                           db: Session = Depends(get_db),
-                          current_user: User = Depends(get_current_user)):
+                          current_user: UserIdentity = Depends(get_current_user)):
     """
     Update a child's display settings.
     """
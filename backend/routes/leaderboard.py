@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from dependencies import get_read_db, get_current_user, get_optional_user
+from identity_cache import UserIdentity
+from leaderboard import LEADERBOARD_TOP_K, global_rank, leaderboard_cache
+from models import Course, User
+from quiz_progress import correct_question_ids
+from typing import Optional
+
+router = APIRouter(prefix="/api/leaderboard", tags=["leaderboard"])
+
+@router.get("")
+def global_leaderboard(limit: int = Query(10, ge=1, le=LEADERBOARD_TOP_K), db: Session = Depends(get_read_db)):
+    ranking = leaderboard_cache.global_ranking(db)
+    return {"entries": ranking.top[:limit], "total": ranking.total}
+
+@router.get("/me")
+def my_rank(db: Session = Depends(get_read_db), current_user: UserIdentity = Depends(get_current_user)):
+    """
+    Rank of the current user by their current points. Child accounts are not
+    listed, but still see where they would stand.
+    """
+    points = db.execute(select(User.points).where(User.id == current_user.id)).scalar() or 0
+    return {
+        "rank": global_rank(db, points),
+        "points": points,
+        "total": leaderboard_cache.global_ranking(db).total,
+        "listed": not current_user.is_child_account
+    }
+
+@router.get("/courses/{course_id}")
+def course_leaderboard(
+    course_id: int,
+    limit: int = Query(10, ge=1, le=LEADERBOARD_TOP_K),
+    db: Session = Depends(get_read_db),
+    current_user: Optional[UserIdentity] = Depends(get_optional_user)
+):
+    """Users ranked by the number of distinct questions of the course they answered correctly."""
+    if db.query(Course.id).filter(Course.id == course_id).first() is None:
+        raise HTTPException(status_code=404, detail="Kurs nicht gefunden")
+    ranking = leaderboard_cache.course_ranking(db, course_id)
+    me = None
+    if current_user:
+        solved = len(correct_question_ids(db, current_user.id, course_id))
+        me = {
+            "rank": ranking.rank_of(solved) if solved else None,
+            "solved": solved,
+            "listed": bool(solved) and not current_user.is_child_account
+        }
+    return {"entries": ranking.top[:limit], "total": ranking.total, "me": me}
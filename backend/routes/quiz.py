@@ -1,41 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
 from sqlalchemy.orm import Session
-from dependencies import get_db, get_current_user
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import insert, select, update
+from dependencies import get_db, get_read_db, get_async_db, get_async_read_db, get_current_user, get_current_user_async
+from identity_cache import UserIdentity
 from models import Course, QuizQuestion, QuizResponse, User
+import course_progress
+from quiz_progress import correct_question_ids_async, quiz_progress_cache
 from datetime import datetime
-from fastapi.responses import StreamingResponse
-from io import BytesIO
+from typing import List, Optional, Tuple
+import csv
+import question_transfer
+from schemas import QuizAnswerBatch
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from certificates import REPORTLAB_AVAILABLE, certificate_key, certificate_store
 
 router = APIRouter(tags=["quiz"])
 
+def questions_query(course_id: int):
+    return select(QuizQuestion).where(QuizQuestion.course_id == course_id)
+
 # Endpoint for students to get quiz questions that are not yet correctly answered
 @router.get("/api/courses/{course_id}/quiz-questions")
-def get_quiz_questions(course_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    course = db.query(Course).filter(Course.id == course_id).first()
+async def get_quiz_questions(course_id: int, db: AsyncSession = Depends(get_async_read_db), current_user: UserIdentity = Depends(get_current_user_async)):
+    course = (await db.execute(select(Course.id).where(Course.id == course_id))).first()
     if not course:
         raise HTTPException(status_code=404, detail="Kurs nicht gefunden")
-    questions = course.quiz_questions
-    unanswered = []
-    for q in questions:
-        correct_response = db.query(QuizResponse).filter(
-            QuizResponse.user_id == current_user.id,
-            QuizResponse.question_id == q.id,
-            QuizResponse.is_correct == True
-        ).first()
-        if not correct_response:
-            unanswered.append({
-                "id": q.id,
-                "question_text": q.question_text,
-                "option1": q.option1,
-                "option2": q.option2,
-                "option3": q.option3,
-                "option4": q.option4
-            })
+    questions = (await db.execute(questions_query(course_id))).scalars().all()
+    correct_ids = await correct_question_ids_async(db, current_user.id, course_id)
+    unanswered = [
+        {
+            "id": q.id,
+            "question_text": q.question_text,
+            "option1": q.option1,
+            "option2": q.option2,
+            "option3": q.option3,
+            "option4": q.option4
+        } for q in questions if q.id not in correct_ids
+    ]
     return unanswered
 
 # Neuer Endpunkt für Lehrer/Dozenten: Alle Quizfragen eines Kurses abrufen
 @router.get("/api/courses/{course_id}/quiz-questions/all")
-def get_all_quiz_questions(course_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_all_quiz_questions(course_id: int, db: Session = Depends(get_read_db), current_user: UserIdentity = Depends(get_current_user)):
     if current_user.role not in ["Teacher", "Admin"]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     course = db.query(Course).filter(Course.id == course_id).first()
@@ -54,7 +61,7 @@ def get_all_quiz_questions(course_id: int, db: Session = Depends(get_db), curren
 
 # Teacher endpoints for managing quiz questions
 @router.post("/api/courses/{course_id}/quiz-questions")
-def create_quiz_question(course_id: int, question: dict, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def create_quiz_question(course_id: int, question: dict, db: Session = Depends(get_db), current_user: UserIdentity = Depends(get_current_user)):
     if current_user.role not in ["Teacher", "Admin"]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     course = db.query(Course).filter(Course.id == course_id).first()
@@ -77,8 +84,50 @@ def create_quiz_question(course_id: int, question: dict, db: Session = Depends(g
     db.refresh(new_question)
     return {"id": new_question.id, "message": "Frage erstellt"}
 
+@router.post("/api/courses/{course_id}/quiz-questions/import")
+def import_quiz_questions(
+    course_id: int,
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    db: Session = Depends(get_db),
+    current_user: UserIdentity = Depends(get_current_user)
+):
+    """
+    Bulk import from CSV (header: question_text, option1-4, correct_option)
+    or NDJSON. The format defaults to the file extension. Fails with 400 only
+    if the file is unreadable before anything was stored; see import_questions.
+    """
+    if current_user.role not in ["Teacher", "Admin"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    if db.query(Course.id).filter(Course.id == course_id).first() is None:
+        raise HTTPException(status_code=404, detail="Kurs nicht gefunden")
+    fmt = format or ("ndjson" if (file.filename or "").lower().endswith((".ndjson", ".jsonl")) else "csv")
+    try:
+        return question_transfer.import_questions(db, course_id, file.file, fmt)
+    except (ValueError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Datei konnte nicht gelesen werden: {e}")
+
+@router.get("/api/courses/{course_id}/quiz-questions/export")
+def export_quiz_questions(
+    course_id: int,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    db: Session = Depends(get_read_db),
+    current_user: UserIdentity = Depends(get_current_user)
+):
+    if current_user.role not in ["Teacher", "Admin"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    if db.query(Course.id).filter(Course.id == course_id).first() is None:
+        raise HTTPException(status_code=404, detail="Kurs nicht gefunden")
+    if format == "csv":
+        body, media_type = question_transfer.export_questions_csv(course_id), "text/csv; charset=utf-8"
+    else:
+        body, media_type = question_transfer.export_questions_ndjson(course_id), "application/x-ndjson"
+    return StreamingResponse(body, media_type=media_type, headers={
+        "Content-Disposition": f"attachment; filename=Quizfragen_{course_id}.{format}"
+    })
+
 @router.put("/api/quiz-questions/{question_id}")
-def update_quiz_question(question_id: int, question: dict, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def update_quiz_question(question_id: int, question: dict, db: Session = Depends(get_db), current_user: UserIdentity = Depends(get_current_user)):
     if current_user.role not in ["Teacher", "Admin"]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     q = db.query(QuizQuestion).filter(QuizQuestion.id == question_id).first()
@@ -94,7 +143,7 @@ def update_quiz_question(question_id: int, question: dict, db: Session = Depends
     return {"id": q.id, "message": "Frage aktualisiert"}
 
 @router.delete("/api/quiz-questions/{question_id}")
-def delete_quiz_question(question_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def delete_quiz_question(question_id: int, db: Session = Depends(get_db), current_user: UserIdentity = Depends(get_current_user)):
     if current_user.role not in ["Teacher", "Admin"]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     q = db.query(QuizQuestion).filter(QuizQuestion.id == question_id).first()
@@ -104,71 +153,112 @@ def delete_quiz_question(question_id: int, db: Session = Depends(get_db), curren
     db.commit()
     return {"message": "Frage gelöscht"}
 
+POINTS_PER_CORRECT_ANSWER = 25
+
+async def _record_answers(db: AsyncSession, course_id: int, user_id: int,
+                          answers: List[Tuple[int, bool]]) -> int:
+    """
+    Insert (question_id, is_correct) answers with one bulk INSERT, update the
+    progress rollup and add the points atomically in SQL. Returns the new
+    point total; the caller commits.
+    """
+    now = datetime.utcnow()
+    await db.execute(insert(QuizResponse), [
+        {"user_id": user_id, "question_id": question_id, "is_correct": is_correct, "timestamp": now}
+        for question_id, is_correct in answers
+    ])
+    correct_count = sum(1 for _, is_correct in answers if is_correct)
+    await db.execute(
+        course_progress.RECORD_ANSWER,
+        course_progress.answer_params(course_id, user_id, len(answers), correct_count)
+    )
+    # points = points + n in SQL: concurrent submissions cannot overwrite each other
+    return (await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(points=User.points + correct_count * POINTS_PER_CORRECT_ANSWER)
+        .returning(User.points)
+    )).scalar_one()
+
+def _after_commit(course_id: int, user_id: int, answers: List[Tuple[int, bool]]) -> None:
+    correct_ids = [question_id for question_id, is_correct in answers if is_correct]
+    if correct_ids:
+        quiz_progress_cache.add_correct((user_id, course_id), correct_ids)
+
 # Endpoint for submitting quiz responses
 @router.post("/api/courses/{course_id}/quiz/{question_id}/response")
-def submit_quiz_response(course_id: int, question_id: int, response: dict, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    q = db.query(QuizQuestion).filter(QuizQuestion.id == question_id, QuizQuestion.course_id == course_id).first()
-    if not q:
+async def submit_quiz_response(course_id: int, question_id: int, response: dict, db: AsyncSession = Depends(get_async_db), current_user: UserIdentity = Depends(get_current_user_async)):
+    correct_option = (await db.execute(
+        select(QuizQuestion.correct_option).where(QuizQuestion.id == question_id, QuizQuestion.course_id == course_id)
+    )).scalar_one_or_none()
+    if correct_option is None:
         raise HTTPException(status_code=404, detail="Frage nicht gefunden")
     selected_option = response.get("selected_option")
     if selected_option not in [1, 2, 3, 4]:
         raise HTTPException(status_code=400, detail="Ungültige Auswahl")
-    is_correct = (selected_option == q.correct_option)
-    quiz_response = QuizResponse(
-        user_id=current_user.id,
-        question_id=q.id,
-        is_correct=is_correct,
-        timestamp=datetime.utcnow()
-    )
-    db.add(quiz_response)
-    if is_correct:
-        current_user.points += 25
-    db.commit()
-    return {"correct": is_correct, "points": current_user.points}
+    is_correct = (selected_option == correct_option)
+    answers = [(question_id, is_correct)]
+    points = await _record_answers(db, course_id, current_user.id, answers)
+    await db.commit()
+    _after_commit(course_id, current_user.id, answers)
+    return {"correct": is_correct, "points": points}
+
+@router.post("/api/courses/{course_id}/quiz/responses")
+async def submit_quiz_responses(course_id: int, batch: QuizAnswerBatch, db: AsyncSession = Depends(get_async_db), current_user: UserIdentity = Depends(get_current_user_async)):
+    """
+    Submit several answers in one transaction. The whole batch is rejected if
+    any question does not belong to the course or any option is invalid.
+    """
+    question_ids = {a.question_id for a in batch.answers}
+    correct_options = dict((await db.execute(
+        select(QuizQuestion.id, QuizQuestion.correct_option)
+        .where(QuizQuestion.course_id == course_id, QuizQuestion.id.in_(question_ids))
+    )).all())
+    answers = []
+    for answer in batch.answers:
+        if answer.question_id not in correct_options:
+            raise HTTPException(status_code=404, detail=f"Frage {answer.question_id} nicht gefunden")
+        if answer.selected_option not in [1, 2, 3, 4]:
+            raise HTTPException(status_code=400, detail=f"Ungültige Auswahl für Frage {answer.question_id}")
+        answers.append((answer.question_id, answer.selected_option == correct_options[answer.question_id]))
+    points = await _record_answers(db, course_id, current_user.id, answers)
+    await db.commit()
+    _after_commit(course_id, current_user.id, answers)
+    return {
+        "results": [{"question_id": question_id, "correct": is_correct} for question_id, is_correct in answers],
+        "correct_count": sum(1 for _, is_correct in answers if is_correct),
+        "points": points
+    }
 
 # Endpoint for certificate generation
 @router.get("/api/courses/{course_id}/certificate")
-def generate_certificate(course_id: int, name: str = None, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    course = db.query(Course).filter(Course.id == course_id).first()
-    if not course:
+async def generate_certificate(course_id: int, request: Request, name: str = None, db: AsyncSession = Depends(get_async_read_db), current_user: UserIdentity = Depends(get_current_user_async)):
+    course_title = (await db.execute(select(Course.title).where(Course.id == course_id))).scalar_one_or_none()
+    if course_title is None:
         raise HTTPException(status_code=404, detail="Kurs nicht gefunden")
-    questions = course.quiz_questions
-    for q in questions:
-        correct_response = db.query(QuizResponse).filter(
-            QuizResponse.user_id == current_user.id,
-            QuizResponse.question_id == q.id,
-            QuizResponse.is_correct == True
-        ).first()
-        if not correct_response:
-            raise HTTPException(status_code=400, detail="Nicht alle Quizfragen wurden korrekt beantwortet.")
-    participant_name = name if name else (current_user.full_name if current_user.full_name else current_user.username)
+    question_ids = set((await db.execute(
+        select(QuizQuestion.id).where(QuizQuestion.course_id == course_id)
+    )).scalars())
+    if not question_ids <= await correct_question_ids_async(db, current_user.id, course_id):
+        raise HTTPException(status_code=400, detail="Nicht alle Quizfragen wurden korrekt beantwortet.")
+    participant_name = name
+    if not participant_name:
+        full_name = (await db.execute(select(User.full_name).where(User.id == current_user.id))).scalar()
+        participant_name = full_name if full_name else current_user.username
     completion_date = datetime.utcnow().date().isoformat()
-    course_title = course.title
 
-    try:
-        from reportlab.lib.pagesizes import letter
-        from reportlab.pdfgen import canvas
-    except ImportError:
-        raise HTTPException(status_code=500, detail="ReportLab nicht installiert.")
-    
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-
-    c.setFont("Helvetica-Bold", 24)
-    c.drawCentredString(width/2, height - 100, "Zertifikat")
-    
-    c.setFont("Helvetica", 16)
-    text = f"Hiermit wird bestätigt, dass {participant_name}"
-    c.drawCentredString(width/2, height - 150, text)
-    
-    text = f"den Kurs '{course_title}' erfolgreich abgeschlossen hat."
-    c.drawCentredString(width/2, height - 180, text)
-    
-    text = f"Abschlussdatum: {completion_date}"
-    c.drawCentredString(width/2, height - 210, text)
-    
-    c.showPage()
-    c.save()
-    buffer.seek(0)
-    return StreamingResponse(buffer, media_type="application/pdf", headers={"Content-Disposition": f"attachment; filename=Zertifikat_{course_id}.pdf"})
\ No newline at end of file
+    key = certificate_key(current_user.id, course_id, participant_name, completion_date, course_title)
+    etag = f'"{key}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": f"attachment; filename=Zertifikat_{course_id}.pdf"
+    }
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": headers["Cache-Control"]})
+    path = await certificate_store.lookup(key)
+    if path is None:
+        if not REPORTLAB_AVAILABLE:
+            raise HTTPException(status_code=500, detail="ReportLab nicht installiert.")
+        path = await certificate_store.render(key, participant_name, course_title, completion_date)
+    return FileResponse(path, media_type="application/pdf", headers=headers)
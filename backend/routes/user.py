@@ -1,15 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, status
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-from dependencies import get_db, get_current_user
-from models import User, UserStatistic, Course
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, undefer_group
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import update
+from dependencies import get_db, get_read_db, get_async_db, get_async_read_db, get_current_user, get_current_user_async, get_current_db_user
+from identity_cache import UserIdentity, identity_cache
+from models import User, Course, ENCRYPTED_PROFILE_GROUP
 from datetime import datetime, date
-import os
+from heartbeat_buffer import heartbeat_aggregator, stored_minutes_query
+from profile_pictures import CHUNK_SIZE, PROFILE_PICTURE_MAX_BYTES, UploadWriter, best_variant, picture_store, read_chunks, variant_urls
 
 router = APIRouter(prefix="/api/user", tags=["user"])
 
 @router.get("/settings")
-def get_user_settings(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_user_settings(db: Session = Depends(get_db), current_user: User = Depends(get_current_db_user)):
     return {
         "daily_target": current_user.daily_target,
         "is_full_name_public": current_user.is_full_name_public,
@@ -25,7 +30,7 @@ def get_user_settings(db: Session = Depends(get_db), current_user: User = Depend
 @router.put("/settings")
 def update_user_settings(new_setting: dict,
                          db: Session = Depends(get_db),
-                         current_user: User = Depends(get_current_user)):
+                         current_user: User = Depends(get_current_db_user)):
     try:
         new_target = int(new_setting.get("daily_target"))
     except (ValueError, TypeError):
@@ -36,7 +41,7 @@ def update_user_settings(new_setting: dict,
 
 @router.get("/tutorial-status")
 def get_tutorial_status(db: Session = Depends(get_db),
-                        current_user: User = Depends(get_current_user)):
+                        current_user: UserIdentity = Depends(get_current_user)):
     from models import TutorialStatus
     status_record = db.query(TutorialStatus).filter(TutorialStatus.user_id == current_user.id).first()
     if status_record:
@@ -47,7 +52,7 @@ def get_tutorial_status(db: Session = Depends(get_db),
 @router.post("/tutorial-status")
 def set_tutorial_status(status: dict,
                         db: Session = Depends(get_db),
-                        current_user: User = Depends(get_current_user)):
+                        current_user: UserIdentity = Depends(get_current_user)):
     from models import TutorialStatus
     completed = status.get("completed", False)
     status_record = db.query(TutorialStatus).filter(TutorialStatus.user_id == current_user.id).first()
@@ -66,13 +71,14 @@ def set_tutorial_status(status: dict,
     return {"completed": status_record.completed, "completed_at": status_record.completed_at}
 
 @router.get("/profile")
-def get_profile(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_profile(db: Session = Depends(get_db), current_user: User = Depends(get_current_db_user)):
     return {
         "username": current_user.username,
         "full_name": current_user.full_name,
         "birth_date": current_user.birth_date.isoformat() if current_user.birth_date else None,
         "short_description": current_user.short_description,
         "profile_picture": current_user.profile_picture,
+        "profile_picture_variants": variant_urls(current_user.profile_picture),
         "points": current_user.points,
         "is_full_name_public": current_user.is_full_name_public,
         "is_age_public": current_user.is_age_public,
@@ -101,7 +107,7 @@ def update_profile(
     show_comments: str = Form("true"),
     theme_preference: str = Form("system"),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_db_user)
 ):
     if full_name is not None:
         current_user.full_name = full_name
@@ -116,12 +122,8 @@ def update_profile(
     if short_description is not None:
         current_user.short_description = short_description
     if profile_picture is not None:
-        upload_dir = "uploads"
-        os.makedirs(upload_dir, exist_ok=True)
-        file_location = os.path.join(upload_dir, profile_picture.filename).replace("\\", "/")
-        with open(file_location, "wb") as f:
-            f.write(profile_picture.file.read())
-        current_user.profile_picture = file_location
+        tmp_path, digest = picture_store.spool(read_chunks(profile_picture.file))
+        current_user.profile_picture = picture_store.store(tmp_path, digest)
     current_user.is_full_name_public = (is_full_name_public.lower() == "true")
     current_user.is_age_public = (is_age_public.lower() == "true")
     current_user.is_description_public = (is_description_public.lower() == "true")
@@ -131,12 +133,14 @@ def update_profile(
     current_user.show_comments = (show_comments.lower() == "true")
     current_user.theme_preference = theme_preference
     db.commit()
+    identity_cache.invalidate(current_user.id)
     return {
         "username": current_user.username,
         "full_name": current_user.full_name,
         "birth_date": current_user.birth_date.isoformat() if current_user.birth_date else None,
         "short_description": current_user.short_description,
         "profile_picture": current_user.profile_picture,
+        "profile_picture_variants": variant_urls(current_user.profile_picture),
         "points": current_user.points,
         "is_full_name_public": current_user.is_full_name_public,
         "is_age_public": current_user.is_age_public,
@@ -148,9 +152,44 @@ def update_profile(
         "theme_preference": current_user.theme_preference
     }
 
+@router.put("/profile/picture")
+async def upload_profile_picture(request: Request,
+                                 db: AsyncSession = Depends(get_async_db),
+                                 current_user: UserIdentity = Depends(get_current_user_async)):
+    """
+    Stores the raw request body as profile picture. The body is streamed to disk
+    in chunks and rejected with 413 as soon as it exceeds PROFILE_PICTURE_MAX_BYTES.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > PROFILE_PICTURE_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Profilbild ist zu groß")
+    f, tmp_path = await run_in_threadpool(picture_store.open_temp)
+    writer = UploadWriter(f, tmp_path)
+    # file writes go through the thread pool in CHUNK_SIZE pieces, not per received chunk
+    buffer = bytearray()
+    try:
+        async for chunk in request.stream():
+            buffer += chunk
+            if len(buffer) >= CHUNK_SIZE:
+                await run_in_threadpool(writer.write, bytes(buffer))
+                buffer.clear()
+        if buffer:
+            await run_in_threadpool(writer.write, bytes(buffer))
+    except BaseException:
+        await run_in_threadpool(writer.abort)
+        raise
+    tmp_path, digest = await run_in_threadpool(writer.finish)
+    path = await run_in_threadpool(picture_store.store, tmp_path, digest)
+    await db.execute(update(User).where(User.id == current_user.id).values(profile_picture=path))
+    await db.commit()
+    identity_cache.invalidate(current_user.id)
+    return {"profile_picture": path, "profile_picture_variants": variant_urls(path)}
+
 @router.get("/{user_id}/public-profile")
-def get_public_profile(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
+def get_public_profile(user_id: int,
+                       picture_size: Optional[int] = Query(256, ge=1),
+                       db: Session = Depends(get_read_db)):
+    user = db.query(User).options(undefer_group(ENCRYPTED_PROFILE_GROUP)).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="Nutzer nicht gefunden")
     computed_age = None
@@ -162,33 +201,30 @@ def get_public_profile(user_id: int, db: Session = Depends(get_db)):
         "full_name": user.full_name if user.is_full_name_public else None,
         "age": computed_age,
         "short_description": user.short_description if user.is_description_public else None,
-        "profile_picture": user.profile_picture if user.is_profile_picture_public else None,
+        "profile_picture": best_variant(user.profile_picture, picture_size) if user.is_profile_picture_public else None,
+        "profile_picture_variants": variant_urls(user.profile_picture) if user.is_profile_picture_public else {},
         "points": user.points
     }
 
 # NEW: Heartbeat endpoint using SQLite UPSERT
 @router.post("/heartbeat", status_code=status.HTTP_200_OK)
-def heartbeat(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def heartbeat(db: AsyncSession = Depends(get_async_read_db), current_user: UserIdentity = Depends(get_current_user_async)):
     """
-    Increments today's learning-minutes for the current user by one,
-    using SQLite UPSERT with correct ON CONFLICT clause on (date, user_id).
+    Counts one learning minute for today. The minute is buffered in memory and
+    written in batches (heartbeat_buffer.py); the response carries the running total.
     """
-    today_str = date.today().isoformat()
-    sql = text("""
-        INSERT INTO user_statistics(date, user_id, minutes)
-        VALUES(:d, :uid, 1)
-        ON CONFLICT(date, user_id) DO UPDATE
-          SET minutes = user_statistics.minutes + 1
-    """)
-    db.execute(sql, {"d": today_str, "uid": current_user.id})
-    db.commit()
-    stat = db.query(UserStatistic).filter_by(date=date.fromisoformat(today_str), user_id=current_user.id).first()
-    return {"date": today_str, "minutes": stat.minutes}
+    today = date.today()
+    minutes = heartbeat_aggregator.record(current_user.id, today)
+    if minutes is None:
+        # first heartbeat of the day for this user in this process
+        stored = (await db.execute(stored_minutes_query(current_user.id, today))).scalar()
+        minutes = heartbeat_aggregator.set_stored(current_user.id, today, stored or 0)
+    return {"date": today.isoformat(), "minutes": minutes}
 
 
 # NEW: Self-enrollment endpoints
 @router.get("/courses", response_model=list)
-def get_enrolled_courses(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_enrolled_courses(db: Session = Depends(get_db), current_user: User = Depends(get_current_db_user)):
     return [
         {
             "id": c.id,
@@ -198,7 +234,7 @@ def get_enrolled_courses(db: Session = Depends(get_db), current_user: User = Dep
     ]
 
 @router.post("/courses/{course_id}", status_code=status.HTTP_201_CREATED)
-def enroll_course(course_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def enroll_course(course_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_db_user)):
     course = db.query(Course).filter(Course.id == course_id).first()
     if not course:
         raise HTTPException(status_code=404, detail="Kurs nicht gefunden")
@@ -209,7 +245,7 @@ def enroll_course(course_id: int, db: Session = Depends(get_db), current_user: U
     return {"message": "eingeschrieben", "course_id": course_id}
 
 @router.delete("/courses/{course_id}", status_code=status.HTTP_204_NO_CONTENT)
-def unenroll_course(course_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def unenroll_course(course_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_db_user)):
     course = db.query(Course).filter(Course.id == course_id).first()
     if not course or course not in current_user.courses:
         raise HTTPException(status_code=404, detail="Nicht eingeschrieben")
@@ -1,6 +1,6 @@
 # backend/schemas.py
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 class CourseCreate(BaseModel):
     title: str
@@ -12,4 +12,11 @@ class CourseResponse(BaseModel):
     course_id: int
     title: str
     status: str
-    didactic_feedback: Optional[dict] = None
\ No newline at end of file
+    didactic_feedback: Optional[dict] = None
+
+class QuizAnswer(BaseModel):
+    question_id: int
+    selected_option: int
+
+class QuizAnswerBatch(BaseModel):
+    answers: List[QuizAnswer] = Field(..., min_length=1, max_length=200)
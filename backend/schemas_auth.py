@@ -1,4 +1,5 @@
 from pydantic import BaseModel, constr
+from typing import Optional
 
 class UserRegister(BaseModel):
     username: str
@@ -6,12 +7,16 @@ class UserRegister(BaseModel):
     role: str = "User"  # Default role is User
 
 class UserLogin(BaseModel):
-    identifier: str  # Now only the username is needed
+    identifier: str  # username or email
     password: str
 
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     user_id: int = None
@@ -0,0 +1,106 @@
+"""
+Gemeinsame Fixtures: jede Testsitzung läuft gegen eine eigene SQLite-Datenbank in
+einem temporären Verzeichnis, das auch als Arbeitsverzeichnis (``uploads/``) dient.
+
+    cd backend
+    pip install -r requirements-dev.txt
+    python -m pytest -q
+
+Benchmarks (``test_*_benchmark``) laufen mit kleinen Mengen im normalen Lauf mit
+und prüfen nur grobe Grenzen; ``BENCHMARK_SCALE`` vergrößert die Mengen, ``-s``
+zeigt die Messwerte:
+
+    BENCHMARK_SCALE=50 python -m pytest -q -s -k benchmark
+"""
+import os
+import sys
+import tempfile
+import uuid
+from contextlib import contextmanager
+
+import pytest
+
+BENCHMARK_SCALE = float(os.getenv("BENCHMARK_SCALE", "1"))
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_DIR = tempfile.mkdtemp(prefix="lernplattform-tests-")
+
+# must be set before database.py is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DIR}/test.db"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.chdir(TEST_DIR)
+os.makedirs("uploads", exist_ok=True)
+sys.path.insert(0, BACKEND_DIR)
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+import database  # noqa: E402
+from main import app  # noqa: E402
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+def _headers(client, username: str, password: str) -> dict:
+    token = client.post("/api/auth/login", json={"identifier": username, "password": password}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    return _headers(client, "admin", "admin")
+
+@pytest.fixture
+def student_headers(client):
+    """A fresh student account per test."""
+    username = f"student_{uuid.uuid4().hex[:8]}"
+    r = client.post("/api/auth/register", json={"username": username, "password": "secret1"})
+    assert r.status_code == 201, r.text
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+@pytest.fixture
+def count_queries():
+    """Context manager counting SQL statements on all engines (sync and async)."""
+    engines = [database.engine, database.read_engine,
+               database.async_engine.sync_engine, database.async_read_engine.sync_engine]
+
+    @contextmanager
+    def counting():
+        counter = QueryCounter()
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            counter.statements.append(statement)
+
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield counter
+        finally:
+            for engine in engines:
+                event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    return counting
+
+@pytest.fixture
+def make_course(client, admin_headers):
+    """Create a course with a unique title; returns its id."""
+    def make() -> int:
+        r = client.post("/api/courses", json={
+            "title": f"Kurs {uuid.uuid4().hex[:8]}", "short_description": "Testkurs", "course_content": ""
+        }, headers=admin_headers)
+        assert r.status_code == 201, r.text
+        return r.json()["course_id"]
+    return make
+
+@pytest.fixture
+def scaled():
+    """Benchmark size: base * BENCHMARK_SCALE."""
+    return lambda base: max(1, int(base * BENCHMARK_SCALE))
@@ -0,0 +1,78 @@
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+from passlib.context import CryptContext
+
+import auth_utils
+
+@pytest.fixture
+def bcrypt_cost(monkeypatch):
+    """Production-like bcrypt cost for the login-storm tests (the suite uses 4)."""
+    context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=10)
+    monkeypatch.setattr(auth_utils, "pwd_context", context)
+    return context
+
+def _register(client, password: str) -> str:
+    username = f"storm_{uuid.uuid4().hex[:8]}"
+    assert client.post("/api/auth/register", json={"username": username, "password": password}).status_code == 201
+    return username
+
+def _storm(client, logins: int, username: str, password: str, probe_path: str, probe_headers=None):
+    """Concurrent logins plus a probe of an unrelated endpoint every 10 ms while they run."""
+    done = threading.Event()
+    probes = []
+
+    def probe() -> None:
+        while not done.is_set():
+            started = time.perf_counter()
+            assert client.get(probe_path, headers=probe_headers).status_code == 200
+            probes.append(time.perf_counter() - started)
+            time.sleep(0.01)
+
+    def login(_) -> httpx.Response:
+        return client.post("/api/auth/login", json={"identifier": username, "password": password})
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+    started = time.perf_counter()
+    # the TestClient hands every call to the app's single event loop
+    with ThreadPoolExecutor(max_workers=logins) as pool:
+        responses = list(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    prober.join()
+    return responses, elapsed, probes
+
+def test_login_storm_benchmark(client, student_headers, bcrypt_cost, scaled):
+    """Logins/s and the latency of an unrelated endpoint during a login storm; prints the figures with -s."""
+    username = _register(client, "secret1")
+    logins = scaled(40)
+    idle = []
+    for _ in range(50):
+        started = time.perf_counter()
+        client.get("/api/courses", headers=student_headers)
+        idle.append(time.perf_counter() - started)
+    responses, elapsed, probes = _storm(client, logins, username, "secret1", "/api/courses", student_headers)
+    codes = [r.status_code for r in responses]
+    # beyond HASHING_QUEUE_LIMIT waiting logins the pool answers 503 instead of queueing
+    assert set(codes) <= {200, 503} and codes.count(200) >= min(logins, auth_utils.HASHING_QUEUE_LIMIT)
+    print(f"\n{logins} Logins (bcrypt-Kosten 10, {auth_utils.HASHING_WORKERS} Hash-Threads, "
+          f"{codes.count(503)}x 503): {codes.count(200) / elapsed:.1f} Logins/s; /api/courses währenddessen Median "
+          f"{statistics.median(probes) * 1000:.1f} ms, max {max(probes) * 1000:.1f} ms ({len(probes)} Proben; "
+          f"ohne Last Median {statistics.median(idle) * 1000:.1f} ms)")
+    # the catalog keeps answering while bcrypt runs on its own pool
+    assert statistics.median(probes) < 0.25
+
+def test_saturated_hashing_pool_answers_503(client, bcrypt_cost, monkeypatch):
+    username = _register(client, "secret1")
+    monkeypatch.setattr(auth_utils, "_hashing_slots", threading.BoundedSemaphore(auth_utils.HASHING_WORKERS + 2))
+    responses, _, _ = _storm(client, 20, username, "secret1", "/api")
+    codes = [r.status_code for r in responses]
+    assert codes.count(200) >= auth_utils.HASHING_WORKERS + 2 and 503 in codes
+    rejected = next(r for r in responses if r.status_code == 503)
+    assert rejected.headers["retry-after"] == str(auth_utils.HASHING_RETRY_AFTER_SECONDS)
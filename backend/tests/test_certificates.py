@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from certificates import CertificateStore, certificate_store
+
+def test_etag_and_conditional_get(client, student_headers, make_course):
+    course_id = make_course()
+    url = f"/api/courses/{course_id}/certificate"
+    r = client.get(url, headers=student_headers)
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/pdf"
+    assert r.content.startswith(b"%PDF")
+    etag = r.headers["etag"]
+
+    r = client.get(url, headers={**student_headers, "If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.headers["etag"] == etag and not r.content
+
+    # a different name is a different document
+    r = client.get(url, params={"name": "Erika Mustermann"}, headers={**student_headers, "If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["etag"] != etag
+
+def test_cached_pdf_is_reused(client, student_headers, make_course, monkeypatch):
+    renders = []
+    render = certificate_store.render
+
+    async def counting_render(*args):
+        renders.append(args[0])
+        return await render(*args)
+    monkeypatch.setattr(certificate_store, "render", counting_render)
+
+    url = f"/api/courses/{make_course()}/certificate"
+    first = client.get(url, headers=student_headers)
+    second = client.get(url, headers=student_headers)
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content and first.headers["etag"] == second.headers["etag"]
+    assert len(renders) == 1
+
+def test_unfinished_quiz_gets_no_certificate(client, admin_headers, student_headers, make_course):
+    course_id = make_course()
+    client.post(f"/api/courses/{course_id}/quiz-questions", json={
+        "question_text": "2+2?", "option1": "3", "option2": "4", "option3": "5", "option4": "6", "correct_option": 2
+    }, headers=admin_headers)
+    assert client.get(f"/api/courses/{course_id}/certificate", headers=student_headers).status_code == 400
+
+@pytest.fixture
+def store(tmp_path):
+    return CertificateStore(directory=str(tmp_path), max_bytes=1000)
+
+def test_eviction_keeps_a_running_total(store, monkeypatch):
+    scans = []
+    scan = store._scan
+
+    def counting_scan():
+        scans.append(1)
+        return scan()
+    monkeypatch.setattr(store, "_scan", counting_scan)
+
+    for i in range(4):
+        path = store._store(f"k{i}", b"x" * 200)
+        # oldest first; later lookups refresh the mtime
+        os.utime(path, (i, i))
+    assert store._size == 800 and len(scans) == 1  # only the initial size
+
+    assert store._lookup("k0") is not None  # k0 is now the most recently served
+    store._store("k4", b"x" * 400)
+    # 1200 > 1000: the least recently served files go until at most 900 bytes remain
+    assert len(scans) == 2
+    assert sorted(os.listdir(store.directory)) == ["k0.pdf", "k3.pdf", "k4.pdf"]
+    assert store._size == 800
+
+def test_storing_the_same_key_twice_is_counted_once(store):
+    store._store("k", b"x" * 300)
+    store._store("k", b"x" * 300)
+    assert store._size == 300
+
+def test_initial_size_comes_from_disk(tmp_path):
+    with open(tmp_path / "alt.pdf", "wb") as f:
+        f.write(b"x" * 900)
+    os.utime(tmp_path / "alt.pdf", (0, 0))
+    store = CertificateStore(directory=str(tmp_path), max_bytes=1000)
+    store._store("neu", b"x" * 200)
+    # the old file is least recently served and goes first
+    assert os.listdir(tmp_path) == ["neu.pdf"] and store._size == 200
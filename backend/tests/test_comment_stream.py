@@ -0,0 +1,120 @@
+import asyncio
+import json
+import time
+import tracemalloc
+
+import pytest
+from fastapi import HTTPException
+
+import comment_stream
+import main
+from comment_stream import CommentHub, event_stream
+
+@pytest.fixture
+def hub(monkeypatch):
+    hub = CommentHub(queue_size=2, max_subscribers=100)
+    monkeypatch.setattr(comment_stream, "comment_hub", hub)
+    monkeypatch.setattr(main, "comment_hub", hub)
+    return hub
+
+def comment(comment_id: int) -> dict:
+    return {"id": comment_id, "content": f"Kommentar {comment_id}", "parent_id": None}
+
+def data(chunk: str) -> dict:
+    return json.loads(chunk.split("data: ", 1)[1])
+
+def test_fan_out_to_every_subscriber_of_the_course(hub):
+    async def scenario():
+        streams = [event_stream(1) for _ in range(3)]
+        other = event_stream(2)
+        for stream in streams + [other]:
+            assert await anext(stream) == "retry: 3000\n\n"
+        assert hub.stats()["subscribers"] == 4
+        hub.publish(1, comment(7))
+        for stream in streams:
+            chunk = await anext(stream)
+            assert chunk.startswith("event: comment\nid: 7\n") and data(chunk)["id"] == 7
+        assert all(s.queue.empty() for s in hub._courses[2])
+        for stream in streams + [other]:
+            await stream.aclose()
+        assert hub.stats()["subscribers"] == 0 and hub.stats()["courses"] == 0
+    asyncio.run(scenario())
+
+def test_slow_consumer_is_evicted_without_affecting_others(hub):
+    async def scenario():
+        slow, fast = event_stream(1), event_stream(1)
+        await anext(slow)
+        await anext(fast)
+        for comment_id in range(1, 4):
+            hub.publish(1, comment(comment_id))
+            assert data(await anext(fast))["id"] == comment_id
+        # the slow client's queue (size 2) overflowed on the third comment
+        assert "event: evicted" in await anext(slow)
+        with pytest.raises(StopAsyncIteration):
+            await anext(slow)
+        assert hub.metrics["evicted"] == 1 and hub.stats()["subscribers"] == 1
+        await fast.aclose()
+    asyncio.run(scenario())
+
+def test_keepalive_while_idle(hub, monkeypatch):
+    monkeypatch.setattr(comment_stream, "COMMENT_STREAM_KEEPALIVE_SECONDS", 0.05)
+    async def scenario():
+        stream = event_stream(1)
+        await anext(stream)
+        assert await anext(stream) == ": keepalive\n\n"
+        hub.publish(1, comment(1))
+        assert data(await anext(stream))["id"] == 1
+        await stream.aclose()
+    asyncio.run(scenario())
+
+def test_response_that_is_never_iterated_leaves_no_subscriber(hub):
+    response = asyncio.run(main.stream_comments(1))
+    assert response.media_type == "text/event-stream"
+    assert hub.stats()["subscribers"] == 0
+
+def test_subscriber_limit(hub):
+    hub.max_subscribers = 1
+    async def scenario():
+        stream = event_stream(1)
+        await anext(stream)
+        with pytest.raises(HTTPException) as exc:
+            await main.stream_comments(1)
+        assert exc.value.status_code == 503
+        # a stream started after the route's check ends right after the retry hint
+        late = event_stream(1)
+        assert await anext(late) == "retry: 3000\n\n"
+        with pytest.raises(StopAsyncIteration):
+            await anext(late)
+        await stream.aclose()
+        assert hub.stats()["subscribers"] == 0
+    asyncio.run(scenario())
+
+def test_fan_out_to_thousands_of_subscribers(monkeypatch):
+    """Fan-out latency and memory per connection; prints the figures with -s."""
+    subscribers = 5000
+    hub = CommentHub(queue_size=64, max_subscribers=subscribers)
+    monkeypatch.setattr(comment_stream, "comment_hub", hub)
+
+    async def scenario():
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        streams = [event_stream(1) for _ in range(subscribers)]
+        for stream in streams:
+            await anext(stream)
+        per_connection = (tracemalloc.get_traced_memory()[0] - before) / subscribers
+        tracemalloc.stop()
+
+        started = time.perf_counter()
+        hub.publish(1, comment(1))
+        received = await asyncio.gather(*(anext(stream) for stream in streams))
+        fan_out = time.perf_counter() - started
+        assert all(data(chunk)["id"] == 1 for chunk in received)
+        await asyncio.gather(*(stream.aclose() for stream in streams))
+        return per_connection, fan_out
+
+    per_connection, fan_out = asyncio.run(scenario())
+    print(f"\n{subscribers} Abonnenten: {per_connection / 1024:.1f} KiB pro Verbindung, "
+          f"Verteilung in {fan_out * 1000:.0f} ms")
+    assert hub.stats()["subscribers"] == 0
+    assert per_connection < 8 * 1024
+    assert fan_out < 2.0
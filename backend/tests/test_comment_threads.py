@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import comment_threads
+from comment_threads import CommentThreadCache, comment_cache, encode_cursor
+
+def _post(client, headers, course_id, content, parent_id=None):
+    r = client.post(f"/api/comments/{course_id}", json={"content": content, "parent_id": parent_id}, headers=headers)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+def test_first_page_is_cached_and_invalidated_by_a_post(client, student_headers, make_course, count_queries):
+    course_id = make_course()
+    _post(client, student_headers, course_id, "erster")
+    with count_queries() as cold:
+        client.get(f"/api/comments/{course_id}")
+    with count_queries() as cached:
+        r = client.get(f"/api/comments/{course_id}")
+    assert (cold.count, cached.count) == (1, 0)
+    assert [c["content"] for c in r.json()["threads"]] == ["erster"]
+    _post(client, student_headers, course_id, "zweiter")
+    assert len(client.get(f"/api/comments/{course_id}").json()["threads"]) == 2
+
+def test_client_cursors_and_limits_are_not_cached(client, student_headers, make_course):
+    course_id = make_course()
+    first = _post(client, student_headers, course_id, "eins")
+    client.get(f"/api/comments/{course_id}")
+    for i in range(20):
+        cursor = encode_cursor(datetime(2020, 1, 1, 0, 0, i), first["id"])
+        assert client.get(f"/api/comments/{course_id}", params={"cursor": cursor}).status_code == 200
+        assert client.get(f"/api/comments/{course_id}", params={"limit": i + 1}).status_code == 200
+    # only the default first page of the top level
+    assert list(comment_cache._courses[course_id][0]) == [None]
+
+def test_pages_per_course_are_bounded():
+    cache = CommentThreadCache(max_pages=2)
+    page = {"items": [], "next_cursor": None}
+    for parent_id in (None, 1, 2):
+        cache.put(7, parent_id, page, cache.generation(7))
+    assert cache.get(7, None) is None
+    assert cache.get(7, 1) == cache.get(7, 2) == page
+
+def test_reply_pages(client, student_headers, make_course):
+    course_id = make_course()
+    parent = _post(client, student_headers, course_id, "Frage")
+    for i in range(comment_threads.COMMENT_PAGE_SIZE + 1):
+        _post(client, student_headers, course_id, f"Antwort {i}", parent["id"])
+    url = f"/api/comments/{course_id}/{parent['id']}/replies"
+    first = client.get(url).json()
+    second = client.get(url, params={"cursor": first["next_cursor"]}).json()
+    assert len(first["replies"]) == comment_threads.COMMENT_PAGE_SIZE
+    assert [r["content"] for r in second["replies"]] == [f"Antwort {comment_threads.COMMENT_PAGE_SIZE}"]
+    assert second["next_cursor"] is None
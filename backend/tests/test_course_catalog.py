@@ -0,0 +1,22 @@
+def test_catalog_is_one_query_regardless_of_course_count(client, student_headers, make_course, count_queries):
+    first = make_course()
+    client.post(f"/api/user/courses/{first}", headers=student_headers)
+    # warm the identity cache so only the catalog query is left
+    client.get("/api/courses", headers=student_headers)
+
+    with count_queries() as few:
+        before = client.get("/api/courses", headers=student_headers).json()
+    for _ in range(20):
+        make_course()
+    with count_queries() as many:
+        after = client.get("/api/courses", headers=student_headers).json()
+
+    assert len(after) == len(before) + 20
+    assert few.count == many.count == 1
+    assert [c["enrolled"] for c in after if c["id"] == first] == [True]
+    assert sum(c["enrolled"] for c in after) == 1
+
+def test_catalog_keyset_pagination(client, student_headers, make_course):
+    ids = [make_course() for _ in range(3)]
+    page = client.get("/api/courses", params={"after_id": ids[0], "limit": 2}, headers=student_headers).json()
+    assert [c["id"] for c in page] == ids[1:]
@@ -0,0 +1,78 @@
+import random
+import statistics
+import time
+
+from sqlalchemy import create_engine, insert, text
+
+import course_search
+from database import Base
+from models import Course
+
+TOPICS = ("Bruch Prozent Gleichung Funktion Vektor Atom Zelle Energie Satzbau Grammatik Gedicht Epoche "
+          "Klima Kontinent Demokratie Algorithmus Schleife Variable Melodie Rhythmus Farbe Fläche").split()
+SYLLABLES = ("ba", "ke", "li", "mo", "nu", "ra", "se", "ti", "vo", "zu", "ent", "ung", "ver", "lich", "keit")
+
+def _vocabulary(rng: random.Random):
+    # topic words first, then 20k made-up words; word frequency falls off as 1/rank
+    words = TOPICS + ["".join(rng.choices(SYLLABLES, k=4)) + str(i) for i in range(20_000)]
+    weights, total = [], 0.0
+    for rank in range(1, len(words) + 1):
+        total += 1 / rank
+        weights.append(total)
+    return words, weights
+
+def _index(tmp_path, courses: int):
+    engine = create_engine(f"sqlite:///{tmp_path}/search_{courses}.db")
+    Base.metadata.create_all(engine)
+    rng = random.Random(courses)
+    words, weights = _vocabulary(random.Random(0))
+
+    def text_of(k: int) -> str:
+        return " ".join(rng.choices(words, cum_weights=weights, k=k))
+
+    with engine.begin() as conn:
+        conn.execute(text(course_search.CREATE_SEARCH_TABLE))
+        conn.execute(insert(Course), [
+            {
+                "title": f"{text_of(3)} {i}",
+                "short_description": text_of(12),
+                "course_content": "<p>" + "</p><p>".join(text_of(30) for _ in range(6)) + "</p>"
+            } for i in range(courses)
+        ])
+        assert course_search.rebuild(conn) == courses
+    return engine
+
+def test_search_latency_benchmark(tmp_path, scaled):
+    """Search latency by index size; BENCHMARK_SCALE=10 gives 10k and 100k courses."""
+    words, _ = _vocabulary(random.Random(0))
+    # a term in most courses, in a few percent, in a handful; prefix; two terms
+    queries = {
+        "häufig": "Bruch", "mittel": "Melodie", "selten": words[5_000], "Präfix": "Gleich",
+        "zwei Begriffe": "Zelle Energie", "kein Treffer": "gibtesnicht"
+    }
+    for courses in (scaled(1_000), scaled(10_000)):
+        engine = _index(tmp_path, courses)
+        timings = {}
+        with engine.connect() as conn:
+            for label, q in queries.items():
+                samples = []
+                for _ in range(10):
+                    started = time.perf_counter()
+                    rows = conn.execute(
+                        course_search.search_statement(None),
+                        {"q": course_search.to_match_query(q), "limit": 20, "offset": 0}
+                    ).all()
+                    samples.append(time.perf_counter() - started)
+                    assert len(rows) <= 20
+                timings[label] = statistics.median(samples)
+            started = time.perf_counter()
+            like = conn.execute(
+                text("SELECT id FROM courses WHERE course_content LIKE :q LIMIT 20"), {"q": "%gibtesnicht%"}
+            ).all()
+            scan = time.perf_counter() - started
+            assert like == []
+        engine.dispose()
+        print(f"\n{courses} Kurse (Median): " + ", ".join(f"{label} {t * 1000:.2f} ms" for label, t in timings.items())
+              + f"; LIKE-Scan ohne Treffer {scan * 1000:.1f} ms")
+        # rare terms only touch their own posting lists
+        assert timings["selten"] < scan
@@ -0,0 +1,156 @@
+import asyncio
+import multiprocessing
+import statistics
+import threading
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import database
+from database import Base
+from dependencies import get_async_read_db, get_read_db
+from models import Course, CourseOpenEvent
+from routes.courses import catalog_query
+
+def _p99(samples) -> float:
+    return statistics.quantiles(samples, n=100)[98]
+
+def _write(mode: str, url: str, worker: int, writes: int, batch: int, start) -> None:
+    # runs in its own process so the readers only wait for SQLite locks, not the GIL
+    database.DB_ENGINE_MODE = mode
+    database.SQLALCHEMY_DATABASE_URL = url
+    engine = database._create_engine()
+    start.wait()
+    for i in range(writes):
+        with engine.begin() as conn:
+            conn.execute(insert(CourseOpenEvent), [
+                {"user_id": worker, "course_id": 1 + (i + j) % 100} for j in range(batch)
+            ])
+
+def _mixed_load(mode: str, url: str, readers: int, reads: int, writers: int, writes: int):
+    read_engine = database._create_engine(read_only=True)
+    context = multiprocessing.get_context("spawn")
+    start = context.Barrier(readers + writers + 1)
+    processes = [context.Process(target=_write, args=(mode, url, w, writes, 50, start)) for w in range(writers)]
+    for process in processes:
+        process.start()
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def read() -> None:
+        own = []
+        start.wait()
+        for _ in range(reads):
+            started = time.perf_counter()
+            try:
+                with read_engine.connect() as conn:
+                    conn.execute(select(Course.id, Course.title).order_by(Course.id).limit(50)).all()
+            except Exception as exc:  # "database is locked" is a failed request
+                errors.append(exc)
+            own.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=read) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    read_engine.dispose()
+    return latencies, errors, elapsed, [process.exitcode for process in processes]
+
+def test_mixed_read_write_benchmark(tmp_path, monkeypatch, scaled):
+    """Reader p99 while writers commit, rollback journal vs. WAL; prints the figures with -s."""
+    reads, writes = scaled(200), scaled(100)
+    results = {}
+    for mode in ("default", "concurrent"):
+        monkeypatch.setattr(database, "DB_ENGINE_MODE", mode)
+        url = f"sqlite:///{tmp_path}/{mode}.db"
+        monkeypatch.setattr(database, "SQLALCHEMY_DATABASE_URL", url)
+        engine = database._create_engine()
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(insert(Course), [{"title": f"Kurs {i}", "short_description": "x" * 200} for i in range(100)])
+            journal = conn.execute(text("PRAGMA journal_mode")).scalar()
+        engine.dispose()
+        latencies, errors, elapsed, exitcodes = _mixed_load(mode, url, readers=4, reads=reads, writers=2, writes=writes)
+        assert exitcodes == [0, 0]
+        results[mode] = (journal, _p99(latencies), statistics.median(latencies), len(errors), 2 * writes / elapsed)
+
+    for mode, (journal, p99, median, errors, commits) in results.items():
+        print(f"\n{mode} ({journal}): Lesen p99 {p99 * 1000:.2f} ms, Median {median * 1000:.2f} ms, "
+              f"{commits:.0f} Commits/s à 50 Zeilen, {errors} Fehler")
+    assert results["default"][0] == "delete" and results["concurrent"][0] == "wal"
+    # WAL readers never wait for a writer and nobody sees "database is locked"
+    assert results["concurrent"][3] == 0
+
+def test_sync_vs_async_in_flight_benchmark(client, scaled):
+    """The same catalog query as a sync and an async route under concurrent load; prints the figures with -s."""
+    app = FastAPI()
+    in_flight = {"now": 0, "peak": 0}
+    threads = {"peak": 0}
+
+    def enter() -> None:
+        in_flight["now"] += 1
+        in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+        threads["peak"] = max(threads["peak"], threading.active_count())
+
+    def leave() -> None:
+        in_flight["now"] -= 1
+
+    @app.get("/sync")
+    def sync_catalog(db: Session = Depends(get_read_db)):
+        enter()
+        try:
+            return [row.id for row in db.execute(catalog_query(None, limit=50))]
+        finally:
+            leave()
+
+    @app.get("/async")
+    async def async_catalog(db: AsyncSession = Depends(get_async_read_db)):
+        enter()
+        try:
+            return [row.id for row in await db.execute(catalog_query(None, limit=50))]
+        finally:
+            leave()
+
+    async def load(path: str, concurrency: int):
+        # the async pool's wait queue belongs to one event loop: start and leave with a fresh pool
+        await database.async_read_engine.dispose()
+        try:
+            return await _load(path, concurrency)
+        finally:
+            await database.async_read_engine.dispose()
+
+    async def _load(path: str, concurrency: int):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            async def one() -> float:
+                started = time.perf_counter()
+                assert (await http.get(path)).status_code == 200
+                return time.perf_counter() - started
+            await one()  # warm the pools
+            in_flight["peak"] = threads["peak"] = 0
+            started = time.perf_counter()
+            latencies = await asyncio.gather(*(one() for _ in range(concurrency)))
+            return concurrency / (time.perf_counter() - started), _p99(latencies)
+
+    concurrency = scaled(200)
+    results = {}
+    for path in ("/sync", "/async"):
+        rate, p99 = asyncio.run(load(path, concurrency))
+        results[path] = (rate, p99, in_flight["peak"], threads["peak"])
+        print(f"\n{path}: {concurrency} gleichzeitige Anfragen, {rate:.0f} Anfragen/s, p99 {p99 * 1000:.0f} ms, "
+              f"höchstens {in_flight['peak']} im Handler, {threads['peak']} Threads")
+    # sync handlers occupy a threadpool worker each (40 by default); async ones do not
+    assert results["/sync"][2] <= 40
+    assert results["/async"][2] > 40 or concurrency <= 40
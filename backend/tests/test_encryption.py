@@ -0,0 +1,79 @@
+import base64
+import os
+import time
+
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session, undefer_group
+
+import encryption_utils
+from database import Base
+from models import ENCRYPTED_PROFILE_GROUP, User
+
+def _cpu(fn):
+    started = time.process_time()
+    result = fn()
+    return result, time.process_time() - started
+
+def test_user_listing_benchmark(tmp_path, scaled):
+    """CPU for listing users with and without decrypting the profile group; BENCHMARK_SCALE=10 gives 50k users."""
+    users = scaled(5_000)
+    engine = create_engine(f"sqlite:///{tmp_path}/users.db")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {
+                "username": f"u{i}", "role": "User", "email": f"u{i}@example.org", "phone": "+49 30 1234567",
+                "full_name": f"Vorname Nachname {i}", "short_description": "Lernt gern Mathematik. " * 5,
+                "profile_picture": f"uploads/u{i}.webp"
+            } for i in range(users)
+        ])
+
+    with Session(engine) as db:
+        rows, eager = _cpu(lambda: db.query(User).options(undefer_group(ENCRYPTED_PROFILE_GROUP)).all())
+        assert rows[-1].full_name == f"Vorname Nachname {users - 1}"
+    with Session(engine) as db:
+        rows, deferred = _cpu(lambda: db.query(User).all())
+        assert len(rows) == users and "full_name" not in rows[0].__dict__
+    with Session(engine) as db:
+        # admin.read_users
+        rows, projection = _cpu(lambda: db.query(User.id, User.username, User.role, User.daily_target).all())
+        assert len(rows) == users
+
+    print(f"\n{users} Nutzer auflisten (CPU): entschlüsselt {eager * 1000:.0f} ms, "
+          f"verzögert {deferred * 1000:.0f} ms, Projektion {projection * 1000:.0f} ms")
+    assert deferred < eager and projection < eager
+
+def _legacy_encrypt(plaintext: str) -> str:
+    # the former AES-CBC format: a new Cipher object and padder per value
+    padder = padding.PKCS7(128).padder()
+    padded = padder.update(plaintext.encode("utf-8")) + padder.finalize()
+    iv = os.urandom(16)
+    encryptor = Cipher(algorithms.AES(encryption_utils.key), modes.CBC(iv)).encryptor()
+    return base64.b64encode(iv + encryptor.update(padded) + encryptor.finalize()).decode("utf-8")
+
+def _per_second(fn, values) -> float:
+    started = time.perf_counter()
+    for value in values:
+        fn(value)
+    return len(values) / (time.perf_counter() - started)
+
+def test_encryption_throughput_benchmark(scaled):
+    """Encrypt/decrypt per second, legacy AES-CBC vs. the AES-GCM envelope; prints the figures with -s."""
+    values = [f"vorname.nachname{i}@example.org" for i in range(scaled(20_000))]
+    legacy = [_legacy_encrypt(v) for v in values]
+    current = [encryption_utils.encrypt(v) for v in values]
+    assert [encryption_utils.decrypt(c) for c in legacy[:10]] == values[:10]
+    assert [encryption_utils.decrypt(c) for c in current[:10]] == values[:10]
+
+    rates = {
+        "CBC verschlüsseln": _per_second(_legacy_encrypt, values),
+        "CBC entschlüsseln": _per_second(encryption_utils.decrypt, legacy),
+        "GCM verschlüsseln": _per_second(encryption_utils.encrypt, values),
+        "GCM entschlüsseln": _per_second(encryption_utils.decrypt, current),
+    }
+    print(f"\n{len(values)} Werte: " + ", ".join(f"{label} {rate / 1000:.0f}k/s" for label, rate in rates.items()))
+    # one reusable AESGCM object per key instead of a Cipher and padder per value
+    assert rates["GCM verschlüsseln"] > rates["CBC verschlüsseln"]
+    assert rates["GCM entschlüsseln"] > rates["CBC entschlüsseln"]
@@ -0,0 +1,50 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func, select
+
+import database
+from event_buffer import OpenEventBuffer, open_event_buffer
+from models import CourseOpenEvent
+
+def _open_events(course_id: int) -> int:
+    with database.engine.connect() as conn:
+        return conn.execute(
+            select(func.count()).select_from(CourseOpenEvent).where(CourseOpenEvent.course_id == course_id)
+        ).scalar()
+
+def test_course_opens_benchmark(client, student_headers, make_course, scaled):
+    """Course opens/s through GET /api/courses/{id} and the cost of the write path; prints the figures with -s."""
+    course_id = make_course()
+    url = f"/api/courses/{course_id}"
+    opens = scaled(400)
+    client.get(url, headers=student_headers)  # warm the identity cache
+    open_event_buffer.flush()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        codes = list(pool.map(lambda _: client.get(url, headers=student_headers).status_code, range(opens)))
+    route_rate = opens / (time.perf_counter() - started)
+    assert codes == [200] * opens
+    open_event_buffer.flush()
+    assert _open_events(course_id) == opens + 1
+
+    # write path alone: one transaction per open (the former GET) vs. one batch
+    user_id = 1
+    started = time.perf_counter()
+    for _ in range(opens):
+        buffer = OpenEventBuffer()
+        buffer.record(user_id, course_id)
+        buffer.flush()
+    single_rate = opens / (time.perf_counter() - started)
+    buffer = OpenEventBuffer()
+    started = time.perf_counter()
+    for _ in range(opens):
+        buffer.record(user_id, course_id)
+    assert buffer.flush() == opens
+    batch_rate = opens / (time.perf_counter() - started)
+    assert _open_events(course_id) == 3 * opens + 1
+
+    print(f"\n{opens} Kursaufrufe: Route {route_rate:.0f}/s (8 Threads); Schreiben einzeln "
+          f"{single_rate:.0f}/s, gesammelt {batch_rate:.0f}/s")
+    assert batch_rate > single_rate
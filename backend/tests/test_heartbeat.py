@@ -0,0 +1,73 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from sqlalchemy import func, select
+
+import database
+from heartbeat_buffer import UPSERT_MINUTES, HeartbeatAggregator, heartbeat_aggregator
+from models import UserStatistic
+
+def _minutes_today(client, headers):
+    return client.get("/api/stats", headers=headers).json()[-1]["minutes"]
+
+def test_concurrent_heartbeats_are_flushed_exactly_once(client, student_headers):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(
+            lambda _: client.post("/api/user/heartbeat", headers=student_headers), range(40)
+        ))
+    minutes = [r.json()["minutes"] for r in responses]
+    # each response is the running total when it was computed, which may already
+    # include concurrent pings; the last one computed has seen all of them
+    assert all(1 <= m <= 40 for m in minutes) and max(minutes) == 40
+    # not flushed yet: /api/stats adds the pending minutes
+    assert _minutes_today(client, student_headers) == 40
+
+    # after the flush the value comes from user_statistics; a second flush adds nothing
+    heartbeat_aggregator.flush()
+    heartbeat_aggregator.flush()
+    assert _minutes_today(client, student_headers) == 40
+    assert client.post("/api/user/heartbeat", headers=student_headers).json()["minutes"] == 41
+
+def test_heartbeat_load_benchmark(client, scaled):
+    """Learners pinging once a minute, split over two workers; BENCHMARK_SCALE=10 gives 50k learners."""
+    learners, minutes = scaled(5_000), 3
+    first_id = 10_000_000  # far away from the users the other tests create
+    today = date.today()
+    workers = [HeartbeatAggregator(), HeartbeatAggregator()]
+    ping_time = flush_time = 0.0
+    for minute in range(minutes):
+        started = time.perf_counter()
+        for user_id in range(first_id, first_id + learners):
+            # a load balancer may send a learner to either worker
+            worker = workers[(user_id + minute) % 2]
+            if worker.record(user_id, today) is None:
+                # the route reads the stored value once per worker and day
+                worker.set_stored(user_id, today, 0)
+        ping_time += time.perf_counter() - started
+        started = time.perf_counter()
+        flushed = sum(worker.flush() for worker in workers)
+        assert flushed == learners
+        flush_time += time.perf_counter() - started
+
+    with database.engine.connect() as conn:
+        total = conn.execute(
+            select(func.sum(UserStatistic.minutes))
+            .where(UserStatistic.date == today, UserStatistic.user_id >= first_id)
+        ).scalar()
+    assert total == learners * minutes
+
+    # the former per-ping path: UPSERT, read-back and commit for every ping
+    sample = scaled(500)
+    started = time.perf_counter()
+    for user_id in range(first_id, first_id + sample):
+        with database.engine.begin() as conn:
+            conn.execute(UPSERT_MINUTES, [{"date": today, "user_id": user_id, "minutes": 0}]).all()
+            conn.execute(select(UserStatistic.minutes).filter_by(date=today, user_id=user_id)).scalar()
+    per_ping = (time.perf_counter() - started) / sample
+
+    pings = learners * minutes
+    print(f"\n{learners} Lernende, {minutes} Minuten, 2 Worker: {pings / ping_time:.0f} Heartbeats/s im Speicher, "
+          f"Schreiben {flush_time / minutes * 1000:.0f} ms pro Minute; einzeln geschrieben wären es "
+          f"{per_ping * learners * 1000:.0f} ms pro Minute")
+    assert flush_time < per_ping * pings
@@ -0,0 +1,42 @@
+from jose import jwt
+from sqlalchemy import event
+
+import database
+from dependencies import _load_identity
+from identity_cache import IdentityCache, UserIdentity, identity_cache
+
+def _user_id(headers) -> int:
+    return jwt.get_unverified_claims(headers["Authorization"].split()[1])["user_id"]
+
+def test_put_after_invalidate_is_dropped():
+    cache = IdentityCache()
+    stale = UserIdentity(id=5, username="anna", role="Admin", is_child_account=False, parent_user_id=None)
+    generation = cache.generation(5)
+    cache.invalidate(5)
+    cache.put(stale, generation)
+    assert cache.get(5) is None
+    cache.put(stale, cache.generation(5))
+    assert cache.get(5) == stale
+
+def test_role_change_during_identity_load_is_not_cached_stale(client, admin_headers, student_headers):
+    user_id = _user_id(student_headers)
+    identity_cache.invalidate(user_id)
+    changed = []
+
+    def change_role_after_read(conn, cursor, statement, parameters, context, executemany):
+        # the identity row (role "User") has been read; the admin promotes the user before it is cached
+        if not changed and "FROM users" in statement:
+            changed.append(None)  # the admin request reads users as well
+            r = client.put(f"/api/admin/users/{user_id}/role", json={"role": "Teacher"}, headers=admin_headers)
+            changed[0] = r.status_code
+
+    event.listen(database.read_engine, "after_cursor_execute", change_role_after_read)
+    try:
+        with database.ReadSessionLocal() as db:
+            assert _load_identity(user_id, db).role == "User"
+    finally:
+        event.remove(database.read_engine, "after_cursor_execute", change_role_after_read)
+    assert changed == [200]
+    assert identity_cache.get(user_id) is None
+    assert client.get("/api/user/tutorial-status", headers=student_headers).status_code == 200
+    assert identity_cache.get(user_id).role == "Teacher"
@@ -0,0 +1,82 @@
+import random
+import statistics
+import time
+
+from jose import jwt
+from sqlalchemy import create_engine, func, insert, select, update
+from sqlalchemy.orm import Session
+
+import database
+from database import Base
+from leaderboard import _build_global, global_rank, leaderboard_cache
+from models import User
+
+def _set_points(headers, points: int) -> None:
+    user_id = jwt.get_unverified_claims(headers["Authorization"].split()[1])["user_id"]
+    with database.engine.begin() as conn:
+        conn.execute(update(User).where(User.id == user_id).values(points=points))
+
+def test_my_rank_matches_the_table(client, student_headers):
+    _set_points(student_headers, 12345)
+    leaderboard_cache.clear()
+    me = client.get("/api/leaderboard/me", headers=student_headers).json()
+    with database.engine.connect() as conn:
+        above = conn.execute(
+            select(func.count()).select_from(User).where(User.is_child_account == False, User.points > 12345)
+        ).scalar()
+    assert me["rank"] == above + 1 and me["points"] == 12345 and me["listed"]
+    entries = client.get("/api/leaderboard", params={"limit": 100}, headers=student_headers).json()["entries"]
+    assert next(e for e in entries if e["points"] == 12345)["rank"] == me["rank"]
+
+def test_top_entries_share_ranks_on_ties(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/ties.db")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"username": name, "points": points, "is_child_account": child}
+            for name, points, child in [("a", 50, False), ("b", 30, False), ("c", 30, False),
+                                        ("d", 10, False), ("kind", 40, True)]
+        ])
+    with Session(engine) as db:
+        ranking = _build_global(db)
+        assert [(e["username"], e["rank"]) for e in ranking.top] == [("a", 1), ("b", 2), ("c", 2), ("d", 4)]
+        assert ranking.total == 4
+        # child accounts are not listed but see where they would stand
+        assert global_rank(db, 40) == 2 and global_rank(db, 10) == 4 and global_rank(db, 0) == 5
+
+def test_rank_lookup_benchmark(tmp_path, scaled):
+    """Rank lookups and top-K rebuilds; BENCHMARK_SCALE=50 gives the 1M-user run."""
+    users = scaled(20_000)
+    engine = create_engine(f"sqlite:///{tmp_path}/ranking.db")
+    Base.metadata.create_all(engine)
+    rng = random.Random(1)
+    points = [int(rng.paretovariate(1.5) * 10) for _ in range(users)]
+    with engine.begin() as conn:
+        for start in range(0, users, 50_000):
+            conn.execute(insert(User), [
+                {"username": f"u{i}", "points": points[i], "is_child_account": i % 20 == 0}
+                for i in range(start, min(start + 50_000, users))
+            ])
+    listed = sorted((p for i, p in enumerate(points) if i % 20), reverse=True)
+
+    with Session(engine) as db:
+        started = time.perf_counter()
+        ranking = _build_global(db)
+        build = time.perf_counter() - started
+        assert ranking.total == len(listed)
+
+        timings = {}
+        for label, fraction in (("Top 1 %", 0.01), ("Median", 0.5), ("Ende", 1.0)):
+            score = listed[min(int(len(listed) * fraction), len(listed) - 1)]
+            samples = []
+            for _ in range(20):
+                started = time.perf_counter()
+                rank = global_rank(db, score)
+                samples.append(time.perf_counter() - started)
+            assert rank == 1 + sum(1 for p in listed if p > score)
+            timings[label] = statistics.median(samples)
+
+    print(f"\n{users} Nutzer: Top-K-Aufbau {build * 1000:.1f} ms; Rang "
+          + ", ".join(f"{label} {t * 1000:.2f} ms" for label, t in timings.items()))
+    # a rank near the top only touches the index entries above it
+    assert timings["Top 1 %"] < timings["Ende"] + 0.005
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import link_checker
+from link_checker import check_links
+
+SLOW_SECONDS = 0.3
+
+class StubHandler(BaseHTTPRequestHandler):
+    """/ok, /fail, /missing, /no-head (405 on HEAD), /slow (SLOW_SECONDS), /hang (beyond the timeout)."""
+
+    def do_HEAD(self):
+        self._respond(head=True)
+
+    def do_GET(self):
+        self._respond(head=False)
+
+    def _respond(self, head: bool):
+        server = self.server
+        host = self.headers["Host"]
+        path = self.path.split("?")[0]
+        with server.lock:
+            server.requests.append((self.command, host, path))
+            server.active[host] = server.active.get(host, 0) + 1
+            server.max_active[host] = max(server.max_active.get(host, 0), server.active[host])
+        try:
+            if path == "/slow":
+                time.sleep(SLOW_SECONDS)
+            elif path == "/hang":
+                time.sleep(1)
+            status = {"/fail": 500, "/missing": 404}.get(path, 200)
+            if path == "/no-head" and head:
+                status = 405
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        finally:
+            with server.lock:
+                server.active[host] -= 1
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture(scope="module")
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+
+@pytest.fixture(autouse=True)
+def fresh_state(stub, monkeypatch):
+    stub.requests, stub.active, stub.max_active = [], {}, {}
+    monkeypatch.setattr(link_checker, "link_cache", link_checker.LinkStatusCache())
+    monkeypatch.setattr(link_checker, "_limits", link_checker._Limits())
+    monkeypatch.setattr(link_checker, "LINK_CHECK_TIMEOUT_SECONDS", 0.6)
+
+def url(stub, path: str, host: str = "127.0.0.1") -> str:
+    # unique query so that the URL cache of other tests does not interfere
+    return f"http://{host}:{stub.server_port}{path}?{uuid.uuid4().hex[:6]}"
+
+def test_broken_links_against_stub_server(stub):
+    ok, fail, missing, no_head, slow, hang = (url(stub, p) for p in
+                                              ("/ok", "/fail", "/missing", "/no-head", "/slow", "/hang"))
+    broken = asyncio.run(check_links([ok, fail, missing, no_head, slow, hang]))
+    assert sorted(broken) == sorted([fail, missing, hang])
+    # the HEAD-unsupported endpoint was retried with GET
+    assert ("GET", f"127.0.0.1:{stub.server_port}", "/no-head") in stub.requests
+
+def test_results_are_cached_across_checks(stub):
+    urls = [url(stub, "/ok"), url(stub, "/fail")]
+    assert asyncio.run(check_links(urls)) == [urls[1]]
+    seen = len(stub.requests)
+    assert asyncio.run(check_links(list(reversed(urls)))) == [urls[1]]
+    assert len(stub.requests) == seen
+
+def test_per_host_limit(stub, monkeypatch):
+    monkeypatch.setattr(link_checker, "LINK_CHECK_PER_HOST", 2)
+    asyncio.run(check_links([url(stub, "/slow") for _ in range(6)]))
+    assert stub.max_active[f"127.0.0.1:{stub.server_port}"] == 2
+    # semaphores of finished hosts are dropped
+    assert link_checker._limits.per_host == {}
+
+def test_busy_host_does_not_starve_other_hosts(stub, monkeypatch):
+    monkeypatch.setattr(link_checker, "LINK_CHECK_CONCURRENCY", 2)
+    monkeypatch.setattr(link_checker, "LINK_CHECK_PER_HOST", 1)
+    busy = [url(stub, "/slow") for _ in range(4)]
+    other = url(stub, "/ok", host="localhost")
+    started = time.monotonic()
+    asyncio.run(check_links(busy + [other]))
+    assert time.monotonic() - started >= 4 * SLOW_SECONDS
+    # queued checks for the busy host hold no global slot, so the other host is served at once
+    hosts = [host for _, host, _ in stub.requests]
+    assert hosts.index(f"localhost:{stub.server_port}") <= 1
+
+def test_saving_a_course_enqueues_a_check(client, admin_headers, stub):
+    fail = url(stub, "/fail")
+    content = f'<a href="{url(stub, "/ok")}">ok</a> <a href="{fail}">kaputt</a>'
+    r = client.post("/api/courses", json={
+        "title": f"Links {uuid.uuid4().hex[:8]}", "short_description": "", "course_content": content
+    }, headers=admin_headers)
+    assert r.status_code == 201
+    job_id = r.json()["link_check_job_id"]
+    # TestClient runs background tasks before returning
+    report = client.get(f"/api/courses/{r.json()['course_id']}/link-report", headers=admin_headers).json()
+    assert report["job_id"] == job_id
+    assert report["status"] == "done"
+    assert report["broken_links"] == [fail]
+    assert link_checker.link_cache.get(fail) is True
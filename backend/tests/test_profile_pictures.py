@@ -0,0 +1,57 @@
+import io
+import os
+import tracemalloc
+
+import pytest
+from jose import jwt
+
+import profile_pictures
+from profile_pictures import picture_store
+
+Image = pytest.importorskip("PIL.Image")
+
+def _png(color=(200, 10, 10), size=(400, 300)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+def test_identical_uploads_share_one_stored_file(client, student_headers):
+    png = _png(color=(1, 2, 3))
+    first = client.put("/api/user/profile/picture", content=png, headers=student_headers).json()
+    second = client.put("/api/user/profile", data={}, files={"profile_picture": ("x.png", png, "image/png")},
+                        headers=student_headers).json()
+    assert first["profile_picture"] == second["profile_picture"]
+    assert set(first["profile_picture_variants"]) == {"original", "64", "128", "256"}
+    with Image.open(first["profile_picture_variants"]["64"]) as thumbnail:
+        assert max(thumbnail.size) == 64
+    assert os.listdir(profile_pictures.TMP_DIR) == []
+
+def test_invalid_and_oversized_uploads_are_rejected(client, student_headers, monkeypatch):
+    assert client.put("/api/user/profile/picture", content=b"\x89PNG kein Bild",
+                      headers=student_headers).status_code == 400
+    monkeypatch.setattr(profile_pictures, "PROFILE_PICTURE_MAX_BYTES", 1024)
+    assert client.put("/api/user/profile/picture", content=b"x" * 4096,
+                      headers=student_headers).status_code == 413
+    assert os.listdir(profile_pictures.TMP_DIR) == []
+
+def test_public_profile_returns_the_requested_variant(client, student_headers):
+    stored = client.put("/api/user/profile/picture", content=_png(color=(4, 5, 6)),
+                        headers=student_headers).json()["profile_picture_variants"]
+    token = student_headers["Authorization"].split()[1]
+    user_id = jwt.get_unverified_claims(token)["user_id"]
+    profile = client.get(f"/api/user/{user_id}/public-profile", params={"picture_size": 100}).json()
+    assert profile["profile_picture"] == stored["128"]
+
+def test_streaming_50_mb_keeps_memory_flat(monkeypatch):
+    monkeypatch.setattr(profile_pictures, "PROFILE_PICTURE_MAX_BYTES", 60 * 1024 * 1024)
+    chunk = b"\0" * profile_pictures.CHUNK_SIZE
+    chunks = (chunk for _ in range(50 * 1024 * 1024 // len(chunk)))
+    tracemalloc.start()
+    try:
+        tmp_path, _ = picture_store.spool(chunks)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert os.path.getsize(tmp_path) == 50 * 1024 * 1024
+    os.remove(tmp_path)
+    assert peak < 2 * 1024 * 1024
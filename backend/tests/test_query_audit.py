@@ -0,0 +1,28 @@
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+import database
+import query_audit
+from identity_cache import identity_query
+from models import Comment, User
+from query_audit import AuditedQuery, audit
+
+def test_route_queries_use_indexes(client):
+    with database.engine.connect() as conn:
+        assert audit(conn, 0) == []
+
+def test_audit_runs_the_routes_statements():
+    identity = next(q for q in query_audit.AUDITED_QUERIES if q.route == "dependencies.get_current_user")
+    assert identity.statement.compare(identity_query.where(User.id == 1))
+
+def test_full_scan_is_reported_with_its_table(client, monkeypatch):
+    reply = aliased(Comment)
+    monkeypatch.setattr(query_audit, "AUDITED_QUERIES", [
+        AuditedQuery("unindexed", select(User.id).where(User.full_name == "x")),
+        AuditedQuery("aliased", select(reply.id).where(reply.content == "x")),
+        AuditedQuery("allowed", select(User.id).where(User.full_name == "x"), allow_scan=("users",)),
+    ])
+    with database.engine.connect() as conn:
+        failures = audit(conn, -1)
+    assert [f.split(":")[0] for f in failures] == ["unindexed", "aliased"]
+    assert "full scan of comments" in failures[1]
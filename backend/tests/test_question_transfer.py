@@ -0,0 +1,72 @@
+import json
+import time
+
+import question_transfer
+
+HEADER = b"question_text,option1,option2,option3,option4,correct_option\n"
+
+def _csv(n):
+    return HEADER + b"".join(b"q%d,a,b,c,d,1\n" % i for i in range(n))
+
+def _import(client, headers, course_id, body, name="fragen.csv"):
+    return client.post(f"/api/courses/{course_id}/quiz-questions/import",
+                       files={"file": (name, body)}, headers=headers)
+
+def test_import_reports_invalid_rows_and_exports_round_trip(client, admin_headers, make_course):
+    course_id = make_course()
+    body = _csv(3) + b"ohne,a,b,c,d,7\n"
+    result = _import(client, admin_headers, course_id, body).json()
+    assert result["imported"] == 3 and result["failed"] == 1 and not result["aborted"]
+    assert result["errors"][0]["line"] == 5
+
+    export = client.get(f"/api/courses/{course_id}/quiz-questions/export",
+                        params={"format": "ndjson"}, headers=admin_headers)
+    rows = [json.loads(line) for line in export.text.splitlines()]
+    assert [r["question_text"] for r in rows] == ["q0", "q1", "q2"]
+
+def test_unreadable_file_after_committed_chunks_returns_partial_result(client, admin_headers,
+                                                                      make_course, monkeypatch):
+    monkeypatch.setattr(question_transfer, "QUESTION_IMPORT_CHUNK_SIZE", 100)
+    course_id = make_course()
+    # the decoder reads ahead in blocks, so the broken bytes must come well after the first chunks
+    result = _import(client, admin_headers, course_id, _csv(3000) + b"q\xff,a,b,c,d,1\n").json()
+    assert result["aborted"]
+    assert result["imported"] > 0 and result["imported"] % 100 == 0
+    assert result["errors"][-1]["line"] == result["imported"] + 2
+
+def test_unreadable_file_before_any_commit_is_rejected(client, admin_headers, make_course):
+    course_id = make_course()
+    assert _import(client, admin_headers, course_id, b"\xff\xfe" * 10).status_code == 400
+
+def test_import_export_benchmark(client, admin_headers, make_course, scaled):
+    """Rows/s for import and export (CSV and NDJSON) next to one POST per question; prints the figures with -s."""
+    rows = scaled(5_000)
+    ndjson = b"".join(
+        json.dumps({"question_text": f"q{i}", "option1": "a", "option2": "b", "option3": "c",
+                    "option4": "d", "correct_option": 1}).encode() + b"\n" for i in range(rows)
+    )
+    rates = {}
+    for fmt, body, name in (("csv", _csv(rows), "fragen.csv"), ("ndjson", ndjson, "fragen.ndjson")):
+        course_id = make_course()
+        started = time.perf_counter()
+        result = _import(client, admin_headers, course_id, body, name).json()
+        rates[f"Import {fmt}"] = rows / (time.perf_counter() - started)
+        assert result["imported"] == rows and result["failed"] == 0
+        started = time.perf_counter()
+        export = client.get(f"/api/courses/{course_id}/quiz-questions/export",
+                            params={"format": fmt}, headers=admin_headers)
+        rates[f"Export {fmt}"] = rows / (time.perf_counter() - started)
+        assert len(export.text.splitlines()) == rows + (fmt == "csv")
+
+    single = 100
+    course_id = make_course()
+    started = time.perf_counter()
+    for i in range(single):
+        client.post(f"/api/courses/{course_id}/quiz-questions", json={
+            "question_text": f"q{i}", "option1": "a", "option2": "b", "option3": "c", "option4": "d",
+            "correct_option": 1
+        }, headers=admin_headers)
+    rates["einzelne POSTs"] = single / (time.perf_counter() - started)
+
+    print(f"\n{rows} Fragen: " + ", ".join(f"{label} {rate:.0f} Zeilen/s" for label, rate in rates.items()))
+    assert rates["Import csv"] > rates["einzelne POSTs"]
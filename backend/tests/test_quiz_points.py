@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from routes.quiz import POINTS_PER_CORRECT_ANSWER
+
+def _question(client, admin_headers, course_id, correct_option=1):
+    r = client.post(f"/api/courses/{course_id}/quiz-questions", json={
+        "question_text": "Frage", "option1": "a", "option2": "b",
+        "option3": "c", "option4": "d", "correct_option": correct_option
+    }, headers=admin_headers)
+    return r.json()["id"]
+
+def _points(client, headers):
+    return client.get("/api/user/profile", headers=headers).json()["points"]
+
+def test_concurrent_submissions_lose_no_points(client, admin_headers, student_headers, make_course):
+    course_id = make_course()
+    question_ids = [_question(client, admin_headers, course_id) for _ in range(10)]
+    start = _points(client, student_headers)
+
+    def submit(i):
+        question_id = question_ids[i % len(question_ids)]
+        return client.post(f"/api/courses/{course_id}/quiz/{question_id}/response",
+                           json={"selected_option": 1}, headers=student_headers)
+
+    # requests from many threads run interleaved on the app's event loop
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        responses = list(pool.map(submit, range(80)))
+
+    assert all(r.status_code == 200 for r in responses)
+    assert _points(client, student_headers) == start + 80 * POINTS_PER_CORRECT_ANSWER
+    # every response saw its own increment
+    assert len({r.json()["points"] for r in responses}) == 80
+
+def test_batch_submission_is_atomic(client, admin_headers, student_headers, make_course):
+    course_id = make_course()
+    right = _question(client, admin_headers, course_id, correct_option=2)
+    wrong = _question(client, admin_headers, course_id, correct_option=3)
+    start = _points(client, student_headers)
+
+    r = client.post(f"/api/courses/{course_id}/quiz/responses", json={"answers": [
+        {"question_id": right, "selected_option": 2},
+        {"question_id": wrong, "selected_option": 1},
+        {"question_id": 10 ** 9, "selected_option": 1}
+    ]}, headers=student_headers)
+    assert r.status_code == 404
+    assert _points(client, student_headers) == start
+
+    r = client.post(f"/api/courses/{course_id}/quiz/responses", json={"answers": [
+        {"question_id": right, "selected_option": 2},
+        {"question_id": wrong, "selected_option": 1}
+    ]}, headers=student_headers)
+    assert r.status_code == 200
+    assert r.json()["correct_count"] == 1
+    assert r.json()["points"] == _points(client, student_headers) == start + POINTS_PER_CORRECT_ANSWER
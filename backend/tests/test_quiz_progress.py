@@ -0,0 +1,79 @@
+from quiz_progress import quiz_progress_cache
+
+def _add_questions(client, admin_headers, course_id, n):
+    ids = []
+    for i in range(n):
+        r = client.post(f"/api/courses/{course_id}/quiz-questions", json={
+            "question_text": f"Frage {i}", "option1": "a", "option2": "b",
+            "option3": "c", "option4": "d", "correct_option": 1
+        }, headers=admin_headers)
+        assert r.status_code in (200, 201), r.text
+        ids.append(r.json()["id"])
+    return ids
+
+def _open_questions(client, headers, course_id):
+    return client.get(f"/api/courses/{course_id}/quiz-questions", headers=headers)
+
+def test_quiz_questions_query_count_is_constant(client, admin_headers, student_headers,
+                                                make_course, count_queries):
+    small, large = make_course(), make_course()
+    _add_questions(client, admin_headers, small, 2)
+    large_ids = _add_questions(client, admin_headers, large, 30)
+    for question_id in large_ids[:10]:
+        client.post(f"/api/courses/{large}/quiz/{question_id}/response",
+                    json={"selected_option": 1}, headers=student_headers)
+    _open_questions(client, student_headers, small)  # warm the identity cache
+    quiz_progress_cache.clear()
+
+    counts = {}
+    for course_id in (small, large):
+        with count_queries() as cold:
+            _open_questions(client, student_headers, course_id)
+        with count_queries() as cached:
+            r = _open_questions(client, student_headers, course_id)
+        counts[course_id] = (cold.count, cached.count)
+    # course check + questions + correct ids; the correct ids come from the cache once warm
+    assert counts[small] == counts[large] == (3, 2)
+    assert {q["id"] for q in r.json()} == set(large_ids[10:])
+
+def test_correct_answer_updates_cached_progress(client, admin_headers, student_headers, make_course):
+    course_id = make_course()
+    first, second = _add_questions(client, admin_headers, course_id, 2)
+    assert len(_open_questions(client, student_headers, course_id).json()) == 2
+    client.post(f"/api/courses/{course_id}/quiz/{first}/response",
+                json={"selected_option": 1}, headers=student_headers)
+    client.post(f"/api/courses/{course_id}/quiz/{second}/response",
+                json={"selected_option": 2}, headers=student_headers)
+    assert [q["id"] for q in _open_questions(client, student_headers, course_id).json()] == [second]
+
+def test_certificate_query_count_is_constant(client, admin_headers, student_headers,
+                                             make_course, count_queries):
+    small, large = make_course(), make_course()
+    for course_id, n in ((small, 2), (large, 30)):
+        for question_id in _add_questions(client, admin_headers, course_id, n):
+            client.post(f"/api/courses/{course_id}/quiz/{question_id}/response",
+                        json={"selected_option": 1}, headers=student_headers)
+    _open_questions(client, student_headers, small)  # warm the identity cache
+    quiz_progress_cache.clear()
+
+    def certificate(course_id):
+        # with a name the route does not look up the user's full name
+        r = client.get(f"/api/courses/{course_id}/certificate", params={"name": "Test"}, headers=student_headers)
+        assert r.status_code == 200, r.text
+
+    counts = {}
+    for course_id in (small, large):
+        with count_queries() as cold:
+            certificate(course_id)
+        with count_queries() as cached:
+            certificate(course_id)
+        counts[course_id] = (cold.count, cached.count)
+    # course title + question ids + correct ids; the correct ids come from the cache once warm
+    assert counts[small] == counts[large] == (3, 2)
+
+    # the quiz view and the certificate share the cached progress
+    quiz_progress_cache.clear()
+    _open_questions(client, student_headers, large)
+    with count_queries() as shared:
+        certificate(large)
+    assert shared.count == 2
@@ -0,0 +1,115 @@
+import gzip
+import hashlib
+import os
+import time
+
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.staticfiles import StaticFiles
+from starlette.testclient import TestClient
+
+import upload_files
+from upload_files import IMMUTABLE_CACHE_CONTROL, UploadFiles
+
+DIGEST = hashlib.sha256(b"test").hexdigest()
+DIRECTORY = os.path.join("uploads", "images", DIGEST[:2], DIGEST)
+URL = f"/uploads/images/{DIGEST[:2]}/{DIGEST}"
+
+@pytest.fixture(scope="module", autouse=True)
+def files():
+    os.makedirs(DIRECTORY, exist_ok=True)
+    with open(os.path.join(DIRECTORY, "original.png"), "wb") as f:
+        f.write(bytes(range(256)) * 8)
+    with open(os.path.join(DIRECTORY, "bild.svg"), "w") as f:
+        f.write("<svg>" + "a" * 4000 + "</svg>")
+    with open(os.path.join("uploads", "alt.txt"), "w") as f:
+        f.write("alt")
+    upload_files.precompress("uploads")
+
+def test_hashed_files_are_immutable_with_strong_etag(client):
+    r = client.get(f"{URL}/original.png")
+    assert r.status_code == 200
+    assert r.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert r.headers["etag"] == f'"{DIGEST}-original.png"'
+
+def test_if_none_match_is_answered_without_touching_the_file(client, monkeypatch):
+    def no_file_access(self, path):
+        raise AssertionError(f"file looked up: {path}")
+    monkeypatch.setattr(UploadFiles, "lookup_path", no_file_access)
+    r = client.get(f"{URL}/original.png", headers={"If-None-Match": f'"{DIGEST}-original.png"'})
+    assert r.status_code == 304
+    assert r.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+
+def test_byte_ranges(client):
+    etag = f'"{DIGEST}-original.png"'
+    r = client.get(f"{URL}/original.png", headers={"Range": "bytes=10-19"})
+    assert r.status_code == 206 and r.content == bytes(range(10, 20))
+    assert r.headers["content-range"] == "bytes 10-19/2048"
+    assert client.get(f"{URL}/original.png", headers={"Range": "bytes=0-9", "If-Range": etag}).status_code == 206
+    assert client.get(f"{URL}/original.png", headers={"Range": "bytes=0-9", "If-Range": '"alt"'}).status_code == 200
+
+def test_precompressed_variant_is_negotiated(client):
+    gz = client.get(f"{URL}/bild.svg", headers={"Accept-Encoding": "gzip"})
+    assert gz.headers["content-encoding"] == "gzip"
+    assert gz.headers["content-type"].startswith("image/svg+xml")
+    assert gz.headers["etag"] == f'"{DIGEST}-bild.svg.gzip"'
+    assert int(gz.headers["content-length"]) == os.path.getsize(os.path.join(DIRECTORY, "bild.svg.gz"))
+
+    plain = client.get(f"{URL}/bild.svg", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["etag"] == f'"{DIGEST}-bild.svg"'
+    with gzip.open(os.path.join(DIRECTORY, "bild.svg.gz")) as f:
+        assert f.read() == plain.content
+
+def test_legacy_and_temporary_uploads(client):
+    legacy = client.get("/uploads/alt.txt")
+    assert legacy.status_code == 200 and legacy.headers["cache-control"] == "no-cache"
+    os.makedirs(os.path.join("uploads", "tmp"), exist_ok=True)
+    partial = os.path.join("uploads", "tmp", "halb.upload")
+    with open(partial, "wb") as f:
+        f.write(b"x")
+    try:
+        assert client.get("/uploads/tmp/halb.upload").status_code == 404
+    finally:
+        os.remove(partial)
+
+def _page(client, urls, etags=None):
+    """Load every avatar of a page; returns (responses, seconds, bytes on the wire)."""
+    started = time.perf_counter()
+    responses = [
+        client.get(url, headers={"If-None-Match": etags[url]} if etags else {}) for url in urls
+    ]
+    elapsed = time.perf_counter() - started
+    sent = sum(len(r.content) + sum(len(k) + len(v) + 4 for k, v in r.headers.items()) for r in responses)
+    return responses, elapsed, sent
+
+def test_avatar_page_benchmark(client):
+    """A page with 100 avatars: first visit, revalidation and the plain StaticFiles mount; prints the figures with -s."""
+    urls = []
+    for i in range(100):
+        digest = hashlib.sha256(b"avatar %d" % i).hexdigest()
+        directory = os.path.join("uploads", "images", digest[:2], digest)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "64.webp"), "wb") as f:
+            f.write(os.urandom(3000))
+        urls.append(f"/uploads/images/{digest[:2]}/{digest}/64.webp")
+    plain = TestClient(Starlette(routes=[Mount("/uploads", StaticFiles(directory="uploads"))]))
+
+    figures = {}
+    for label, http in (("UploadFiles", client), ("StaticFiles", plain)):
+        first, elapsed, sent = _page(http, urls)
+        assert all(r.status_code == 200 for r in first)
+        figures[f"{label} erster Aufruf"] = (len(urls) / elapsed, sent)
+        etags = {url: r.headers["etag"] for url, r in zip(urls, first)}
+        again, elapsed, sent = _page(http, urls, etags)
+        assert all(r.status_code == 304 for r in again)
+        figures[f"{label} Revalidierung"] = (len(urls) / elapsed, sent)
+        if label == "UploadFiles":
+            # immutable: a warm browser cache sends no request at all for the next render
+            assert all(r.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL for r in first)
+
+    print("\n100 Avatare: " + "; ".join(
+        f"{label} {rate:.0f} Anfragen/s, {sent / 1024:.1f} KiB" for label, (rate, sent) in figures.items()
+    ) + "; UploadFiles mit warmem Cache 0 Anfragen")
+    assert figures["UploadFiles Revalidierung"][1] < figures["UploadFiles erster Aufruf"][1] / 10
@@ -0,0 +1,140 @@
+"""
+Auslieferung von ``/uploads`` mit Cache-Headern.
+
+Dateien unter ``uploads/images/<sha[:2]>/<sha>/`` (siehe profile_pictures.py) sind
+inhaltsadressiert und ändern sich unter ihrer URL nie. Sie werden mit
+``Cache-Control: public, max-age=31536000, immutable`` und einem starken ETag aus
+Hash und Dateiname ausgeliefert. Ein passendes ``If-None-Match`` wird allein
+anhand der URL mit 304 beantwortet, ohne die Datei anzufassen.
+
+Liegt neben einer Datei eine vorkomprimierte Variante (``.br`` oder ``.gz``) und
+erlaubt ``Accept-Encoding`` sie, wird diese ausgeliefert; ``python upload_files.py
+precompress`` erzeugt die gzip-Varianten für komprimierbare Dateitypen.
+Byte-Bereiche (``Range``/``If-Range``) übernimmt Starlettes ``FileResponse``.
+Ältere Uploads ohne Hash im Pfad werden mit ``Cache-Control: no-cache`` und
+Revalidierung wie bisher ausgeliefert.
+"""
+import argparse
+import gzip
+import os
+import re
+import shutil
+import stat
+from mimetypes import guess_type
+from typing import List, Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# preferred first; suffix of the precompressed file next to the original
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+PRECOMPRESS_MIN_BYTES = int(os.getenv("PRECOMPRESS_MIN_BYTES", "1024"))
+_COMPRESSIBLE_TYPES = ("text/", "image/svg+xml", "application/json", "application/javascript", "application/xml")
+
+_HASHED_PATH = re.compile(r"^images/[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})/(?P<name>[^/]+)$")
+
+def _hashed(path: str) -> Optional[Tuple[str, str]]:
+    match = _HASHED_PATH.match(path)
+    return (match["digest"], match["name"]) if match else None
+
+def _etag(digest: str, name: str, encoding: Optional[str] = None) -> str:
+    return f'"{digest}-{name}{"." + encoding if encoding else ""}"'
+
+def _accepted_encodings(headers: Headers) -> List[str]:
+    accepted = []
+    for part in headers.get("accept-encoding", "").split(","):
+        token, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.append(token.strip().lower())
+    return [name for name, _ in ENCODINGS if name in accepted or "*" in accepted]
+
+def _if_none_match(headers: Headers) -> List[str]:
+    return [tag.strip().removeprefix("W/") for tag in headers.get("if-none-match", "").split(",") if tag.strip()]
+
+class UploadFiles(StaticFiles):
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if path.startswith("tmp/") or path == "tmp":
+            # unfinished uploads (profile_pictures.TMP_DIR)
+            raise HTTPException(status_code=404)
+        hashed = _hashed(path)
+        if hashed is None or scope["method"] not in ("GET", "HEAD"):
+            response = await super().get_response(path, scope)
+            response.headers.setdefault("cache-control", REVALIDATE_CACHE_CONTROL)
+            return response
+
+        digest, name = hashed
+        request_headers = Headers(scope=scope)
+        encodings = _accepted_encodings(request_headers)
+        client_tags = _if_none_match(request_headers)
+        if client_tags:
+            # the URL alone identifies the bytes, so no stat is needed
+            for encoding in [None] + encodings:
+                etag = _etag(digest, name, encoding)
+                if etag in client_tags:
+                    return NotModifiedResponse(Headers({
+                        "etag": etag,
+                        "cache-control": IMMUTABLE_CACHE_CONTROL,
+                        "vary": "Accept-Encoding"
+                    }))
+
+        for encoding, suffix in ENCODINGS:
+            if encoding in encodings:
+                full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+                if stat_result and stat.S_ISREG(stat_result.st_mode):
+                    return self._immutable_response(full_path, stat_result, name,
+                                                    _etag(digest, name, encoding), encoding)
+
+        full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path)
+        if not (stat_result and stat.S_ISREG(stat_result.st_mode)):
+            raise HTTPException(status_code=404)
+        return self._immutable_response(full_path, stat_result, name, _etag(digest, name))
+
+    def _immutable_response(self, full_path, stat_result: os.stat_result, name: str,
+                            etag: str, encoding: Optional[str] = None) -> FileResponse:
+        headers = {"etag": etag, "cache-control": IMMUTABLE_CACHE_CONTROL, "vary": "Accept-Encoding"}
+        if encoding:
+            headers["content-encoding"] = encoding
+        # media type of the original, not of the .gz/.br file
+        media_type = guess_type(name)[0] or "application/octet-stream"
+        return FileResponse(full_path, stat_result=stat_result, headers=headers, media_type=media_type)
+
+def _compressible(name: str) -> bool:
+    media_type = guess_type(name)[0] or ""
+    return media_type.startswith(_COMPRESSIBLE_TYPES)
+
+def precompress(directory: str, min_bytes: int = PRECOMPRESS_MIN_BYTES) -> int:
+    """Write a .gz next to every compressible file that lacks one; returns the number written."""
+    written = 0
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [d for d in dirs if not (root == directory and d == "tmp")]
+        for name in files:
+            path = os.path.join(root, name)
+            if (name.endswith(tuple(suffix for _, suffix in ENCODINGS)) or not _compressible(name)
+                    or os.path.getsize(path) < min_bytes or os.path.exists(path + ".gz")):
+                continue
+            tmp_path = path + ".gz.tmp"
+            # mtime=0 keeps the output byte-identical across runs
+            with open(path, "rb") as src, gzip.GzipFile(tmp_path, "wb", compresslevel=9, mtime=0) as dst:
+                shutil.copyfileobj(src, dst)
+            if os.path.getsize(tmp_path) >= os.path.getsize(path):
+                os.remove(tmp_path)
+                continue
+            os.replace(tmp_path, path + ".gz")
+            written += 1
+    return written
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vorkomprimierte Varianten für /uploads erzeugen.")
+    parser.add_argument("command", choices=["precompress"])
+    parser.add_argument("--directory", default="uploads")
+    parser.add_argument("--min-bytes", type=int, default=PRECOMPRESS_MIN_BYTES)
+    args = parser.parse_args()
+    print(f"{precompress(args.directory, args.min_bytes)} Dateien komprimiert.")
@@ -0,0 +1,19 @@
+import { useAuthStore } from "./store/auth";
+
+// Gemeinsamer Client für alle API-Aufrufe: hängt das aktuelle Access-Token an und
+// erneuert es bei 401 einmalig über /api/auth/refresh, bevor die Anfrage wiederholt wird.
+export async function apiFetch(url, options = {}) {
+  const authStore = useAuthStore();
+  const send = () => {
+    const headers = new Headers(options.headers || {});
+    if (authStore.token) {
+      headers.set("Authorization", "Bearer " + authStore.token);
+    }
+    return fetch(url, { ...options, headers });
+  };
+  const response = await send();
+  if (response.status === 401 && !url.includes("/api/auth/") && (await authStore.refresh())) {
+    return send();
+  }
+  return response;
+}
@@ -1,9 +1,13 @@
 import { defineStore } from "pinia";
 import axios from "axios";
 
+// Parallele 401-Antworten teilen sich eine Refresh-Anfrage (Token werden bei jeder Nutzung rotiert)
+let refreshInFlight = null;
+
 export const useAuthStore = defineStore("auth", {
   state: () => ({
     token: null,
+    refreshToken: null,
     user: null, // { id, username, role }
   }),
   actions: {
@@ -13,7 +17,7 @@ export const useAuthStore = defineStore("auth", {
         this.token = response.data.access_token;
         const payload = JSON.parse(atob(response.data.access_token.split('.')[1]));
         this.user = { id: payload.user_id, role: payload.role, username: payload.username || identifier };
-        localStorage.setItem("token", this.token);
+        this.storeTokens(response.data);
         localStorage.setItem("user", JSON.stringify(this.user));
         return true;
       } catch (error) {
@@ -27,7 +31,7 @@ export const useAuthStore = defineStore("auth", {
         this.token = response.data.access_token;
         const payload = JSON.parse(atob(response.data.access_token.split('.')[1]));
         this.user = { id: payload.user_id, role: payload.role, username };
-        localStorage.setItem("token", this.token);
+        this.storeTokens(response.data);
         localStorage.setItem("user", JSON.stringify(this.user));
         return true;
       } catch (error) {
@@ -35,10 +39,44 @@ export const useAuthStore = defineStore("auth", {
         throw error;
       }
     },
+    storeTokens(data) {
+      this.token = data.access_token;
+      this.refreshToken = data.refresh_token || null;
+      localStorage.setItem("token", this.token);
+      if (this.refreshToken) {
+        localStorage.setItem("refresh_token", this.refreshToken);
+      }
+    },
+    refresh() {
+      // Neues Access-Token ohne erneute Passworteingabe
+      if (!this.refreshToken) {
+        return Promise.resolve(false);
+      }
+      if (!refreshInFlight) {
+        refreshInFlight = axios.post("http://127.0.0.1:8000/api/auth/refresh", { refresh_token: this.refreshToken })
+          .then((response) => {
+            this.storeTokens(response.data);
+            return true;
+          })
+          .catch(() => {
+            this.logout();
+            return false;
+          })
+          .finally(() => {
+            refreshInFlight = null;
+          });
+      }
+      return refreshInFlight;
+    },
     logout() {
+      if (this.refreshToken) {
+        axios.post("http://127.0.0.1:8000/api/auth/logout", { refresh_token: this.refreshToken }).catch(() => {});
+      }
       this.token = null;
+      this.refreshToken = null;
       this.user = null;
       localStorage.removeItem("token");
+      localStorage.removeItem("refresh_token");
       localStorage.removeItem("user");
     },
     loadStoredAuth() {
@@ -46,6 +84,7 @@ export const useAuthStore = defineStore("auth", {
       const user = localStorage.getItem("user");
       if (token && user) {
         this.token = token;
+        this.refreshToken = localStorage.getItem("refresh_token");
         this.user = JSON.parse(user);
       }
     }